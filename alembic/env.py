@@ -1,12 +1,13 @@
+import os
 from logging.config import fileConfig
 
 from sqlalchemy import engine_from_config
 from sqlalchemy import pool
 
 from alembic import context
-from database import Base
+from base import Base
 
-from models import Users, Documents, Cpf, Rg, Cnh, VaccinationCard
+from models import Users, Transport, TransportTransaction, Documents, Cpf, Rg, Cnh, VaccinationCard
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -17,6 +18,11 @@ config = context.config
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
 
+    # Pela linha de comando, DATABASE_URL (a mesma da aplicação) substitui a URL do
+    # alembic.ini; as migrações rodam com o driver síncrono
+    if os.getenv("DATABASE_URL"):
+        config.set_main_option("sqlalchemy.url", os.environ["DATABASE_URL"].replace("+aiomysql", "+pymysql"))
+
 # add your model's MetaData object here
 # for 'autogenerate' support
 # from myapp import mymodel
@@ -0,0 +1,60 @@
+"""unique transport per user
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 09:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+transport = sa.table(
+    'transport',
+    sa.column('id', sa.Integer),
+    sa.column('user_id', sa.Integer),
+    sa.column('balance', sa.DECIMAL(10, 2)),
+    sa.column('last_transaction_date', sa.Date),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Junta saldos duplicados na linha mais antiga de cada usuário antes do índice único
+    connection = op.get_bind()
+    duplicated = connection.execute(
+        sa.select(transport.c.user_id)
+        .where(transport.c.user_id.is_not(None))
+        .group_by(transport.c.user_id)
+        .having(sa.func.count() > 1)
+    ).scalars().all()
+
+    for user_id in duplicated:
+        rows = connection.execute(
+            sa.select(transport.c.id, transport.c.balance, transport.c.last_transaction_date)
+            .where(transport.c.user_id == user_id)
+            .order_by(transport.c.id)
+        ).all()
+        dates = [row.last_transaction_date for row in rows if row.last_transaction_date]
+        connection.execute(
+            transport.update()
+            .where(transport.c.id == rows[0].id)
+            .values(balance=sum(row.balance or 0 for row in rows),
+                    last_transaction_date=max(dates) if dates else None)
+        )
+        connection.execute(transport.delete().where(transport.c.id.in_([row.id for row in rows[1:]])))
+
+    op.create_index(op.f('ix_transport_user_id'), 'transport', ['user_id'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_transport_user_id'), table_name='transport')
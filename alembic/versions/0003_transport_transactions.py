@@ -0,0 +1,50 @@
+"""transport transactions ledger
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 09:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('transport_transactions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('amount', sa.DECIMAL(precision=10, scale=2), nullable=False),
+    sa.Column('kind', sa.String(length=20), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_transport_transactions_id'), 'transport_transactions', ['id'], unique=False)
+    op.create_index(op.f('ix_transport_transactions_created_at'), 'transport_transactions', ['created_at'], unique=False)
+    op.create_index('ix_transport_transactions_user_id_created_at', 'transport_transactions',
+                    ['user_id', 'created_at', 'id'], unique=False)
+
+    # Lançamento de abertura com o saldo atual, para o extrato bater com o saldo materializado
+    op.execute(
+        "INSERT INTO transport_transactions (user_id, amount, kind, created_at) "
+        "SELECT user_id, balance, 'saldo_inicial', CURRENT_TIMESTAMP FROM transport "
+        "WHERE user_id IS NOT NULL AND balance <> 0"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_transport_transactions_user_id_created_at', table_name='transport_transactions')
+    op.drop_index(op.f('ix_transport_transactions_created_at'), table_name='transport_transactions')
+    op.drop_index(op.f('ix_transport_transactions_id'), table_name='transport_transactions')
+    op.drop_table('transport_transactions')
@@ -0,0 +1,68 @@
+"""unique documents per user and expiration indexes
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 09:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+FOREIGN_KEYS = ('cpf_id', 'rg_id', 'cnh_id', 'vaccination_card_id')
+
+documents = sa.table(
+    'documents',
+    sa.column('id', sa.Integer),
+    sa.column('user_id', sa.Integer),
+    *(sa.column(foreign_key, sa.Integer) for foreign_key in FOREIGN_KEYS),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Junta os Documents duplicados na linha mais antiga de cada usuário, que era a lida pela API;
+    # os documentos que faltam nela vêm da duplicata mais recente que os tiver
+    connection = op.get_bind()
+    duplicated = connection.execute(
+        sa.select(documents.c.user_id)
+        .where(documents.c.user_id.is_not(None))
+        .group_by(documents.c.user_id)
+        .having(sa.func.count() > 1)
+    ).scalars().all()
+
+    for user_id in duplicated:
+        rows = connection.execute(
+            sa.select(documents).where(documents.c.user_id == user_id).order_by(documents.c.id)
+        ).all()
+        kept, duplicates = rows[0], rows[1:]
+        values = {}
+        for foreign_key in FOREIGN_KEYS:
+            if getattr(kept, foreign_key) is None:
+                newest = next((getattr(row, foreign_key) for row in reversed(duplicates)
+                               if getattr(row, foreign_key) is not None), None)
+                if newest is not None:
+                    values[foreign_key] = newest
+        if values:
+            connection.execute(documents.update().where(documents.c.id == kept.id).values(**values))
+        connection.execute(documents.delete().where(documents.c.id.in_([row.id for row in duplicates])))
+
+    op.create_index(op.f('ix_documents_user_id'), 'documents', ['user_id'], unique=True)
+    op.create_index(op.f('ix_cnh_expiration_date'), 'cnh', ['expiration_date'], unique=False)
+    op.create_index(op.f('ix_vaccination_card_expiration_date'), 'vaccination_card', ['expiration_date'],
+                    unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_vaccination_card_expiration_date'), table_name='vaccination_card')
+    op.drop_index(op.f('ix_cnh_expiration_date'), table_name='cnh')
+    op.drop_index(op.f('ix_documents_user_id'), table_name='documents')
@@ -0,0 +1,37 @@
+"""indexes on the document foreign keys of documents
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# A exportação encontra a carteira de cada documento por estas colunas
+COLUMNS = ('cpf_id', 'rg_id', 'cnh_id', 'vaccination_card_id')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for column in COLUMNS:
+        op.create_index(op.f(f'ix_documents_{column}'), 'documents', [column], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # No MySQL, estes índices substituem os que o InnoDB cria para as chaves estrangeiras e
+    # não podem ser removidos enquanto elas existirem
+    if op.get_bind().dialect.name == 'mysql':
+        return
+    for column in COLUMNS:
+        op.drop_index(op.f(f'ix_documents_{column}'), table_name='documents')
@@ -0,0 +1,6 @@
+from sqlalchemy.ext.asyncio import AsyncAttrs
+from sqlalchemy.orm import declarative_base
+
+# Fica fora de database.py para que models.py e o Alembic, que usa o driver síncrono,
+# não criem o engine assíncrono da aplicação só por importar os modelos
+Base = declarative_base(cls=AsyncAttrs)
@@ -0,0 +1,109 @@
+"""Memória do processo durante a exportação de carteiras (GET /admin/documents/export).
+
+Gera ROWS carteiras sintéticas com um CPF cada em um SQLite em arquivo, consome a
+exportação NDJSON direto do app ASGI (um registro de usuário, um de carteira e um de CPF
+por carteira) e imprime o RSS do processo a cada décimo das linhas enviadas. Depois, para
+comparação, carrega as mesmas carteiras de uma vez com .all().
+
+Uso: python benchmarks/bench_admin_export.py [linhas]
+"""
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from common import install_async_db
+
+import routers.admin
+from database import Base
+from main import app
+from models import Cpf, Documents, Users
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * PAGE_SIZE / 2**20
+
+
+def seed(path):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    engine.dispose()
+    with sqlite3.connect(path) as connection:
+        connection.executemany("INSERT INTO users (id, username, hashed_password) VALUES (?, ?, 'x')",
+                               ((index, f"usuario{index}") for index in range(1, ROWS + 1)))
+        connection.executemany(
+            "INSERT INTO cpf (id, number, name, issued_by, issued_date) VALUES (?, ?, ?, 'Receita Federal', ?)",
+            ((index, f"{index:011d}", f"Usuario {index}", f"20{index % 20:02d}-01-01") for index in range(1, ROWS + 1)))
+        connection.executemany("INSERT INTO documents (id, user_id, cpf_id, version) VALUES (?, ?, ?, 1)",
+                               ((index, index, index) for index in range(1, ROWS + 1)))
+
+
+async def stream_export():
+    """Chama o app ASGI diretamente: o ASGITransport do httpx acumularia a resposta inteira."""
+    routers.admin.ADMIN_API_KEY = "bench"
+    scope = {"type": "http", "method": "GET", "path": "/admin/documents/export", "raw_path": b"/admin/documents/export",
+             "query_string": b"", "headers": [(b"x-admin-key", b"bench")], "http_version": "1.1", "scheme": "http",
+             "server": ("bench", 80), "client": ("127.0.0.1", 123), "root_path": ""}
+    state = {"exported": 0, "next": 0, "step": max(3 * ROWS // 10, 1)}
+    finished = asyncio.Event()
+    requests = iter([{"type": "http.request", "body": b"", "more_body": False}])
+
+    async def receive():
+        request = next(requests, None)
+        if request is not None:
+            return request
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            assert message["status"] == 200
+        elif message["type"] == "http.response.body":
+            state["exported"] += message.get("body", b"").count(b"\n")
+            if state["exported"] >= state["next"]:
+                print(f"{state['exported']:>10} {rss_mb():>9.1f}")
+                state["next"] += state["step"]
+            if not message.get("more_body", False):
+                finished.set()
+
+    print(f"{'linhas':>10} {'RSS (MB)':>9}")
+    started = time.perf_counter()
+    await app(scope, receive, send)
+    elapsed = time.perf_counter() - started
+    print(f"{state['exported']:>10} {rss_mb():>9.1f}")
+    print(f"{state['exported']} linhas exportadas em {elapsed:.1f} s ({state['exported'] / elapsed:,.0f} linhas/s)")
+
+
+async def load_everything(engine):
+    session_factory = async_sessionmaker(bind=engine)
+    before = rss_mb()
+    async with session_factory() as db:
+        rows = (await db.execute(
+            select(Documents.id, Users.username, Cpf).join(Users).join(Cpf, Documents.cpf_id == Cpf.id)
+        )).all()
+        print(f"carregando tudo com .all(): {len(rows)} linhas, RSS {before:.1f} -> {rss_mb():.1f} MB")
+
+
+async def main():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        started = time.perf_counter()
+        seed(path)
+        print(f"{ROWS} carteiras geradas em {time.perf_counter() - started:.1f} s")
+        engine = install_async_db(f"sqlite+aiosqlite:///{path}")
+        await stream_export()
+        await load_everything(engine)
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
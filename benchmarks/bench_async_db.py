@@ -0,0 +1,117 @@
+"""Benchmark de concorrência: sessão síncrona (antes) x sessão assíncrona (depois).
+
+Executa GET /transport/balance com 1, 10 e 100 clientes concorrentes e imprime
+requisições/segundo para cada caminho. A latência simulada do banco (ver common.py)
+bloqueia o event loop no caminho síncrono e fica na thread do driver no assíncrono.
+
+Uso: BENCH_ROUND_TRIP_MS=2 python benchmarks/bench_async_db.py [requisicoes_por_nivel]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from decimal import Decimal
+from typing import Annotated
+
+import httpx
+from fastapi import Depends, FastAPI, HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from common import ROUND_TRIP, install_async_db, remote_connect_args
+
+from cache import wallet_cache
+from database import Base
+from main import app
+from models import Transport, Users
+from routers.auth import create_access_token, get_current_user
+
+REQUESTS_PER_LEVEL = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+CONCURRENCY_LEVELS = (1, 10, 100)
+POOL_SIZE = 100
+
+
+def build_sync_app(url):
+    """Reproduz o handler anterior: rota async com Session síncrona."""
+    engine = create_engine(url, connect_args=remote_connect_args(), pool_size=POOL_SIZE)
+    SessionLocal = sessionmaker(bind=engine)
+
+    def get_sync_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    sync_app = FastAPI()
+
+    @sync_app.get("/transport/balance")
+    async def get_transport_balance(db: Annotated[Session, Depends(get_sync_db)],
+                                    current_user: Annotated[dict, Depends(get_current_user)]):
+        transport = db.query(Transport).filter(Transport.user_id == current_user.get("id")).first()
+        if not transport:
+            raise HTTPException(status_code=404)
+        return {"message": "Saldo atual: R$ " + str(transport.balance)}
+
+    return sync_app, engine
+
+
+def seed(path):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        user = Users(username="bench", hashed_password="x")
+        db.add(user)
+        db.flush()
+        db.add(Transport(user_id=user.id, balance=Decimal("42.00")))
+        db.commit()
+        user_id = user.id
+    engine.dispose()
+    return create_access_token("bench", user_id, timedelta(minutes=20))
+
+
+async def run_level(target_app, token, concurrency):
+    transport = httpx.ASGITransport(app=target_app)
+    cookies = {"access_token": f"Bearer {token}"}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", cookies=cookies) as client:
+        remaining = REQUESTS_PER_LEVEL
+
+        async def worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                response = await client.get("/transport/balance")
+                assert response.status_code == 200, response.text
+
+        await client.get("/transport/balance")
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return REQUESTS_PER_LEVEL / (time.perf_counter() - started)
+
+
+async def main():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        token = seed(path)
+
+        sync_app, sync_engine = build_sync_app(f"sqlite:///{path}")
+        async_engine = install_async_db(f"sqlite+aiosqlite:///{path}", pool_size=POOL_SIZE)
+        # Mede só o acesso ao banco, sem o cache da carteira
+        wallet_cache.max_entries = 0
+
+        print(f"round trip simulado: {ROUND_TRIP * 1000:.1f} ms, {REQUESTS_PER_LEVEL} requisições por nível")
+        print(f"{'clientes':>8} | {'antes (req/s)':>14} | {'depois (req/s)':>14}")
+        for concurrency in CONCURRENCY_LEVELS:
+            before = await run_level(sync_app, token, concurrency)
+            after = await run_level(app, token, concurrency)
+            print(f"{concurrency:>8} | {before:>14.1f} | {after:>14.1f}")
+
+        sync_engine.dispose()
+        await async_engine.dispose()
+        app.dependency_overrides.clear()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
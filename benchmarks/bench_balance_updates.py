@@ -0,0 +1,128 @@
+"""Benchmark de recargas concorrentes no mesmo saldo.
+
+Compara três formas de somar um valor ao saldo de um único usuário:
+
+- leitura+escrita: o handler antigo (SELECT, soma em Python, COMMIT), que perde atualizações;
+- lock pessimista: SELECT ... FOR UPDATE antes da soma. O SQLite não tem lock de linha,
+  então o equivalente usado aqui é abrir a transação com BEGIN IMMEDIATE;
+- upsert: o INSERT ... ON CONFLICT/ON DUPLICATE KEY UPDATE usado por add_transport_balance.
+
+Para cada abordagem imprime recargas/segundo e se o saldo final ficou exato.
+
+Uso: BENCH_ROUND_TRIP_MS=2 python benchmarks/bench_balance_updates.py [recargas] [concorrencia]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy import event, exc, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from common import ROUND_TRIP, remote_connect_args
+
+from database import Base
+from models import Transport, Users
+from routers.transport import credit_balance_statement
+
+TOP_UPS = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+CONCURRENCY = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+AMOUNT = Decimal("0.50")
+
+
+async def read_modify_write(db, user_id):
+    transport = await db.scalar(select(Transport).where(Transport.user_id == user_id))
+    if not transport:
+        transport = Transport(user_id=user_id, balance=Decimal(0))
+        db.add(transport)
+    transport.balance += AMOUNT
+    await db.commit()
+
+
+async def select_for_update(db, user_id):
+    transport = await db.scalar(select(Transport).where(Transport.user_id == user_id).with_for_update())
+    if not transport:
+        transport = Transport(user_id=user_id, balance=Decimal(0))
+        db.add(transport)
+    transport.balance += AMOUNT
+    await db.commit()
+
+
+async def upsert(db, user_id):
+    await db.execute(credit_balance_statement(db.get_bind().dialect.name, user_id, AMOUNT, date.today()))
+    await db.commit()
+
+
+def build_engine(path, immediate_transactions=False):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}",
+                                 connect_args={**remote_connect_args(), "timeout": 60},
+                                 pool_size=CONCURRENCY)
+    if immediate_transactions:
+        @event.listens_for(engine.sync_engine, "connect")
+        def disable_pysqlite_transactions(dbapi_connection, connection_record):
+            dbapi_connection.isolation_level = None
+
+        @event.listens_for(engine.sync_engine, "begin")
+        def begin_immediate(connection):
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+    return engine
+
+
+async def run(path, approach, immediate_transactions=False):
+    engine = build_engine(path, immediate_transactions)
+    session_factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+        await connection.run_sync(Base.metadata.create_all)
+    async with session_factory() as db:
+        user = Users(username="bench", hashed_password="x")
+        db.add(user)
+        await db.commit()
+
+    remaining = TOP_UPS
+    errors = 0
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            async with session_factory() as db:
+                try:
+                    await approach(db, user.id)
+                except exc.DBAPIError:
+                    errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(CONCURRENCY)))
+    elapsed = time.perf_counter() - started
+
+    async with session_factory() as db:
+        balances = (await db.scalars(select(Transport.balance).where(Transport.user_id == user.id))).all()
+    await engine.dispose()
+    return TOP_UPS / elapsed, balances, errors
+
+
+async def main():
+    expected = AMOUNT * TOP_UPS
+    print(f"{TOP_UPS} recargas de R$ {AMOUNT}, {CONCURRENCY} concorrentes, "
+          f"round trip simulado de {ROUND_TRIP * 1000:.1f} ms; saldo esperado R$ {expected}")
+    print(f"{'abordagem':>16} | {'recargas/s':>10} | {'linhas':>6} | {'erros':>5} | saldo final")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        for name, approach, immediate in (
+                ("leitura+escrita", read_modify_write, False),
+                ("lock pessimista", select_for_update, True),
+                ("upsert", upsert, False)):
+            throughput, balances, errors = await run(path, approach, immediate)
+            total = sum(balances, Decimal(0))
+            status = "exato" if total == expected and len(balances) == 1 else "INCORRETO"
+            print(f"{name:>16} | {throughput:>10.1f} | {len(balances):>6} | {errors:>5} | R$ {total} ({status})")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,90 @@
+"""Benchmark do reconhecimento de intenções do chatbot.
+
+Compara a cadeia de if/elif antiga (várias chamadas a lower() e buscas por substring)
+com o IntentMatcher sobre um corpus gerado de perguntas rotuladas, imprimindo o tempo
+por pergunta e a taxa de acerto de cada um.
+
+Uso: python benchmarks/bench_chatbot_intents.py [perguntas]
+"""
+import random
+import sys
+import time
+
+from common import ROUND_TRIP  # noqa: F401  (ajusta o sys.path)
+
+from routers.chatbot import intent_matcher
+
+QUESTIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+REPEATS = 5
+
+TEMPLATES = {
+    "greeting": ["Olá!", "olá, tudo bem?", "Ola, bom dia", "OLÁ chatbot"],
+    "farewell": ["tchau", "Tchau, obrigado!", "valeu, tchau"],
+    "documents": ["quais são meus documentos?", "mostrar documentos", "meus docs", "ver Documento"],
+    "cpf": ["qual é o meu CPF?", "me mostra o c.p.f", "número do cpf por favor"],
+    "rg": ["qual meu RG?", "mostrar minha identidade", "número da r.g"],
+    "vaccination_card": ["minha carteira de vacinação", "quais vacinas eu tomei?", "Vacinação em dia?"],
+    "cnh": ["minha CNH", "mostrar carteira de motorista", "validade da cnh"],
+    "balance": ["qual meu saldo?", "saldo do cartão de transporte", "show my balance"],
+    None: ["estou com uma emergência", "preciso de ajuda na escola", "qual o cargo dele?",
+           "o docente faltou", "bom dia", "quanto custa a passagem?"],
+}
+
+
+def legacy_intent(question):
+    """A cadeia de condições do handler antigo, devolvendo a intenção em vez da resposta."""
+    if "ola" in question.lower():
+        return "greeting"
+    elif "tchau" in question.lower():
+        return "farewell"
+    elif any(keyword in question.lower() for keyword in ["document", "doc", "documento"]):
+        return "documents"
+    elif any(keyword in question.lower() for keyword in ["cpf", "c.p.f"]):
+        return "cpf"
+    elif any(keyword in question.lower() for keyword in ["rg", "r.g", "identidade"]):
+        return "rg"
+    elif any(keyword in question.lower() for keyword in ["vacina", "vacinação", "vaccination"]):
+        return "vaccination_card"
+    elif any(keyword in question.lower() for keyword in ["cnh", "carteira de motorista"]):
+        return "cnh"
+    elif any(keyword in question.lower() for keyword in ["saldo", "balance"]):
+        return "balance"
+    return None
+
+
+def matcher_intent(question):
+    intents = intent_matcher.match(question)
+    return intents[0] if intents else None
+
+
+def build_corpus():
+    generator = random.Random(42)
+    labels = list(TEMPLATES)
+    corpus = []
+    for _ in range(QUESTIONS):
+        label = generator.choice(labels)
+        corpus.append((generator.choice(TEMPLATES[label]), label))
+    return corpus
+
+
+def measure(classify, corpus):
+    best = float("inf")
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        answers = [classify(question) for question, _ in corpus]
+        best = min(best, time.perf_counter() - started)
+    correct = sum(answer == label for answer, (_, label) in zip(answers, corpus))
+    return best / len(corpus) * 1e6, correct / len(corpus)
+
+
+def main():
+    corpus = build_corpus()
+    print(f"{QUESTIONS} perguntas, melhor de {REPEATS} execuções")
+    print(f"{'abordagem':>16} | {'µs/pergunta':>11} | acerto")
+    for name, classify in (("cadeia if/elif", legacy_intent), ("IntentMatcher", matcher_intent)):
+        per_question, accuracy = measure(classify, corpus)
+        print(f"{name:>16} | {per_question:>11.2f} | {accuracy:.1%}")
+
+
+if __name__ == "__main__":
+    main()
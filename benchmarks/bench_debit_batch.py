@@ -0,0 +1,75 @@
+"""Benchmark de ingestão de débitos de tarifa em POST /transport/debits/batch.
+
+Envia o mesmo total de passagens em lotes de 1, 100 e 1000 e imprime passagens/segundo.
+
+Uso: BENCH_ROUND_TRIP_MS=2 python benchmarks/bench_debit_batch.py [passagens_por_tamanho]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from decimal import Decimal
+
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from common import ROUND_TRIP, install_async_db
+
+import routers.transport
+from database import Base
+from main import app
+from models import Transport, Users
+
+TAPS = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+BATCH_SIZES = (1, 100, 1000)
+USERS = 1000
+VALIDATOR_KEY = "benchmark"
+
+
+def seed(path):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        db.add_all(Users(id=user_id, username=f"passageiro{user_id}", hashed_password="x")
+                   for user_id in range(1, USERS + 1))
+        db.add_all(Transport(user_id=user_id, balance=Decimal("100000.00"))
+                   for user_id in range(1, USERS + 1))
+        db.commit()
+    engine.dispose()
+
+
+async def run(batch_size, offset):
+    taps = [{"user_id": index % USERS + 1, "amount": "4.70", "idempotency_key": f"tap-{offset + index}"}
+            for index in range(TAPS)]
+    headers = {"X-Validator-Key": VALIDATOR_KEY}
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        started = time.perf_counter()
+        for start in range(0, TAPS, batch_size):
+            response = await client.post("/transport/debits/batch", headers=headers,
+                                         json={"taps": taps[start:start + batch_size]})
+            assert response.status_code == 200, response.text
+        return TAPS / (time.perf_counter() - started)
+
+
+async def main():
+    routers.transport.VALIDATOR_API_KEY = VALIDATOR_KEY
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        seed(path)
+        engine = install_async_db(f"sqlite+aiosqlite:///{path}", pool_size=5)
+
+        print(f"{TAPS} passagens por tamanho de lote, round trip simulado de {ROUND_TRIP * 1000:.1f} ms")
+        print(f"{'lote':>6} | {'passagens/s':>11}")
+        for index, batch_size in enumerate(BATCH_SIZES):
+            throughput = await run(batch_size, offset=index * TAPS)
+            print(f"{batch_size:>6} | {throughput:>11.1f}")
+
+        await engine.dispose()
+        app.dependency_overrides.clear()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,118 @@
+"""Benchmark de importação em lote de documentos (POST /admin/documents/import) no SQLite.
+
+Importa registros mistos de CPF, RG, CNH e carteira de vacinação enviados em streaming,
+em NDJSON e em CSV, e compara com o cadastro registro a registro pelas rotas create_*.
+
+Uso: BENCH_ROUND_TRIP_MS=2 python benchmarks/bench_document_import.py [registros]
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from common import ROUND_TRIP, install_async_db
+
+import routers.admin
+from database import Base
+from main import app
+from models import Users
+from routers.auth import create_access_token
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+PER_ROW_SAMPLE = 200
+USERS = 5000
+ADMIN_KEY = "benchmark"
+CSV_COLUMNS = ["type", "user_id", "id", "number", "name", "uf", "issued_by", "issued_date",
+               "expiration_date", "category", "birth_date", "gender"]
+
+
+def build_rows(offset):
+    rows = []
+    for index in range(ROWS):
+        number = f"{offset + index:010d}"
+        row = {"user_id": index % USERS + 1, "id": 0, "number": number, "name": f"Pessoa {index}",
+               "issued_by": "Detran RJ", "issued_date": "2020-01-01"}
+        kind = ("cpf", "rg", "cnh", "vaccination_card")[index % 4]
+        if kind == "cnh":
+            row.update(uf="RJ", expiration_date="2030-01-01", category="B")
+        elif kind == "vaccination_card":
+            row.update(birth_date="1990-01-01", expiration_date="2030-01-01", gender="F")
+        rows.append({"type": kind, **row})
+    return rows
+
+
+def to_ndjson(rows):
+    return "\n".join(json.dumps(row) for row in rows).encode()
+
+
+def to_csv(rows):
+    lines = [",".join(CSV_COLUMNS)]
+    lines.extend(",".join(str(row.get(column, "")) for column in CSV_COLUMNS) for row in rows)
+    return "\n".join(lines).encode()
+
+
+async def stream(body, chunk_size=64 * 1024):
+    for start in range(0, len(body), chunk_size):
+        yield body[start:start + chunk_size]
+
+
+async def import_body(client, body, content_type):
+    headers = {"X-Admin-Key": ADMIN_KEY, "Content-Type": content_type}
+    started = time.perf_counter()
+    response = await client.post("/admin/documents/import", content=stream(body), headers=headers)
+    elapsed = time.perf_counter() - started
+    result = response.json()
+    assert not result["errors"], result["errors"][:3]
+    return result["imported"] / elapsed
+
+
+async def create_one_by_one(client, rows):
+    started = time.perf_counter()
+    for row in rows:
+        token = create_access_token(f"usuario{row['user_id']}", row["user_id"], timedelta(minutes=20))
+        payload = {key: value for key, value in row.items() if key not in ("type", "user_id")}
+        response = await client.post(f"/documents/{row['type']}", json=payload,
+                                     cookies={"access_token": f"Bearer {token}"})
+        assert response.status_code == 201, response.text
+    return len(rows) / (time.perf_counter() - started)
+
+
+async def main():
+    routers.admin.ADMIN_API_KEY = ADMIN_KEY
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        engine = create_engine(f"sqlite:///{path}")
+        Base.metadata.create_all(engine)
+        with Session(engine) as db:
+            db.add_all(Users(id=user_id, username=f"usuario{user_id}", hashed_password="x")
+                       for user_id in range(1, USERS + 1))
+            db.commit()
+        engine.dispose()
+
+        async_engine = install_async_db(f"sqlite+aiosqlite:///{path}", pool_size=5)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench",
+                                     timeout=None) as client:
+            ndjson_rate = await import_body(client, to_ndjson(build_rows(0)), "application/x-ndjson")
+            csv_rate = await import_body(client, to_csv(build_rows(ROWS)), "text/csv")
+            per_row_rows = build_rows(2 * ROWS)[:PER_ROW_SAMPLE]
+            per_row_rate = await create_one_by_one(client, per_row_rows)
+
+        print(f"{ROWS} registros por formato, lotes de {routers.admin.IMPORT_CHUNK_SIZE}, "
+              f"round trip simulado de {ROUND_TRIP * 1000:.1f} ms")
+        print(f"importação NDJSON:             {ndjson_rate:10.1f} registros/s")
+        print(f"importação CSV:                {csv_rate:10.1f} registros/s")
+        print(f"create_* registro a registro:  {per_row_rate:10.1f} registros/s")
+
+        await async_engine.dispose()
+        app.dependency_overrides.clear()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,133 @@
+"""Logins legítimos durante um ataque de credential stuffing, com e sem o limite de tentativas.
+
+Usuários legítimos, cada um no seu IP, fazem login a cada LOGIN_INTERVAL segundos
+enquanto ATTACKERS tarefas por IP de ataque disparam tentativas com nomes de uma lista
+vazada, quase todos inexistentes. Roda uma vez com limites altos o bastante para não
+barrar nada e outra com os limites de throttling.py, e imprime a vazão e a latência
+p50/p99 dos logins legítimos e o destino das tentativas do ataque.
+
+Uso: python benchmarks/bench_login_throttling.py [segundos] [ips_de_ataque]
+"""
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from common import install_async_db
+
+import routers.auth
+import throttling
+from database import Base
+from hashing import bcrypt_context
+from main import app
+from models import Users
+from throttling import LoginThrottle, TokenBuckets
+
+DURATION = float(sys.argv[1]) if len(sys.argv) > 1 else 60
+ATTACK_IPS = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+ATTACKERS = 10
+USERS = 20
+LEAKED_USERNAMES = 100000
+LOGIN_INTERVAL = 20.0
+STEADY_AFTER = 15.0
+PASSWORD = "senhalegitima123"
+
+
+def seed(path):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    hashed_password = bcrypt_context.hash(PASSWORD)
+    with Session(engine) as db:
+        db.add_all(Users(username=f"usuario{index}", hashed_password=hashed_password) for index in range(USERS))
+        db.commit()
+    engine.dispose()
+
+
+def unlimited_throttle():
+    return LoginThrottle(TokenBuckets("bench_username", 10**9, 10**9, 10**6),
+                         TokenBuckets("bench_ip", 10**9, 10**9, 10**6))
+
+
+def client_for(ip):
+    transport = httpx.ASGITransport(app=app, client=(ip, 123))
+    return httpx.AsyncClient(transport=transport, base_url="http://bench")
+
+
+async def legitimate_user(index, deadline, latencies, statuses):
+    async with client_for(f"192.168.0.{index + 1}") as client:
+        await asyncio.sleep(random.random() * LOGIN_INTERVAL)
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = await client.post("/auth/token", data={"username": f"usuario{index}", "password": PASSWORD})
+            statuses[response.status_code] += 1
+            if response.status_code == 200:
+                latencies.append((started, time.perf_counter() - started))
+            await asyncio.sleep(LOGIN_INTERVAL)
+
+
+async def attacker(client, deadline, statuses):
+    guesses = random.Random()
+    while time.perf_counter() < deadline:
+        # Lista vazada: quase nenhum nome existe aqui, e os dos usuários legítimos são raros
+        username = f"usuario{guesses.randrange(LEAKED_USERNAMES)}"
+        response = await client.post("/auth/token", data={"username": username, "password": "123456"})
+        statuses[response.status_code] += 1
+        if response.status_code == 429:
+            # O atacante ignora o Retry-After; a pausa só evita que o cliente dele, que roda
+            # neste mesmo processo, dispute a CPU com o servidor
+            await asyncio.sleep(0.1)
+
+
+async def run(throttle):
+    routers.auth.login_throttle = throttle
+    latencies, legitimate, attack = [], Counter(), Counter()
+    started = time.perf_counter()
+    deadline = started + DURATION
+    attack_clients = [client_for(f"10.0.0.{index + 1}") for index in range(ATTACK_IPS)]
+    await asyncio.gather(
+        *(legitimate_user(index, deadline, latencies, legitimate) for index in range(USERS)),
+        *(attacker(client, deadline, attack) for client in attack_clients for _ in range(ATTACKERS)),
+    )
+    for client in attack_clients:
+        await client.aclose()
+    return started, latencies, legitimate, attack
+
+
+def percentiles(latencies):
+    if len(latencies) < 2:
+        return "amostras insuficientes"
+    quantiles = statistics.quantiles(latencies, n=100)
+    return f"p50 {quantiles[49] * 1000:7.1f} ms, p99 {quantiles[98] * 1000:7.1f} ms"
+
+
+def report(title, started, latencies, legitimate, attack):
+    # A rajada permitida a cada IP de ataque se esgota nos primeiros segundos
+    steady = [latency for moment, latency in latencies if moment - started >= STEADY_AFTER]
+    print(title)
+    print(f"  legítimos: {len(latencies) / DURATION:5.2f} logins/s, respostas {dict(legitimate)}")
+    print(f"    período todo: {percentiles([latency for _, latency in latencies])}")
+    print(f"    após {STEADY_AFTER:.0f} s:    {percentiles(steady)}")
+    print(f"  ataque: {sum(attack.values())} tentativas, respostas {dict(attack)}")
+
+
+async def main():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        seed(path)
+        engine = install_async_db(f"sqlite+aiosqlite:///{path}")
+        print(f"{DURATION:.0f} s de ataque de {ATTACK_IPS} IPs x {ATTACKERS} tarefas, {USERS} usuários legítimos")
+        report("sem limite:", *await run(unlimited_throttle()))
+        report("com limite:", *await run(throttling.login_throttle))
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
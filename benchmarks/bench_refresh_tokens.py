@@ -0,0 +1,68 @@
+"""Custo de manter uma sessão ativa com e sem refresh token.
+
+O access token vale ACCESS_TOKEN_EXPIRE (20 min), então uma hora de uso exige três
+emissões. Sem refresh, cada uma é um novo login em /auth/token (bcrypt); com refresh,
+é uma chamada a /auth/refresh (HMAC e uma busca pelo índice de token_hash). Mede as
+duas rotas e imprime o custo por hora de atividade de cada estratégia.
+
+Uso: BENCH_ROUND_TRIP_MS=2 python benchmarks/bench_refresh_tokens.py [chamadas]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+import httpx
+
+from common import ROUND_TRIP, install_async_db
+
+from database import Base
+from main import app
+from routers.auth import ACCESS_TOKEN_EXPIRE
+
+CALLS = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+CREDENTIALS = {"username": "bench", "password": "senhabench123"}
+RENEWALS_PER_HOUR = timedelta(hours=1) // ACCESS_TOKEN_EXPIRE
+
+
+async def measure(call):
+    await call()
+    started = time.perf_counter()
+    for _ in range(CALLS):
+        await call()
+    return (time.perf_counter() - started) / CALLS * 1000
+
+
+async def main():
+    with tempfile.TemporaryDirectory() as directory:
+        engine = install_async_db(f"sqlite+aiosqlite:///{os.path.join(directory, 'bench.db')}")
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            assert (await client.post("/auth/", json=CREDENTIALS)).status_code == 201
+
+            async def login():
+                response = await client.post("/auth/token", data=CREDENTIALS)
+                assert response.status_code == 200, response.text
+
+            async def refresh():
+                response = await client.post("/auth/refresh")
+                assert response.status_code == 200, response.text
+
+            login_ms = await measure(login)
+            refresh_ms = await measure(refresh)
+        await engine.dispose()
+
+    print(f"{CALLS} chamadas por rota, ida e volta ao banco de {ROUND_TRIP * 1000:.0f} ms")
+    print(f"/auth/token:   {login_ms:8.2f} ms/chamada")
+    print(f"/auth/refresh: {refresh_ms:8.2f} ms/chamada ({login_ms / refresh_ms:.1f}x mais barato)")
+    print(f"por hora de atividade ({RENEWALS_PER_HOUR} emissões):")
+    print(f"  sem refresh: {login_ms * RENEWALS_PER_HOUR:8.2f} ms")
+    print(f"  com refresh: {refresh_ms * RENEWALS_PER_HOUR:8.2f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,57 @@
+"""Custo do RequestMetricsMiddleware por requisição.
+
+Chama um app ASGI mínimo diretamente, com e sem o middleware, e imprime o tempo
+médio por requisição de cada um e a diferença.
+
+Uso: python benchmarks/bench_request_metrics.py [requisicoes]
+"""
+import asyncio
+import sys
+import time
+
+from common import ROUND_TRIP  # noqa: F401  (ajusta o sys.path)
+
+from middleware import RequestMetricsMiddleware
+
+REQUESTS = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+REPEATS = 5
+
+
+class Route:
+    path = "/bench/{item}"
+
+
+async def endpoint(scope, receive, send):
+    scope["route"] = Route
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def receive():
+    return {"type": "http.request", "body": b""}
+
+
+async def send(message):
+    pass
+
+
+async def measure(app):
+    best = float("inf")
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        for _ in range(REQUESTS):
+            await app({"type": "http", "method": "GET", "path": "/bench/1"}, receive, send)
+        best = min(best, time.perf_counter() - started)
+    return best / REQUESTS * 1e6
+
+
+async def main():
+    bare = await measure(endpoint)
+    instrumented = await measure(RequestMetricsMiddleware(endpoint))
+    print(f"{REQUESTS} requisições, melhor de {REPEATS} execuções")
+    print(f"sem middleware: {bare:6.2f} µs/requisição")
+    print(f"com middleware: {instrumented:6.2f} µs/requisição (+{instrumented - bare:.2f} µs)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,108 @@
+"""Micro-benchmark da serialização de uma carteira completa (GET /documents/).
+
+Compara, para um Documents com os quatro documentos preenchidos:
+
+- ORM + jsonable_encoder: a rota original, que devolvia as instâncias do SQLAlchemy;
+- dicionários + jsonable_encoder: colunas copiadas para dicts, como o cache guardava;
+- response model + orjson: WalletResponse carregado da linha ORM, model_dump e orjson.dumps
+  (o que faria um ORJSONResponse como classe de resposta padrão);
+- response model + dump_json: WalletResponse serializado direto em bytes pelo pydantic-core,
+  o caminho que o FastAPI usa quando a rota declara response_model e mantém a resposta padrão.
+
+Uso: python benchmarks/bench_serialization.py [iteracoes]
+"""
+import sys
+import time
+from datetime import date
+
+from common import ROUND_TRIP  # noqa: F401  (ajusta o sys.path)
+
+try:
+    import orjson
+except ImportError:  # o orjson não é dependência da aplicação, só desta comparação
+    orjson = None
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from sqlalchemy.orm.attributes import set_committed_value
+
+from models import Cnh, Cpf, Documents, Rg, VaccinationCard
+from routers.documents import WALLET_RELATIONSHIPS
+from schemas import DocumentsResponse, WalletResponse
+
+ITERATIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+REPEATS = 5
+
+
+def build_wallet():
+    """Carteira como o joinedload a entrega: relacionamentos preenchidos sem disparar os backrefs."""
+    wallet = Documents(id=1, user_id=1)
+    documents = {
+        "cpf": Cpf(id=1, number="11122233344", name="Usuario Teste", issued_by="Receita Federal",
+                   issued_date=date(2020, 1, 1)),
+        "rg": Rg(id=1, number="1112223334", name="Usuario Teste", issued_by="Detran RJ",
+                 issued_date=date(2015, 6, 10)),
+        "cnh": Cnh(id=1, number="11122233344", name="Usuario Teste", uf="RJ", issued_by="Detran RJ",
+                   issued_date=date(2019, 3, 1), expiration_date=date(2029, 3, 1), category="B"),
+        "vaccination_card": VaccinationCard(id=1, number="11122233344", name="Usuario Teste",
+                                            birth_date=date(1990, 5, 5), issued_date=date(2021, 7, 1),
+                                            expiration_date=date(2031, 7, 1), gender="M"),
+    }
+    for name, document in documents.items():
+        set_committed_value(wallet, name, document)
+    return wallet
+
+
+def document_to_dict(document):
+    return {column.key: getattr(document, column.key) for column in document.__table__.columns}
+
+
+def orm_encoder(wallet):
+    documents = {name: getattr(wallet, name) for name in WALLET_RELATIONSHIPS}
+    return JSONResponse(jsonable_encoder({"documents": documents})).body
+
+
+def dict_encoder(wallet):
+    documents = {name: document_to_dict(getattr(wallet, name)) for name in WALLET_RELATIONSHIPS}
+    return JSONResponse(jsonable_encoder({"documents": documents})).body
+
+
+def model_orjson(wallet):
+    response = DocumentsResponse(documents=WalletResponse.model_validate(wallet))
+    return orjson.dumps(response.model_dump(mode="json"))
+
+
+documents_adapter = TypeAdapter(DocumentsResponse)
+
+def model_dump_json(wallet):
+    response = DocumentsResponse(documents=WalletResponse.model_validate(wallet))
+    return documents_adapter.dump_json(response)
+
+
+def measure(serialize, wallet):
+    best = float("inf")
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        for _ in range(ITERATIONS):
+            serialize(wallet)
+        best = min(best, time.perf_counter() - started)
+    return best / ITERATIONS * 1e6
+
+
+def main():
+    wallet = build_wallet()
+    print(f"{ITERATIONS} serializações de uma carteira completa, melhor de {REPEATS} execuções")
+    print(f"{'caminho':>32} | {'µs/resposta':>11} | bytes")
+    for name, serialize in (("ORM + jsonable_encoder", orm_encoder),
+                            ("dicionários + jsonable_encoder", dict_encoder),
+                            ("response model + orjson", model_orjson),
+                            ("response model + dump_json", model_dump_json)):
+        if serialize is model_orjson and orjson is None:
+            print(f"{name:>32} | (instale o orjson para comparar)")
+            continue
+        print(f"{name:>32} | {measure(serialize, wallet):>11.2f} | {len(serialize(wallet))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Micro-benchmark da dependência get_current_user com e sem o cache de tokens.
+
+Uso: python benchmarks/bench_token_cache.py [chamadas]
+"""
+import asyncio
+import os
+import sys
+import time
+from datetime import timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from starlette.requests import Request
+
+import routers.auth
+from cache import LRUCache
+from routers.auth import create_access_token, get_current_user
+
+CALLS = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+
+
+def build_request(token):
+    cookie = f'access_token="Bearer {token}"'.encode()
+    return Request({"type": "http", "headers": [(b"cookie", cookie)]})
+
+
+async def measure(request):
+    await get_current_user(request)
+    started = time.perf_counter()
+    for _ in range(CALLS):
+        await get_current_user(request)
+    return (time.perf_counter() - started) / CALLS * 1_000_000
+
+
+async def main():
+    request = build_request(create_access_token("bench", 1, timedelta(minutes=20)))
+
+    routers.auth.token_cache = LRUCache("token_bench_off", max_entries=0)
+    without_cache = await measure(request)
+
+    routers.auth.token_cache = LRUCache("token_bench_on", max_entries=10000)
+    with_cache = await measure(request)
+
+    print(f"{CALLS} chamadas de get_current_user")
+    print(f"sem cache: {without_cache:8.2f} µs/chamada")
+    print(f"com cache: {with_cache:8.2f} µs/chamada ({without_cache / with_cache:.1f}x)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,112 @@
+"""Benchmark do cache da carteira: taxa de acerto e latência economizada.
+
+Simula uma carga mista de leituras (GET /documents/, GET /transport/balance) e
+escritas (POST /transport/add_balance) sobre vários usuários, com o cache da
+carteira desligado e ligado, e imprime a latência média de leitura, a taxa de
+acerto e o tempo de carga que o cache evitou.
+
+Uso: BENCH_ROUND_TRIP_MS=2 python benchmarks/bench_wallet_cache.py [operacoes] [proporcao_escritas]
+"""
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from common import ROUND_TRIP, install_async_db
+
+import cache
+from cache import WALLET_CACHE_MAX_BYTES, WALLET_CACHE_TTL, WalletCache, cache_latency_saved_seconds_total
+from database import Base
+from main import app
+from models import Cpf, Documents, Transport, Users
+from routers import documents, transport
+from routers.auth import create_access_token
+
+OPERATIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+WRITE_RATIO = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+USERS = 200
+CONCURRENCY = 10
+
+
+def seed(path):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    tokens = []
+    with Session(engine) as db:
+        for index in range(USERS):
+            user = Users(username=f"bench{index}", hashed_password="x")
+            cpf = Cpf(number=f"{index:011d}", name=f"Usuario {index}", issued_by="Receita Federal",
+                      issued_date=date(2020, 1, 1))
+            db.add_all([user, cpf])
+            db.flush()
+            db.add(Documents(user_id=user.id, cpf_id=cpf.id))
+            db.add(Transport(user_id=user.id, balance=Decimal("10.00")))
+            tokens.append(create_access_token(user.username, user.id, timedelta(minutes=20)))
+        db.commit()
+    engine.dispose()
+    return tokens
+
+
+def use_wallet_cache(wallet_cache):
+    cache.wallet_cache = documents.wallet_cache = transport.wallet_cache = wallet_cache
+
+
+async def run(tokens):
+    operations = random.Random(42)
+    plan = [(operations.choice(tokens), operations.random()) for _ in range(OPERATIONS)]
+    read_latencies = []
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def worker():
+            while plan:
+                token, draw = plan.pop()
+                cookies = {"access_token": f"Bearer {token}"}
+                if draw < WRITE_RATIO:
+                    await client.post("/transport/add_balance", params={"amount": 1}, cookies=cookies)
+                    continue
+                path = "/documents/" if draw < (1 + WRITE_RATIO) / 2 else "/transport/balance"
+                started = time.perf_counter()
+                response = await client.get(path, cookies=cookies)
+                read_latencies.append(time.perf_counter() - started)
+                assert response.status_code == 200, response.text
+
+        await asyncio.gather(*(worker() for _ in range(CONCURRENCY)))
+
+    return sum(read_latencies) / len(read_latencies) * 1000
+
+
+async def main():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        tokens = seed(path)
+        engine = install_async_db(f"sqlite+aiosqlite:///{path}", pool_size=CONCURRENCY)
+
+        use_wallet_cache(WalletCache("wallet_bench_off", 0, None, WALLET_CACHE_TTL))
+        without_cache = await run(tokens)
+
+        wallet_cache = WalletCache("wallet_bench_on", 10000, WALLET_CACHE_MAX_BYTES, WALLET_CACHE_TTL)
+        use_wallet_cache(wallet_cache)
+        with_cache = await run(tokens)
+
+        print(f"{OPERATIONS} operações, {WRITE_RATIO:.0%} escritas, {USERS} usuários, "
+              f"round trip simulado de {ROUND_TRIP * 1000:.1f} ms")
+        print(f"latência média de leitura sem cache: {without_cache:6.2f} ms")
+        print(f"latência média de leitura com cache: {with_cache:6.2f} ms")
+        print(f"taxa de acerto: {wallet_cache.hit_ratio:.1%}")
+        saved = cache_latency_saved_seconds_total.get(cache="wallet_bench_on")
+        print(f"tempo de carga evitado: {saved:.2f} s")
+
+        await engine.dispose()
+        app.dependency_overrides.clear()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,43 @@
+"""Utilitários compartilhados pelos benchmarks.
+
+Os benchmarks usam um SQLite em arquivo cuja conexão dorme BENCH_ROUND_TRIP_MS
+milissegundos a cada comando, na thread que executa o SQL, simulando a ida e volta
+de rede até o MySQL.
+"""
+import os
+import sqlite3
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from database import get_db, instrument_engine
+from main import app
+
+ROUND_TRIP = float(os.getenv("BENCH_ROUND_TRIP_MS", "2")) / 1000
+
+
+class RemoteConnection(sqlite3.Connection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if ROUND_TRIP:
+            self.set_trace_callback(lambda statement: time.sleep(ROUND_TRIP))
+
+
+def remote_connect_args():
+    return {"factory": RemoteConnection, "check_same_thread": False}
+
+
+def install_async_db(url, pool_size=100):
+    """Aponta o get_db da aplicação para `url` e devolve o engine criado."""
+    engine = instrument_engine(create_async_engine(url, connect_args=remote_connect_args(), pool_size=pool_size))
+    session_factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+
+    async def override_get_db():
+        async with session_factory() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    return engine
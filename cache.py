@@ -0,0 +1,171 @@
+import os
+import pickle
+import time
+from collections import OrderedDict
+
+from metrics import Counter, Gauge
+
+cache_hits_total = Counter("cache_hits_total", "Acertos nos caches em memória.", ("cache",))
+cache_misses_total = Counter("cache_misses_total", "Falhas nos caches em memória.", ("cache",))
+cache_entries = Gauge("cache_entries", "Entradas atualmente armazenadas nos caches em memória.", ("cache",))
+cache_bytes = Gauge("cache_bytes", "Tamanho estimado, em bytes, das entradas dos caches em memória.", ("cache",))
+cache_hit_ratio = Gauge("cache_hit_ratio", "Proporção de acertos desde o início do processo.", ("cache",))
+cache_latency_saved_seconds_total = Counter(
+    "cache_latency_saved_seconds_total",
+    "Tempo de carga estimado que os acertos evitaram (média móvel da carga x acertos).",
+    ("cache",))
+
+WALLET_CACHE_SIZE = int(os.getenv("WALLET_CACHE_SIZE", "10000"))
+WALLET_CACHE_MAX_BYTES = int(os.getenv("WALLET_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+WALLET_CACHE_TTL = float(os.getenv("WALLET_CACHE_TTL", "60"))
+
+
+def estimate_size(value) -> int:
+    return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+class LRUCache:
+    """Cache LRU em memória com expiração por entrada.
+
+    Cada entrada guarda o instante (timestamp UNIX) em que expira; entradas expiradas
+    nunca são devolvidas e são removidas no primeiro acesso. Com `max_bytes` o cache
+    também descarta as entradas menos usadas até caber no orçamento de memória. Com
+    `max_entries=0` o cache fica desligado e apenas contabiliza falhas.
+    """
+
+    def __init__(self, name: str, max_entries: int, max_bytes: int | None = None, clock=time.time):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._bytes = 0
+        cache_entries.set_function(lambda: len(self._entries), cache=name)
+        cache_bytes.set_function(lambda: self._bytes, cache=name)
+        cache_hit_ratio.set_function(lambda: self.hit_ratio, cache=name)
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def hits(self) -> int:
+        return cache_hits_total.get(cache=self.name)
+
+    @property
+    def misses(self) -> int:
+        return cache_misses_total.get(cache=self.name)
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            cache_misses_total.inc(cache=self.name)
+            return None
+
+        expires_at, value, _ = entry
+        if expires_at <= self._clock():
+            self.delete(key)
+            cache_misses_total.inc(cache=self.name)
+            return None
+
+        self._entries.move_to_end(key)
+        cache_hits_total.inc(cache=self.name)
+        return value
+
+    def set(self, key, value, expires_at: float):
+        if self.max_entries <= 0 or expires_at <= self._clock():
+            return
+
+        size = estimate_size(value) if self.max_bytes is not None else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+
+        self.delete(key)
+        self._entries[key] = (expires_at, value, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or (
+                self.max_bytes is not None and self._bytes > self.max_bytes):
+            _, (_, _, evicted_size) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+
+    def delete(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+
+class WalletCache(LRUCache):
+    """Cache de leitura por usuário (documentos, saldo) com TTL e invalidação nas escritas.
+
+    As entradas são indexadas por (user_id, seção). `invalidate(user_id)` apaga todas as
+    seções do usuário e também impede que uma leitura iniciada antes da escrita grave no
+    cache o valor antigo que buscou no banco. A garantia vale dentro do processo; entre
+    workers diferentes o TTL limita por quanto tempo um valor antigo pode ser servido.
+    """
+
+    SECTIONS = ("documents", "balance", "documents_version", "balance_version")
+
+    def __init__(self, name: str, max_entries: int, max_bytes: int | None, ttl: float, clock=time.time):
+        super().__init__(name, max_entries, max_bytes, clock)
+        self.ttl = ttl
+        # user_id -> [leituras em andamento, geração]; existe só enquanto há leituras
+        self._loading = {}
+        self._load_seconds = 0.0
+
+    async def get_or_load(self, user_id: int, section: str, loader):
+        async def load():
+            return {section: await loader()}
+
+        return (await self.get_or_load_many(user_id, (section,), load))[section]
+
+    async def get_or_load_many(self, user_id: int, sections: tuple, loader) -> dict:
+        """Seções do usuário que só valem juntas (ex.: documentos e a versão deles).
+
+        Vêm todas do cache ou todas de uma única chamada a `loader()`, que devolve um dict
+        seção -> valor; assim nunca se misturam valores de leituras diferentes.
+        """
+        values = {section: self.get((user_id, section)) for section in sections}
+        if None not in values.values():
+            cache_latency_saved_seconds_total.inc(self._load_seconds, cache=self.name)
+            return values
+
+        state = self._loading.setdefault(user_id, [0, 0])
+        state[0] += 1
+        generation = state[1]
+        try:
+            started = time.perf_counter()
+            values = await loader()
+            elapsed = time.perf_counter() - started
+            self._load_seconds = elapsed if not self._load_seconds else 0.9 * self._load_seconds + 0.1 * elapsed
+        finally:
+            state[0] -= 1
+            if state[0] == 0:
+                del self._loading[user_id]
+
+        if state[1] == generation:
+            expires_at = self._clock() + self.ttl
+            for section in sections:
+                if values[section] is not None:
+                    self.set((user_id, section), values[section], expires_at=expires_at)
+        return values
+
+    def invalidate(self, user_id: int):
+        for section in self.SECTIONS:
+            self.delete((user_id, section))
+        if user_id in self._loading:
+            self._loading[user_id][1] += 1
+
+
+wallet_cache = WalletCache("wallet", WALLET_CACHE_SIZE, WALLET_CACHE_MAX_BYTES, WALLET_CACHE_TTL)
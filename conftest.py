@@ -0,0 +1,133 @@
+import asyncio
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from cache import wallet_cache
+import models  # noqa: F401  (registra as tabelas no metadata)
+from database import Base, get_db, instrument_engine
+from main import app
+from querylog import QueryLog
+from throttling import login_throttle
+from fastapi.testclient import TestClient
+
+# Banco SQLite em memória usado como substituto do MySQL nos testes
+TEST_DATABASE_URL = "sqlite+aiosqlite://"
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(autouse=True)
+def db_engine():
+    engine = instrument_engine(create_async_engine(
+        TEST_DATABASE_URL,
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    ))
+
+    async def create_tables():
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+
+    asyncio.run(create_tables())
+    session_factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+
+    async def override_get_db():
+        async with session_factory() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    wallet_cache.clear()
+    login_throttle.clear()
+    yield engine
+    app.dependency_overrides.pop(get_db, None)
+    asyncio.run(engine.dispose())
+
+
+@pytest.fixture
+def file_db_engine(tmp_path):
+    """SQLite em arquivo com pool de várias conexões, para testes de concorrência."""
+    engine = instrument_engine(create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'test.db'}",
+        connect_args={"timeout": 30},
+        pool_size=20,
+    ))
+
+    async def create_tables():
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+        await engine.dispose()
+
+    asyncio.run(create_tables())
+    session_factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+
+    async def override_get_db():
+        async with session_factory() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield engine
+    asyncio.run(engine.dispose())
+
+
+@pytest.fixture
+def db_session_factory(db_engine):
+    return async_sessionmaker(bind=db_engine, expire_on_commit=False)
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture
+def auth_client(client):
+    credentials = {"username": "usuario_teste", "password": "senhateste123"}
+    client.post("/auth/", json=credentials)
+    response = client.post("/auth/token", data=credentials)
+    assert response.status_code == 200
+    return client
+
+
+@pytest.fixture
+def query_counter(db_engine):
+    """Lista das instruções SQL executadas enquanto o teste roda."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    yield statements
+    event.remove(db_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+
+@pytest.fixture
+def query_budget(db_engine):
+    """Falha o teste se o bloco executar mais instruções SQL que o orçamento declarado.
+
+        with query_budget(1):
+            auth_client.get("/documents/")
+    """
+    @contextmanager
+    def budget(limit: int):
+        log = QueryLog(capture_stacks=True)
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            log.record(statement)
+
+        event.listen(db_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            yield log
+        finally:
+            event.remove(db_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+        if log.count > limit:
+            pytest.fail(f"{log.count} instruções SQL para um orçamento de {limit}:\n{log.report()}", pytrace=False)
+
+    return budget
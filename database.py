@@ -1,8 +1,241 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+import asyncio
+import logging
+import os
+import time
 
-DATABASE_URL = "mysql+pymysql://root:testeSenhaInfinita@db:3306/carteira_digital"
+from sqlalchemy import Select, event, exc, inspect, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(bind=engine)
-Base = declarative_base()
\ No newline at end of file
+from base import Base  # noqa: F401  (reexportado para quem importa de database)
+from cache import LRUCache
+from metrics import Counter, Gauge
+from querylog import request_queries
+
+logger = logging.getLogger(__name__)
+
+DATABASE_URL = os.getenv("DATABASE_URL", "mysql+aiomysql://root:testeSenhaInfinita@db:3306/carteira_digital")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+# Abaixo do wait_timeout do MySQL (8 h por padrão), que derruba conexões ociosas
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+DB_POOL_WARMUP = int(os.getenv("DB_POOL_WARMUP", str(DB_POOL_SIZE)))
+# Réplicas de leitura, separadas por vírgula; sem elas, as leituras também vão para o primário
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", "5"))
+REPLICA_CHECK_TIMEOUT = float(os.getenv("REPLICA_CHECK_TIMEOUT", "2"))
+# Por quanto tempo, depois de escrever, as leituras de um usuário continuam no primário
+# (deve cobrir o atraso de replicação)
+REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", "5"))
+REPLICA_STICKY_USERS = int(os.getenv("REPLICA_STICKY_USERS", "100000"))
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """QueuePool que mede a espera por uma conexão e conta os timeouts."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            db_pool_timeouts_total.inc()
+            raise
+        finally:
+            db_pool_checkouts_total.inc()
+            db_pool_wait_seconds_total.inc(time.perf_counter() - started)
+
+
+def instrument_engine(engine):
+    """Registra cada instrução SQL e o seu tempo no QueryLog da requisição corrente."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def start_query(conn, cursor, statement, parameters, context, executemany):
+        log = request_queries.get()
+        if log is not None:
+            log.record(statement)
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def finish_query(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        log = request_queries.get()
+        if log is not None:
+            log.seconds += elapsed
+
+    @event.listens_for(sync_engine, "handle_error")
+    def discard_timer(context):
+        if context.connection is not None and context.connection.info.get("query_started"):
+            context.connection.info["query_started"].pop()
+
+    return engine
+
+def build_engine(url: str = DATABASE_URL, **options):
+    """Cria o engine assíncrono com o pool configurado pelas variáveis DB_POOL_*."""
+    options = {
+        "poolclass": InstrumentedPool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        **options,
+    }
+    return create_async_engine(url, **options)
+
+# Colunas cujo índice único sustenta os upserts (ON DUPLICATE KEY / ON CONFLICT) das rotas
+UPSERT_UNIQUE_COLUMNS = (("transport", "user_id"), ("documents", "user_id"))
+
+def missing_unique_columns(connection) -> list:
+    """Colunas de UPSERT_UNIQUE_COLUMNS, como "tabela.coluna", sem índice único no banco."""
+    inspector = inspect(connection)
+    missing = []
+    for table, column in UPSERT_UNIQUE_COLUMNS:
+        unique = []
+        if inspector.has_table(table):
+            unique = [*inspector.get_unique_constraints(table),
+                      *(index for index in inspector.get_indexes(table) if index["unique"])]
+        if not any(entry["column_names"] == [column] for entry in unique):
+            missing.append(f"{table}.{column}")
+    return missing
+
+async def check_schema(engine):
+    """Impede a subida com um esquema anterior às migrações de que os upserts dependem.
+
+    Sem o índice único, o upsert do MySQL vira um INSERT comum e duplica linhas em vez
+    de atualizá-las. Como em warm_pool, um banco indisponível só é registrado.
+    """
+    try:
+        async with engine.connect() as connection:
+            missing = await connection.run_sync(missing_unique_columns)
+    except Exception as error:
+        logger.warning("Falha ao verificar o esquema do banco: %s", error)
+        return
+    if missing:
+        raise RuntimeError(
+            f"Índice único ausente em {', '.join(missing)}. Aplique as migrações com `alembic upgrade head`.")
+
+async def warm_pool(engine, connections: int = DB_POOL_WARMUP):
+    """Abre `connections` conexões ao mesmo tempo e as devolve ao pool.
+
+    Falhas são só registradas: a aplicação sobe mesmo se o banco ainda não estiver pronto.
+    """
+    opened = await asyncio.gather(*(engine.connect().start() for _ in range(connections)), return_exceptions=True)
+    for connection in opened:
+        if isinstance(connection, Exception):
+            logger.warning("Falha ao aquecer o pool de conexões: %s", connection)
+        else:
+            await connection.close()
+
+
+class RoutingSession(Session):
+    """Sessão que lê de uma réplica e escreve no primário (o bind da sessão).
+
+    A réplica vem de `info["replica"]` (ver use_replica) e só atende SELECTs. A primeira
+    instrução que não é leitura, ou o primeiro flush, descarta a réplica: dali em diante a
+    sessão usa só o primário e enxerga o que ela mesma gravou.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        replica = self.info.get("replica")
+        if replica is not None:
+            if isinstance(clause, Select) and not self._flushing:
+                return replica.sync_engine
+            del self.info["replica"]
+        return super().get_bind(mapper=mapper, clause=clause, **kw)
+
+
+class ReplicaPool:
+    """Réplicas de leitura em rodízio; as que falham na verificação saem do rodízio até voltarem."""
+
+    def __init__(self, engines: list, timeout: float = REPLICA_CHECK_TIMEOUT):
+        self.engines = engines
+        self.timeout = timeout
+        self.healthy = list(engines)
+        self._turn = 0
+        self._checker = None
+
+    def choose(self):
+        if not self.healthy:
+            return None
+        self._turn = (self._turn + 1) % len(self.healthy)
+        return self.healthy[self._turn]
+
+    async def _ping(self, engine) -> bool:
+        try:
+            async with asyncio.timeout(self.timeout):
+                async with engine.connect() as connection:
+                    await connection.execute(text("SELECT 1"))
+            return True
+        except Exception as error:
+            logger.warning("Réplica %s fora do rodízio: %r", engine.url.render_as_string(), error)
+            return False
+
+    async def check(self) -> list:
+        outcomes = await asyncio.gather(*(self._ping(engine) for engine in self.engines))
+        self.healthy = [engine for engine, up in zip(self.engines, outcomes) if up]
+        return self.healthy
+
+    def start(self, interval: float = REPLICA_CHECK_INTERVAL):
+        async def check_forever():
+            while True:
+                await self.check()
+                await asyncio.sleep(interval)
+
+        if self.engines:
+            self._checker = asyncio.ensure_future(check_forever())
+
+    async def stop(self):
+        if self._checker is not None:
+            self._checker.cancel()
+            await asyncio.gather(self._checker, return_exceptions=True)
+            self._checker = None
+
+
+# Usuários que escreveram há menos de REPLICA_STICKY_SECONDS
+recent_writers = LRUCache("replica_sticky_users", REPLICA_STICKY_USERS)
+
+def stick_to_primary(user_id: int):
+    """Mantém as próximas leituras do usuário no primário enquanto a escrita replica."""
+    if REPLICA_STICKY_SECONDS > 0:
+        recent_writers.set(user_id, True, expires_at=time.time() + REPLICA_STICKY_SECONDS)
+
+def use_replica(db: AsyncSession, user_id: int | None = None, pool: "ReplicaPool | None" = None) -> AsyncSession:
+    """Direciona os SELECTs da sessão para uma réplica saudável, se houver uma e o usuário
+    não tiver escrito há pouco."""
+    if user_id is not None and recent_writers.get(user_id) is not None:
+        return db
+    replica = (pool or replicas).choose()
+    if replica is not None:
+        db.info["replica"] = replica
+    return db
+
+
+db_pool_size = Gauge("db_pool_size", "Tamanho configurado do pool de conexões.")
+db_pool_checked_out = Gauge("db_pool_checked_out", "Conexões do pool em uso.")
+db_pool_checked_in = Gauge("db_pool_checked_in", "Conexões ociosas no pool.")
+db_pool_overflow = Gauge("db_pool_overflow", "Conexões abertas além do tamanho do pool.")
+db_pool_checkouts_total = Counter("db_pool_checkouts_total", "Pedidos de conexão ao pool.")
+db_pool_wait_seconds_total = Counter(
+    "db_pool_wait_seconds_total", "Tempo total de espera por uma conexão do pool.")
+db_pool_timeouts_total = Counter(
+    "db_pool_timeouts_total", "Pedidos de conexão que esgotaram DB_POOL_TIMEOUT.")
+
+engine = instrument_engine(build_engine())
+replicas = ReplicaPool([instrument_engine(build_engine(url)) for url in DATABASE_REPLICA_URLS])
+SessionLocal = async_sessionmaker(bind=engine, expire_on_commit=False, sync_session_class=RoutingSession)
+
+db_pool_size.set_function(lambda: engine.pool.size())
+db_pool_checked_out.set_function(lambda: engine.pool.checkedout())
+db_pool_checked_in.set_function(lambda: engine.pool.checkedin())
+# overflow() começa em -pool_size e só fica positivo quando passa do tamanho do pool
+db_pool_overflow.set_function(lambda: max(engine.pool.overflow(), 0))
+db_replicas_healthy = Gauge("db_replicas_healthy", "Réplicas de leitura no rodízio.")
+db_replicas_healthy.set_function(lambda: len(replicas.healthy))
+
+async def get_db():
+    async with SessionLocal() as db:
+        yield db
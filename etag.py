@@ -0,0 +1,29 @@
+from fastapi import Response
+from starlette import status
+
+# Respostas por usuário: só o cliente guarda, e sempre revalida com If-None-Match
+CACHE_HEADERS = {"Cache-Control": "private, no-cache", "Vary": "Cookie"}
+
+
+def make_etag(user_id: int, version: int) -> str:
+    """ETag de um recurso do usuário a partir do seu número de versão.
+
+    Inclui o user_id para que um ETag guardado por outro usuário no mesmo aparelho
+    nunca coincida.
+    """
+    return f'"{user_id}-{version}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+
+def etag_headers(etag: str) -> dict:
+    return {"ETag": etag, **CACHE_HEADERS}
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=etag_headers(etag))
@@ -0,0 +1,180 @@
+import asyncio
+import math
+import os
+import secrets
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+
+from passlib.context import CryptContext
+
+from metrics import Counter, Gauge, Histogram
+
+# "thread" ou "process". O bcrypt libera o GIL durante o hash, então threads já rodam em paralelo.
+HASH_POOL_EXECUTOR = os.getenv("HASH_POOL_EXECUTOR", "thread")
+HASH_POOL_SIZE = int(os.getenv("HASH_POOL_SIZE", os.cpu_count() or 1))
+HASH_QUEUE_SIZE = int(os.getenv("HASH_QUEUE_SIZE", "32"))
+# Tempo alvo de um hash neste hardware; o custo do bcrypt é calibrado para caber nele na subida.
+# BCRYPT_ROUNDS fixa o custo e dispensa a calibração.
+HASH_TIME_BUDGET_MS = float(os.getenv("HASH_TIME_BUDGET_MS", "250"))
+BCRYPT_ROUNDS = os.getenv("BCRYPT_ROUNDS")
+BCRYPT_MIN_ROUNDS = int(os.getenv("BCRYPT_MIN_ROUNDS", "10"))
+BCRYPT_MAX_ROUNDS = 16
+# Hashes mais caros que o custo atual só são refeitos a partir desta diferença de rounds.
+# Processos calibrados em máquinas diferentes podem discordar em um round, e refazer o hash
+# a cada login que troca de processo dobraria o custo do login
+BCRYPT_REHASH_ROUNDS_ABOVE = 2
+# Custo usado nas medições da calibração (cerca de 20 ms por hash)
+CALIBRATION_ROUNDS = 8
+
+
+def time_bcrypt(rounds: int) -> float:
+    """Melhor de três medições de um hash bcrypt com `rounds`, em segundos."""
+    handler = CryptContext(schemes=["bcrypt"], bcrypt__default_rounds=rounds)
+    samples = []
+    for _ in range(3):
+        started = time.perf_counter()
+        handler.hash("calibracao")
+        samples.append(time.perf_counter() - started)
+    return min(samples)
+
+def calibrate_bcrypt_rounds(budget: float, minimum: int = BCRYPT_MIN_ROUNDS, maximum: int = BCRYPT_MAX_ROUNDS,
+                            measure=time_bcrypt) -> int:
+    """Maior custo do bcrypt cujo hash leva até `budget` segundos no hardware atual.
+
+    Cada round a mais dobra o tempo do hash, então basta medir um custo baixo e
+    extrapolar. O resultado nunca fica abaixo de `minimum`, mesmo que estoure o orçamento.
+    """
+    seconds = measure(CALIBRATION_ROUNDS)
+    rounds = CALIBRATION_ROUNDS + math.floor(math.log2(budget / seconds))
+    return max(minimum, min(maximum, rounds))
+
+def build_context(rounds: int) -> CryptContext:
+    # Hashes com custo menor que `rounds` são refeitos no próximo login (ver needs_rehash)
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__default_rounds=rounds,
+                        bcrypt__min_rounds=rounds)
+
+
+bcrypt_rounds = int(BCRYPT_ROUNDS) if BCRYPT_ROUNDS else calibrate_bcrypt_rounds(HASH_TIME_BUDGET_MS / 1000)
+bcrypt_context = build_context(bcrypt_rounds)
+
+
+class HashingPoolFull(Exception):
+    pass
+
+
+# Funções de módulo para que também possam ser enviadas a um ProcessPoolExecutor
+def _hash(password: str) -> str:
+    return bcrypt_context.hash(password)
+
+def _verify(password: str, hashed_password: str) -> bool:
+    return bcrypt_context.verify(password, hashed_password)
+
+@lru_cache(maxsize=1)
+def dummy_hash() -> str:
+    """Hash de uma senha aleatória, com o mesmo custo dos hashes reais."""
+    return bcrypt_context.hash(secrets.token_urlsafe(16))
+
+def _verify_dummy(password: str) -> bool:
+    bcrypt_context.verify(password, dummy_hash())
+    return False
+
+def _timed(function, *args) -> tuple:
+    started = time.perf_counter()
+    return function(*args), time.perf_counter() - started
+
+def hash_rounds(hashed_password: str) -> int:
+    """Custo de um hash bcrypt ("$2b$12$..." -> 12)."""
+    return int(hashed_password.split("$")[2])
+
+def needs_rehash(hashed_password: str) -> bool:
+    """Se o hash deve ser refeito com a senha em mãos: custo menor que o atual, ou
+    BCRYPT_REHASH_ROUNDS_ABOVE rounds ou mais acima dele (fora do orçamento de tempo e
+    mais lento que a verificação de um usuário inexistente)."""
+    return (bcrypt_context.needs_update(hashed_password)
+            or hash_rounds(hashed_password) >= bcrypt_rounds + BCRYPT_REHASH_ROUNDS_ABOVE)
+
+
+class HashingPool:
+    """Executa hash e verificação de senha fora do event loop, com fila limitada.
+
+    Quando `workers + max_queue` tarefas já estão pendentes, novas chamadas falham
+    imediatamente com HashingPoolFull em vez de aguardar na fila.
+    """
+
+    def __init__(self, workers: int, max_queue: int, executor: str = "thread"):
+        self.workers = workers
+        self.max_queue = max_queue
+        if executor == "process":
+            self._executor = ProcessPoolExecutor(max_workers=workers)
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hashing")
+        self._pending = 0
+
+    @property
+    def in_flight(self) -> int:
+        return min(self._pending, self.workers)
+
+    @property
+    def queue_depth(self) -> int:
+        return max(self._pending - self.workers, 0)
+
+    async def run(self, function, *args):
+        if self._pending >= self.workers + self.max_queue:
+            hashing_rejected_total.inc()
+            raise HashingPoolFull()
+
+        self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+        finally:
+            self._pending -= 1
+
+    async def run_timed(self, operation: str, function, *args):
+        """Como run, registrando em password_hash_seconds o tempo gasto no worker."""
+        result, seconds = await self.run(_timed, function, *args)
+        hashing_seconds.observe(seconds, operation=operation)
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self.run_timed("hash", _hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self.run_timed("verify", _verify, password, hashed_password)
+
+    async def verify_dummy(self, password: str) -> bool:
+        """Gasta o mesmo tempo de um verify e devolve False, para usuários inexistentes."""
+        return await self.run_timed("verify", _verify_dummy, password)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+hashing_seconds = Histogram(
+    "password_hash_seconds", "Tempo de hash e verificação de senha nos workers, sem a espera na fila.",
+    ("operation",), buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5))
+hashing_rounds = Gauge(
+    "password_hash_rounds", "Custo (log2 das iterações) dos novos hashes bcrypt.")
+hashing_rejected_total = Counter(
+    "password_hash_rejected_total", "Operações de hash de senha rejeitadas por fila cheia.")
+hashing_pool_workers = Gauge(
+    "password_hash_pool_workers", "Quantidade de workers do pool de hash de senha.")
+hashing_pool_in_flight = Gauge(
+    "password_hash_pool_in_flight", "Operações de hash de senha em execução.")
+hashing_pool_queue_depth = Gauge(
+    "password_hash_pool_queue_depth", "Operações de hash de senha aguardando um worker.")
+hashing_pool_queue_limit = Gauge(
+    "password_hash_pool_queue_limit", "Tamanho máximo da fila do pool de hash de senha.")
+
+hashing_pool = HashingPool(HASH_POOL_SIZE, HASH_QUEUE_SIZE, HASH_POOL_EXECUTOR)
+
+hashing_rounds.set(bcrypt_rounds)
+hashing_pool_workers.set_function(lambda: hashing_pool.workers)
+hashing_pool_in_flight.set_function(lambda: hashing_pool.in_flight)
+hashing_pool_queue_depth.set_function(lambda: hashing_pool.queue_depth)
+hashing_pool_queue_limit.set_function(lambda: hashing_pool.max_queue)
+
+
+if __name__ == "__main__":
+    # Custo para fixar em BCRYPT_ROUNDS em todas as instâncias: python hashing.py
+    print(calibrate_bcrypt_rounds(HASH_TIME_BUDGET_MS / 1000))
@@ -1,27 +1,52 @@
+import asyncio
+from contextlib import asynccontextmanager
 from typing import Annotated
 from fastapi import Depends, FastAPI
-from sqlalchemy.orm import Session
-from routers import chatbot, health, transport, auth, documents
+from sqlalchemy.ext.asyncio import AsyncSession
+from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
+from routers import admin, chatbot, health, transport, auth, documents, metrics
 from routers.auth import get_current_user
-from database import SessionLocal
+from database import check_schema, engine, get_db, replicas, warm_pool
+from hashing import dummy_hash, hashing_pool
+from middleware import TRUSTED_PROXIES, RequestMetricsMiddleware
+from profiling import PROFILING_ENABLED, ProfilingMiddleware
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await asyncio.gather(warm_pool(engine), *(warm_pool(replica) for replica in replicas.engines),
+                         # O hash usado para usuários inexistentes é gerado antes do primeiro login
+                         hashing_pool.run(dummy_hash))
+    await check_schema(engine)
+    health.health_checker.start()
+    replicas.start()
+    auth.refresh_token_purger.start()
+    yield
+    await auth.refresh_token_purger.stop()
+    await replicas.stop()
+    await health.health_checker.stop()
+    await health.close_http_client()
+    await asyncio.gather(engine.dispose(), *(replica.dispose() for replica in replicas.engines))
 
 app = FastAPI(
     title="API de Carteira Digital",
     description="API para gerenciamento de documentos digitais e saldo de transporte público.",
     version="1.0.0",
+    lifespan=lifespan,
 )
+# Desligado, o perfilamento nem entra na pilha de middlewares
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+app.add_middleware(RequestMetricsMiddleware)
+# Por fora de todos: métricas, perfis e o limite de login já veem o IP real do cliente
+if TRUSTED_PROXIES:
+    app.add_middleware(ProxyHeadersMiddleware, trusted_hosts=TRUSTED_PROXIES)
 app.include_router(auth.router)
 app.include_router(documents.router)
 app.include_router(transport.router)
 app.include_router(chatbot.router)
 app.include_router(health.router)
+app.include_router(metrics.router)
+app.include_router(admin.router)
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-db_dependency = Annotated[Session, Depends(get_db)]
+db_dependency = Annotated[AsyncSession, Depends(get_db)]
 user_dependency = Annotated[dict, Depends(get_current_user)]
\ No newline at end of file
@@ -0,0 +1,94 @@
+import logging
+import os
+import time
+
+from metrics import Counter, Histogram
+from querylog import QueryLog, request_queries
+
+logger = logging.getLogger(__name__)
+
+# Em staging: registra instruções SQL repetidas na mesma requisição (suspeitas de N+1),
+# com a pilha de quem as executou. Guardar a pilha custa caro, por isso fica desligado por padrão.
+LOG_REPEATED_QUERIES = os.getenv("LOG_REPEATED_QUERIES", "false").lower() in ("1", "true", "yes")
+# Balanceadores/proxies reversos (IPs ou redes, separados por vírgula) cujo X-Forwarded-For
+# é aceito como o IP do cliente. Sem isso, atrás de um proxy todo cliente tem o IP dele,
+# e o limite de login por IP (throttling.py) passa a valer para todos juntos
+TRUSTED_PROXIES = [host.strip() for host in os.getenv("TRUSTED_PROXIES", "").split(",") if host.strip()]
+
+http_requests_total = Counter(
+    "http_requests_total", "Requisições HTTP atendidas.", ("method", "route", "status"))
+http_request_errors_total = Counter(
+    "http_request_errors_total", "Requisições HTTP que terminaram em erro 5xx ou exceção.", ("method", "route"))
+http_request_duration_seconds = Histogram(
+    "http_request_duration_seconds", "Latência das requisições HTTP.", ("method", "route"))
+http_request_db_seconds = Histogram(
+    "http_request_db_seconds", "Tempo gasto no banco de dados por requisição HTTP.", ("method", "route"),
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5))
+http_request_queries = Histogram(
+    "http_request_queries", "Instruções SQL executadas por requisição HTTP.", ("method", "route"),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100))
+
+
+class RequestMetricsMiddleware:
+    """Middleware ASGI que mede latência, volume, erros, tempo e instruções de banco por rota.
+
+    As rotas são identificadas pelo template (ex.: /documents/cpf), nunca pelo caminho
+    recebido; caminhos que não casam com nenhuma rota ficam juntos em "unmatched".
+    """
+
+    def __init__(self, app):
+        self.app = app
+        # (método, rota, status) -> métricas com os rótulos já resolvidos
+        self._bound = {}
+
+    def _metrics_for(self, method: str, route: str, status_code: int) -> tuple:
+        bound = self._bound.get((method, route, status_code))
+        if bound is None:
+            labels = {"method": method, "route": route}
+            bound = self._bound[(method, route, status_code)] = (
+                http_requests_total.labels(status=status_code, **labels),
+                http_request_duration_seconds.labels(**labels),
+                http_request_db_seconds.labels(**labels),
+                http_request_queries.labels(**labels),
+                http_request_errors_total.labels(**labels) if status_code >= 500 else None,
+            )
+        return bound
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        queries = QueryLog(capture_stacks=LOG_REPEATED_QUERIES)
+        token = request_queries.set(queries)
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        except Exception:
+            status_code = 500
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            request_queries.reset(token)
+
+            route = scope.get("route")
+            route_path = route.path if route is not None else "unmatched"
+            requests, duration, database, statements, errors = self._metrics_for(
+                scope["method"], route_path, status_code)
+            requests.inc()
+            duration.observe(elapsed)
+            database.observe(queries.seconds)
+            statements.observe(queries.count)
+            if errors is not None:
+                errors.inc()
+            if LOG_REPEATED_QUERIES and queries.repeated():
+                logger.warning("Instruções SQL repetidas em %s %s (%d no total):\n%s",
+                               scope["method"], route_path, queries.count, queries.report())
@@ -1,6 +1,6 @@
-from sqlalchemy import DECIMAL, Column, Date, ForeignKey, Integer, String
+from sqlalchemy import DECIMAL, Column, Date, DateTime, ForeignKey, Index, Integer, String
 from sqlalchemy.orm import relationship
-from database import Base
+from base import Base
 
 class Users(Base):
     __tablename__ = "users"
@@ -16,12 +16,42 @@ class Transport(Base):
     __tablename__ = "transport"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), unique=True, index=True)
     balance = Column(DECIMAL(10, 2))
     last_transaction_date = Column(Date, nullable=True)
+    # Incrementada a cada mudança de saldo; base do ETag de GET /transport/balance
+    version = Column(Integer, nullable=False, default=0, server_default="0")
 
     users = relationship("Users", back_populates="transport")
 
+class TransportTransaction(Base):
+    __tablename__ = "transport_transactions"
+    __table_args__ = (
+        Index("ix_transport_transactions_user_id_created_at", "user_id", "created_at", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    amount = Column(DECIMAL(10, 2), nullable=False)
+    kind = Column(String(20), nullable=False)
+    idempotency_key = Column(String(64), nullable=True, unique=True, index=True)
+    created_at = Column(DateTime, nullable=False, index=True)
+
+class RefreshToken(Base):
+    """Refresh token emitido no login; só o hash do token é guardado.
+
+    Cada uso troca o token por um novo da mesma família (`family_id`). Reapresentar um
+    token já trocado revoga a família inteira.
+    """
+    __tablename__ = "refresh_tokens"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    family_id = Column(String(32), nullable=False, index=True)
+    token_hash = Column(String(64), nullable=False, unique=True, index=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    revoked_at = Column(DateTime, nullable=True)
+
 class Cpf(Base):
     __tablename__ = "cpf"
 
@@ -49,7 +79,7 @@ class Cnh(Base):
     uf = Column(String(2))
     issued_by = Column(String(50))
     issued_date = Column(Date)
-    expiration_date = Column(Date)
+    expiration_date = Column(Date, index=True)
     category = Column(String(2))
 
 class VaccinationCard(Base):
@@ -60,18 +90,20 @@ class VaccinationCard(Base):
     name = Column(String(50))
     birth_date = Column(Date)
     issued_date = Column(Date)
-    expiration_date = Column(Date)
+    expiration_date = Column(Date, index=True)
     gender = Column(String(1))
 
 class Documents(Base):
     __tablename__ = "documents"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
-    cpf_id = Column(Integer, ForeignKey("cpf.id"), nullable=True)
-    rg_id = Column(Integer, ForeignKey("rg.id"), nullable=True)
-    cnh_id = Column(Integer, ForeignKey("cnh.id"), nullable=True)
-    vaccination_card_id = Column(Integer, ForeignKey("vaccination_card.id"), nullable=True)
+    user_id = Column(Integer, ForeignKey("users.id"), unique=True, index=True)
+    cpf_id = Column(Integer, ForeignKey("cpf.id"), nullable=True, index=True)
+    rg_id = Column(Integer, ForeignKey("rg.id"), nullable=True, index=True)
+    cnh_id = Column(Integer, ForeignKey("cnh.id"), nullable=True, index=True)
+    vaccination_card_id = Column(Integer, ForeignKey("vaccination_card.id"), nullable=True, index=True)
+    # Incrementada a cada documento associado; base do ETag de GET /documents/
+    version = Column(Integer, nullable=False, default=0, server_default="0")
 
     user = relationship("Users", back_populates="documents")
     cpf = relationship("Cpf", backref="documents")
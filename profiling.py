@@ -0,0 +1,219 @@
+import asyncio
+import hashlib
+import hmac
+import logging
+import os
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+from metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+# Fração das requisições perfiladas sem pedido explícito (0 desliga a amostragem)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+# Segredo do cabeçalho X-Profile; sem ele, o cabeçalho é ignorado
+PROFILE_SECRET = os.getenv("PROFILE_SECRET")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.001"))
+# Uma requisição deixa de ser perfilada depois de PROFILE_MAX_SECONDS, e o tempo total
+# perfilado fica abaixo de PROFILE_MAX_OVERHEAD do tempo decorrido
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "2"))
+PROFILE_MAX_OVERHEAD = float(os.getenv("PROFILE_MAX_OVERHEAD", "0.01"))
+
+PROFILING_ENABLED = PROFILE_SAMPLE_RATE > 0 or bool(PROFILE_SECRET)
+PROFILE_HEADER = b"x-profile"
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__)) + os.sep
+
+http_request_profiles_total = Counter(
+    "http_request_profiles_total", "Requisições escolhidas para perfilamento, por resultado.", ("outcome",))
+
+
+def profile_token(secret: str, expires: int) -> str:
+    """Valor do cabeçalho X-Profile válido até o timestamp `expires`."""
+    signature = hmac.new(secret.encode(), str(expires).encode(), hashlib.sha256).hexdigest()
+    return f"{expires}.{signature}"
+
+def verify_profile_token(secret: str | None, token: str, now: float | None = None) -> bool:
+    expires, _, signature = token.partition(".")
+    if not secret or not expires.isdigit():
+        return False
+    if int(expires) < (time.time() if now is None else now):
+        return False
+    return hmac.compare_digest(profile_token(secret, int(expires)), token)
+
+
+class ProfilingBudget:
+    """Balde de fichas em segundos perfilados, reabastecido a `max_overhead` por segundo."""
+
+    def __init__(self, max_overhead: float, capacity: float, clock=time.monotonic):
+        self.max_overhead = max_overhead
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self.updated = clock()
+
+    def available(self) -> bool:
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.max_overhead)
+        self.updated = now
+        return self.tokens > 0
+
+    def spend(self, seconds: float):
+        self.tokens -= seconds
+
+
+class RequestProfiler:
+    """Perfil de uma requisição em pilhas colapsadas (formato do flamegraph.pl e do speedscope).
+
+    Instalado com sys.setprofile na thread do event loop. Enquanto a tarefa da requisição
+    roda, o tempo é atribuído à pilha corrente a cada `interval` segundos. Quando ela cede
+    o loop num await, o tempo até ser retomada vai para a pilha do await (montada a partir
+    de cr_await), o que mostra, por exemplo, a espera pelo bcrypt no pool de hashing.
+    """
+
+    def __init__(self, coroutine, interval: float, max_seconds: float):
+        self.coroutine = coroutine
+        self.root = coroutine.cr_frame
+        self.interval = interval
+        self.stacks = {}
+        self.labels = {}
+        self.started = self.last = time.perf_counter()
+        self.deadline = self.started + max_seconds
+        self.truncated = False
+        self.suspended = None
+
+    def _label(self, code) -> str:
+        label = self.labels.get(code)
+        if label is None:
+            filename = code.co_filename
+            if filename.startswith(PROJECT_DIR):
+                filename = filename[len(PROJECT_DIR):]
+            elif "site-packages" + os.sep in filename:
+                filename = filename.rpartition("site-packages" + os.sep)[2]
+            else:
+                filename = os.path.basename(filename)
+            label = self.labels[code] = f"{code.co_qualname} ({filename}:{code.co_firstlineno})"
+        return label
+
+    def _frame_stack(self, frame) -> list | None:
+        stack = []
+        while frame is not self.root:
+            if frame is None:
+                return None
+            stack.append(self._label(frame.f_code))
+            frame = frame.f_back
+        stack.append(self._label(frame.f_code))
+        stack.reverse()
+        return stack
+
+    def _await_stack(self) -> list:
+        stack, awaitable = [], self.coroutine
+        while True:
+            code = getattr(awaitable, "cr_code", None) or getattr(awaitable, "gi_code", None)
+            if code is None:
+                stack.append(f"<await {type(awaitable).__name__}>")
+                return stack
+            stack.append(self._label(code))
+            awaitable = getattr(awaitable, "cr_await", None) or getattr(awaitable, "gi_yieldfrom", None)
+
+    def _add(self, stack: list, seconds: float):
+        key = ";".join(stack)
+        self.stacks[key] = self.stacks.get(key, 0.0) + seconds
+
+    def __call__(self, frame, event, arg):
+        now = time.perf_counter()
+        if now > self.deadline:
+            sys.setprofile(None)
+            self.truncated = True
+            return
+
+        if self.suspended is not None:
+            # Outras tarefas rodando no loop: só interessa a retomada desta
+            if event == "call" and frame is self.root:
+                self._add(self.suspended, now - self.last)
+                self.suspended = None
+                self.last = now
+            return
+
+        if frame is self.root and event == "return":
+            self._add(self._frame_stack(frame), now - self.last)
+            self.last = now
+            if self.coroutine.cr_await is not None:
+                self.suspended = self._await_stack()
+            return
+
+        if now - self.last < self.interval:
+            return
+        stack = self._frame_stack(frame.f_back if event == "call" else frame)
+        if stack is not None:
+            if event in ("c_return", "c_exception"):
+                stack.append(getattr(arg, "__qualname__", repr(arg)))
+            self._add(stack, now - self.last)
+        self.last = now
+
+    def collapsed(self) -> str:
+        lines = [f"{stack} {round(seconds * 1e6)}" for stack, seconds in self.stacks.items() if seconds >= 5e-7]
+        return "\n".join(sorted(lines)) + "\n"
+
+
+class ProfilingMiddleware:
+    """Middleware ASGI que perfila requisições e grava o perfil em `directory`.
+
+    Uma requisição é perfilada quando traz um cabeçalho X-Profile assinado (ver
+    profile_token) ou quando é sorteada por `sample_rate`, desde que o orçamento de
+    perfilamento não tenha se esgotado e nenhuma outra esteja sendo perfilada. Só é
+    instalado no app quando PROFILE_SAMPLE_RATE ou PROFILE_SECRET estão configurados.
+    """
+
+    def __init__(self, app, directory: str = PROFILE_DIR, sample_rate: float = PROFILE_SAMPLE_RATE,
+                 secret: str | None = PROFILE_SECRET, interval: float = PROFILE_INTERVAL,
+                 max_seconds: float = PROFILE_MAX_SECONDS, budget: ProfilingBudget | None = None):
+        self.app = app
+        self.directory = Path(directory)
+        self.sample_rate = sample_rate
+        self.secret = secret
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.budget = budget or ProfilingBudget(PROFILE_MAX_OVERHEAD, max_seconds)
+        self._active = False
+
+    def _requested(self, scope) -> bool:
+        if self.secret:
+            for name, value in scope["headers"]:
+                if name == PROFILE_HEADER:
+                    return verify_profile_token(self.secret, value.decode("latin-1"))
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self._active or not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+        if not self.budget.available():
+            http_request_profiles_total.inc(outcome="over_budget")
+            await self.app(scope, receive, send)
+            return
+
+        coroutine = self.app(scope, receive, send)
+        profiler = RequestProfiler(coroutine, self.interval, self.max_seconds)
+        self._active = True
+        sys.setprofile(profiler)
+        try:
+            await coroutine
+        finally:
+            sys.setprofile(None)
+            self._active = False
+            self.budget.spend(time.perf_counter() - profiler.started)
+            http_request_profiles_total.inc(outcome="truncated" if profiler.truncated else "written")
+            await asyncio.to_thread(self._write, scope, profiler)
+
+    def _write(self, scope, profiler: RequestProfiler):
+        route = scope.get("route")
+        name = re.sub(r"[^A-Za-z0-9]+", "_", route.path if route is not None else "unmatched").strip("_")
+        path = self.directory / f"{time.time_ns()}-{scope['method']}-{name or 'root'}.collapsed"
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path.write_text(profiler.collapsed())
+        logger.info("Perfil de %s %s gravado em %s", scope["method"], scope["path"], path)
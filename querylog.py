@@ -0,0 +1,77 @@
+import os
+import re
+import sys
+import traceback
+from contextvars import ContextVar
+from functools import lru_cache
+
+import greenlet
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__)) + os.sep
+
+WHITESPACE = re.compile(r"\s+")
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+# IN (?, ?, ?) e VALUES (?, ?) viram (?) para que o tamanho da lista não mude o fingerprint
+PARAMETER_LISTS = re.compile(r"\((?:\s*(?:\?|%s|:\w+)\s*,)*\s*(?:\?|%s|:\w+)\s*\)")
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(statement: str) -> str:
+    """Forma normalizada da instrução SQL: sem literais, espaços extras nem tamanho de listas."""
+    statement = WHITESPACE.sub(" ", statement).strip()
+    return PARAMETER_LISTS.sub("(?)", LITERALS.sub("?", statement))
+
+
+def caller_stack() -> list:
+    """Pilha da aplicação que levou à instrução SQL em execução.
+
+    O SQLAlchemy assíncrono executa as instruções em um greenlet próprio, cuja pilha
+    termina em greenlet_spawn; as rotas que fizeram a chamada ficam nos greenlets pais.
+    """
+    frames = []
+    frame, current = sys._getframe(1), greenlet.getcurrent()
+    while frame is not None:
+        frames[:0] = traceback.extract_stack(frame)
+        current = current.parent
+        frame = current.gr_frame if current is not None else None
+    return [
+        entry for entry in frames
+        if entry.filename.startswith(PROJECT_DIR) and "site-packages" not in entry.filename
+        and entry.filename != __file__
+    ]
+
+
+class QueryLog:
+    """Instruções SQL executadas em uma requisição: total, tempo e execuções por fingerprint."""
+
+    __slots__ = ("count", "seconds", "fingerprints", "stacks", "capture_stacks")
+
+    def __init__(self, capture_stacks: bool = False):
+        self.count = 0
+        self.seconds = 0.0
+        self.fingerprints = {}
+        # fingerprint -> pilha da primeira repetição
+        self.stacks = {}
+        self.capture_stacks = capture_stacks
+
+    def record(self, statement: str):
+        key = fingerprint(statement)
+        executions = self.fingerprints[key] = self.fingerprints.get(key, 0) + 1
+        self.count += 1
+        if executions == 2 and self.capture_stacks:
+            self.stacks[key] = caller_stack()
+
+    def repeated(self) -> dict:
+        return {key: executions for key, executions in self.fingerprints.items() if executions > 1}
+
+    def report(self) -> str:
+        lines = []
+        for key, executions in sorted(self.fingerprints.items(), key=lambda item: -item[1]):
+            lines.append(f"{executions}x {key}")
+            if key in self.stacks:
+                lines.extend("    " + line.rstrip() for line in traceback.format_list(self.stacks[key]))
+        return "\n".join(lines)
+
+
+# QueryLog da requisição em andamento (ver middleware.py)
+request_queries: ContextVar[QueryLog | None] = ContextVar("request_queries", default=None)
@@ -0,0 +1,368 @@
+import codecs
+import csv
+import io
+import json
+import os
+from datetime import date
+from typing import Annotated, Literal, NamedTuple
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import case, exc, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette import status
+
+from cache import wallet_cache
+from database import get_db, use_replica
+from models import Documents, Users
+from routers.auth import verify_api_key
+from routers.documents import DOCUMENT_TYPES, document_values
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["admin"],
+)
+
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY")
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "1000"))
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+async def get_admin(x_admin_key: Annotated[str | None, Header()] = None):
+    if not verify_api_key(x_admin_key, ADMIN_API_KEY):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Administrador não autenticado."
+        )
+
+db_dependency = Annotated[AsyncSession, Depends(get_db)]
+
+
+class ImportRow(NamedTuple):
+    line: int
+    kind: str
+    user_id: int
+    values: dict
+
+
+async def read_lines(request: Request):
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    async for chunk in request.stream():
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer
+
+async def ndjson_rows(lines):
+    """Gera (linha, registro, erro) para cada linha de um corpo NDJSON."""
+    number = 0
+    async for line in lines:
+        number += 1
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line), None
+        except ValueError:
+            yield number, None, "JSON inválido."
+
+async def csv_rows(lines):
+    """Gera (linha, registro, erro) para cada registro de um CSV com cabeçalho.
+
+    Campos entre aspas podem conter quebras de linha; colunas vazias são omitidas.
+    """
+    header = None
+    pending = None
+    number = 0
+    async for line in lines:
+        number += 1
+        if pending is None:
+            start, record = number, line
+        else:
+            record = pending + "\n" + line
+        if record.count('"') % 2:
+            pending = record
+            continue
+        pending = None
+
+        record = record.rstrip("\r")
+        if not record.strip():
+            continue
+        values = next(csv.reader([record]))
+        if header is None:
+            header = values
+        elif len(values) != len(header):
+            yield start, None, "Quantidade de colunas diferente do cabeçalho."
+        else:
+            yield start, {column: value for column, value in zip(header, values) if value != ""}, None
+
+    if pending is not None:
+        yield start, None, "Aspas não fechadas."
+
+def parse_import_row(line: int, row) -> ImportRow:
+    """Valida um registro com o schema do seu tipo; levanta ValueError com a mensagem do erro."""
+    if not isinstance(row, dict):
+        raise ValueError("O registro deve ser um objeto.")
+
+    document_type = DOCUMENT_TYPES.get(row.get("type"))
+    if document_type is None:
+        raise ValueError("Tipo de documento inválido.")
+
+    try:
+        user_id = int(row.get("user_id"))
+    except (TypeError, ValueError):
+        raise ValueError("user_id inválido.")
+
+    try:
+        document = document_type.schema.model_validate(row)
+    except ValidationError as error:
+        raise ValueError("; ".join(
+            f"{'.'.join(str(part) for part in detail['loc'])}: {detail['msg']}" for detail in error.errors()
+        ))
+
+    return ImportRow(line, row["type"], user_id, document_values(document_type, document))
+
+async def link_documents(db: AsyncSession, links: dict):
+    """Associa os documentos inseridos ao Documents de cada usuário, criando os que faltam.
+
+    `links` mapeia user_id -> {coluna de chave estrangeira: id do documento}.
+    """
+    existing = dict((await db.execute(
+        select(Documents.user_id, func.min(Documents.id))
+        .where(Documents.user_id.in_(links))
+        .group_by(Documents.user_id)
+    )).all())
+
+    foreign_keys = [document_type.foreign_key for document_type in DOCUMENT_TYPES.values()]
+    new_documents = [
+        {"user_id": user_id, **{foreign_key: document_ids.get(foreign_key) for foreign_key in foreign_keys}}
+        for user_id, document_ids in links.items() if user_id not in existing
+    ]
+    if new_documents:
+        await db.execute(insert(Documents).values(new_documents))
+
+    for foreign_key in foreign_keys:
+        updates = {
+            existing[user_id]: document_ids[foreign_key]
+            for user_id, document_ids in links.items()
+            if user_id in existing and foreign_key in document_ids
+        }
+        if updates:
+            await db.execute(
+                update(Documents)
+                .where(Documents.id.in_(updates))
+                .values({foreign_key: case(updates, value=Documents.id), "version": Documents.version + 1})
+            )
+
+async def import_chunk(db: AsyncSession, rows: list, errors: list) -> int:
+    """Insere um bloco de registros já validados em uma transação e devolve quantos entraram."""
+    user_ids = {row.user_id for row in rows}
+    known_users = set(await db.scalars(select(Users.id).where(Users.id.in_(user_ids))))
+
+    rows_by_kind = {}
+    for row in rows:
+        if row.user_id not in known_users:
+            errors.append({"line": row.line, "error": "Usuário não encontrado."})
+        else:
+            rows_by_kind.setdefault(row.kind, []).append(row)
+
+    links = {}
+    imported = 0
+    for kind, typed_rows in rows_by_kind.items():
+        document_type = DOCUMENT_TYPES[kind]
+        model = document_type.model
+        numbers = {row.values["number"] for row in typed_rows}
+        taken = set(await db.scalars(select(model.number).where(model.number.in_(numbers))))
+
+        accepted = []
+        for row in typed_rows:
+            if row.values["number"] in taken:
+                errors.append({"line": row.line, "error": "Número de documento já cadastrado."})
+                continue
+            taken.add(row.values["number"])
+            accepted.append(row)
+        if not accepted:
+            continue
+
+        await db.execute(insert(model).values([row.values for row in accepted]))
+        ids = dict((await db.execute(
+            select(model.number, model.id).where(model.number.in_([row.values["number"] for row in accepted]))
+        )).all())
+        for row in accepted:
+            links.setdefault(row.user_id, {})[document_type.foreign_key] = ids[row.values["number"]]
+        imported += len(accepted)
+
+    if links:
+        await link_documents(db, links)
+    await db.commit()
+
+    for user_id in links:
+        wallet_cache.invalidate(user_id)
+    return imported
+
+async def import_chunk_or_rows(db: AsyncSession, rows: list, errors: list) -> int:
+    chunk_errors = []
+    try:
+        imported = await import_chunk(db, rows, chunk_errors)
+        errors.extend(chunk_errors)
+        return imported
+    except exc.DBAPIError:
+        await db.rollback()
+
+    # O banco recusou o bloco (ex.: valor longo demais, corrida em número único):
+    # refaz registro a registro para isolar as linhas com problema
+    imported = 0
+    for row in rows:
+        try:
+            imported += await import_chunk(db, [row], errors)
+        except exc.DBAPIError as error:
+            await db.rollback()
+            errors.append({"line": row.line, "error": str(error.orig)})
+    return imported
+
+@router.post(
+        "/documents/import",
+        summary="Importar documentos em lote",
+        description="Importa CPFs, RGs, CNHs e carteiras de vacinação de um corpo NDJSON (application/x-ndjson) ou CSV (text/csv). Cada registro informa `type`, `user_id` e os campos do documento; registros inválidos são reportados por linha sem interromper a importação.",
+        status_code=status.HTTP_200_OK,
+        dependencies=[Depends(get_admin)],
+        openapi_extra={"requestBody": {"content": {"application/x-ndjson": {}, "text/csv": {}}, "required": True}})
+async def import_documents(request: Request, db: db_dependency):
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type == "text/csv":
+        records = csv_rows(read_lines(request))
+    elif content_type in ("application/x-ndjson", "application/jsonl"):
+        records = ndjson_rows(read_lines(request))
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Envie o corpo como application/x-ndjson ou text/csv."
+        )
+
+    imported = 0
+    errors = []
+    chunk = []
+    async for line, record, error in records:
+        if error is None:
+            try:
+                chunk.append(parse_import_row(line, record))
+            except ValueError as validation_error:
+                error = str(validation_error)
+        if error is not None:
+            errors.append({"line": line, "error": error})
+
+        if len(chunk) >= IMPORT_CHUNK_SIZE:
+            imported += await import_chunk_or_rows(db, chunk, errors)
+            chunk = []
+    if chunk:
+        imported += await import_chunk_or_rows(db, chunk, errors)
+
+    return {"imported": imported, "errors": sorted(errors, key=lambda error: error["line"])}
+
+
+# Colunas da exportação: as mesmas da importação, mais o username. `id` é a chave primária
+# da linha na própria tabela (para "user", o próprio user_id)
+EXPORT_COLUMNS = ["type", "user_id", "username", "id", "number", "name", "issued_by", "issued_date", "uf",
+                  "expiration_date", "category", "birth_date", "gender"]
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+# Tabelas exportadas, na ordem da saída: usuários, carteiras (Documents) e cada tipo de documento
+EXPORT_TYPES = ("user", "documents", *DOCUMENT_TYPES)
+
+def export_query(kind: str, issued_from: date | None, issued_to: date | None, after_id: int, limit: int):
+    """Próximo lote da tabela de `kind` depois de `after_id`, pela chave primária dela.
+
+    Cada tabela é lida por inteiro: usuários sem carteira, carteiras vazias e documentos
+    que nenhuma carteira aponta mais (substituídos) também entram. O dono de um documento
+    vem da carteira que aponta para ele, por LEFT JOIN; sem carteira, user_id fica nulo.
+    O período de emissão só filtra os tipos de documento.
+    """
+    if kind == "user":
+        key = Users.id
+        query = select(Users.id, Users.id.label("user_id"), Users.username)
+    elif kind == "documents":
+        key = Documents.id
+        query = (
+            select(Documents.id, Documents.user_id, Users.username)
+            .outerjoin(Users, Users.id == Documents.user_id)
+        )
+    else:
+        document_type = DOCUMENT_TYPES[kind]
+        model = document_type.model
+        key = model.id
+        query = (
+            select(*model.__table__.columns, Documents.user_id.label("user_id"), Users.username)
+            .select_from(model)
+            .outerjoin(Documents, getattr(Documents, document_type.foreign_key) == model.id)
+            .outerjoin(Users, Users.id == Documents.user_id)
+        )
+        if issued_from is not None:
+            query = query.where(model.issued_date >= issued_from)
+        if issued_to is not None:
+            query = query.where(model.issued_date <= issued_to)
+    return query.where(key > after_id).order_by(key).limit(limit)
+
+def export_record(kind: str, row) -> dict:
+    record = {"type": kind, "user_id": row.user_id, "username": row.username}
+    for column, value in row._mapping.items():
+        record[column] = value.isoformat() if isinstance(value, date) else value
+    return record
+
+async def export_lines(db: AsyncSession, export_format: str, kinds: list, issued_from: date | None,
+                       issued_to: date | None, batch_size: int):
+    """Gera a exportação em pedaços, um por lote de `batch_size` linhas de cada tabela.
+
+    Os lotes seguem a chave primária de cada tabela (keyset), então cada consulta é curta
+    e usa a chave primária, e cada lote é lido por cursor no servidor (stream com
+    yield_per), sem carregar o resultado inteiro. A memória fica constante qualquer que
+    seja o total.
+    """
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, EXPORT_COLUMNS, lineterminator="\n")
+    if export_format == "csv":
+        writer.writeheader()
+
+    for kind in kinds:
+        after_id = 0
+        while True:
+            rows = 0
+            query = export_query(kind, issued_from, issued_to, after_id, batch_size)
+            result = await db.stream(query, execution_options={"yield_per": batch_size})
+            # Uma partição por vez: iterar linha a linha custaria uma troca de greenlet por linha
+            async for partition in result.partitions():
+                for row in partition:
+                    record = export_record(kind, row)
+                    if export_format == "csv":
+                        writer.writerow(record)
+                    else:
+                        buffer.write(json.dumps(record, ensure_ascii=False))
+                        buffer.write("\n")
+                rows += len(partition)
+                after_id = partition[-1].id
+            if buffer.tell():
+                yield buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate()
+            if rows < batch_size:
+                break
+
+@router.get(
+        "/documents/export",
+        summary="Exportar carteiras",
+        description="Exporta usuários, carteiras e documentos em NDJSON ou CSV, um registro por linha de cada tabela (`type`: `user`, `documents` ou o tipo do documento), com as colunas da importação mais o `username`. Entram também usuários sem carteira, carteiras vazias e documentos substituídos, que nenhuma carteira aponta mais (com `user_id` nulo). A resposta é enviada aos poucos, com memória constante no servidor. Filtros opcionais: `type` (repetível) e período de emissão (`issued_from`, `issued_to`), que vale só para os documentos.",
+        dependencies=[Depends(get_admin)],
+        response_class=StreamingResponse,
+        responses={200: {"content": {"application/x-ndjson": {}, "text/csv": {}}}})
+async def export_documents(db: db_dependency,
+                           export_format: Annotated[Literal["ndjson", "csv"], Query(alias="format")] = "ndjson",
+                           kinds: Annotated[list[Literal[EXPORT_TYPES]] | None, Query(alias="type")] = None,
+                           issued_from: date | None = None,
+                           issued_to: date | None = None):
+    kinds = kinds or list(EXPORT_TYPES)
+    # A exportação só lê: vai para uma réplica, se houver
+    lines = export_lines(use_replica(db), export_format, list(dict.fromkeys(kinds)), issued_from, issued_to,
+                         EXPORT_BATCH_SIZE)
+    return StreamingResponse(lines, media_type=EXPORT_MEDIA_TYPES[export_format], headers={
+        "Content-Disposition": f'attachment; filename="documentos.{export_format}"'
+    })
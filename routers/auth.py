@@ -1,16 +1,29 @@
+import asyncio
+import hashlib
+import hmac
+import logging
+import math
+import os
+import secrets
 from datetime import datetime, timedelta
 from typing import Annotated
-from fastapi import APIRouter, Depends, HTTPException, Response, Request  # Import necessário para manipular cookies
+from fastapi import APIRouter, Cookie, Depends, HTTPException, Response, Request  # Import necessário para manipular cookies
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
-from database import SessionLocal
-from models import Users
-from passlib.context import CryptContext
+from cache import LRUCache
+from database import SessionLocal, get_db, use_replica
+from hashing import HashingPoolFull, hashing_pool, needs_rehash
+from metrics import Counter
+from models import RefreshToken, Users
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
 
-from schemas import CreateUserRequest, Token
+from schemas import CreateUserRequest, RefreshTokenRequest, Token
+from throttling import login_throttle
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/auth",
@@ -20,17 +33,25 @@ router = APIRouter(
 SECRET_KEY = 'YCjgQW6EyZHTPgXnRaqiVDsrkU1KuEXqn812jmaklsm12h322'
 ALGORITHM = 'HS256'
 
-bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+ACCESS_TOKEN_EXPIRE = timedelta(minutes=20)
+# Validade do refresh token, renovada a cada uso (sessão deslizante)
+REFRESH_TOKEN_EXPIRE = timedelta(days=float(os.getenv("REFRESH_TOKEN_DAYS", "30")))
+# Intervalo e tamanho dos lotes da limpeza dos refresh tokens vencidos
+REFRESH_TOKEN_PURGE_SECONDS = float(os.getenv("REFRESH_TOKEN_PURGE_SECONDS", "3600"))
+REFRESH_TOKEN_PURGE_BATCH = int(os.getenv("REFRESH_TOKEN_PURGE_BATCH", "1000"))
+
+auth_sessions_issued_total = Counter(
+    "auth_sessions_issued_total", "Tokens de acesso emitidos, por forma de autenticação.", ("grant",))
+refresh_tokens_purged_total = Counter(
+    "auth_refresh_tokens_purged_total", "Refresh tokens vencidos ou revogados apagados pela limpeza.")
+
+# Tokens já validados, indexados pelo hash do token e expirados no "exp" de cada um
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+token_cache = LRUCache("token", TOKEN_CACHE_SIZE)
 
-db_dependency = Annotated[Session, Depends(get_db)]
+db_dependency = Annotated[AsyncSession, Depends(get_db)]
 
 @router.post(
         "/", 
@@ -42,11 +63,11 @@ async def create_user(db: db_dependency,
     
     create_user_model = Users(
         username=create_user_request.username,
-        hashed_password=bcrypt_context.hash(create_user_request.password)
+        hashed_password=await hash_password(create_user_request.password)
     )
 
     db.add(create_user_model)
-    db.commit()
+    await db.commit()
 
 @router.post(
         "/token", 
@@ -55,35 +76,257 @@ async def create_user(db: db_dependency,
         response_model=Token)
 async def login_for_access_token(form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
                                  db: db_dependency,
+                                 request: Request,
                                  response: Response):
-    user = authenticate_user(form_data.username, form_data.password, db)
+    # Recusa rajadas por usuário ou por IP antes de gastar um bcrypt com elas
+    client_ip = request.client and request.client.host
+    retry_after = login_throttle.check(form_data.username, client_ip)
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Muitas tentativas de login. Tente novamente mais tarde.",
+            headers={"Retry-After": str(math.ceil(retry_after))}
+        )
+    user = await authenticate_user(form_data.username, form_data.password, db)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Usuário ou senha inválidos.",
         )
-    token = create_access_token(user.username, user.id, timedelta(minutes=20))
+    login_throttle.succeeded(form_data.username, client_ip)
+    auth_sessions_issued_total.inc(grant="password")
+    return await issue_tokens(db, response, user.id, user.username)
+
+@router.post(
+        "/refresh",
+        summary="Renovar sessão",
+        description="Troca o refresh token (cookie `refresh_token` ou campo `refresh_token` do corpo) por um "
+                    "novo token de acesso e um novo refresh token, sem pedir a senha. Cada refresh token vale "
+                    "uma única vez.",
+        response_model=Token)
+async def refresh_access_token(db: db_dependency,
+                               response: Response,
+                               body: RefreshTokenRequest | None = None,
+                               refresh_token: Annotated[str | None, Cookie()] = None):
+    stored, username = await use_refresh_token(db, body.refresh_token if body else refresh_token)
+    auth_sessions_issued_total.inc(grant="refresh")
+    return await issue_tokens(db, response, stored.user_id, username, stored.family_id)
+
+@router.post(
+        "/logout",
+        summary="Logout",
+        description="Revoga a sessão do refresh token apresentado e apaga os cookies de autenticação.",
+        status_code=status.HTTP_204_NO_CONTENT)
+async def logout(db: db_dependency,
+                 response: Response,
+                 body: RefreshTokenRequest | None = None,
+                 refresh_token: Annotated[str | None, Cookie()] = None):
+    token_hash = refresh_token_hash(body.refresh_token if body else refresh_token)
+    if token_hash is not None:
+        family_id = await db.scalar(select(RefreshToken.family_id).where(RefreshToken.token_hash == token_hash))
+        if family_id is not None:
+            await revoke_family(db, family_id)
+    response.delete_cookie("access_token")
+    response.delete_cookie("refresh_token", path="/auth")
 
-    # Configura o token como um cookie
+
+async def issue_tokens(db, response: Response, user_id: int, username: str, family_id: str | None = None) -> dict:
+    """Emite o token de acesso e um refresh token novo (da família `family_id`, ou de uma nova)."""
+    token = create_access_token(username, user_id, ACCESS_TOKEN_EXPIRE)
+    refresh_token, token_hash = new_refresh_token()
+    db.add(RefreshToken(user_id=user_id, family_id=family_id or secrets.token_hex(16), token_hash=token_hash,
+                        expires_at=datetime.utcnow() + REFRESH_TOKEN_EXPIRE))
+    await db.commit()
+
+    # Configura os tokens como cookies; o refresh token só é enviado às rotas de /auth
     response.set_cookie(
         key="access_token",
         value=f"Bearer {token}",
         httponly=True,
-        max_age=1200,
+        max_age=int(ACCESS_TOKEN_EXPIRE.total_seconds()),
+        samesite="strict"
+    )
+    response.set_cookie(
+        key="refresh_token",
+        value=refresh_token,
+        httponly=True,
+        max_age=int(REFRESH_TOKEN_EXPIRE.total_seconds()),
+        path="/auth",
         samesite="strict"
     )
 
-    return {"access_token": token, "token_type": "bearer"}
+    return {"access_token": token, "token_type": "bearer", "refresh_token": refresh_token}
+
+def sign_refresh_secret(secret: str) -> str:
+    return hmac.new(SECRET_KEY.encode(), secret.encode(), hashlib.sha256).hexdigest()
+
+def new_refresh_token() -> tuple:
+    """(token, hash guardado no banco) de um refresh token novo: segredo aleatório e sua assinatura."""
+    secret = secrets.token_urlsafe(32)
+    return f"{secret}.{sign_refresh_secret(secret)}", hashlib.sha256(secret.encode()).hexdigest()
+
+def refresh_token_hash(token: str | None) -> str | None:
+    """Hash para buscar o refresh token no banco; None, sem consultar o banco, se a assinatura não confere."""
+    secret, _, signature = (token or "").partition(".")
+    if not secret or not hmac.compare_digest(sign_refresh_secret(secret), signature):
+        return None
+    return hashlib.sha256(secret.encode()).hexdigest()
+
+async def revoke_family(db, family_id: str):
+    # Com a família revogada, nenhum token dela precisa mais detectar reuso: todos vencem
+    # agora e saem na próxima limpeza
+    now = datetime.utcnow()
+    await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.family_id == family_id)
+        .values(revoked_at=func.coalesce(RefreshToken.revoked_at, now), expires_at=now)
+    )
+    await db.commit()
+
+async def purge_refresh_tokens(db, batch_size: int = REFRESH_TOKEN_PURGE_BATCH) -> int:
+    """Apaga os refresh tokens vencidos, inclusive os de famílias revogadas; devolve quantos apagou.
+
+    Os tokens já trocados ficam até vencer, para que reapresentá-los ainda revogue a
+    família. Apaga em lotes de `batch_size` para não segurar a tabela em uma transação longa.
+    """
+    now = datetime.utcnow()
+    purged = 0
+    while True:
+        ids = (await db.scalars(
+            select(RefreshToken.id).where(RefreshToken.expires_at <= now).limit(batch_size)
+        )).all()
+        if ids:
+            await db.execute(delete(RefreshToken).where(RefreshToken.id.in_(ids)))
+            await db.commit()
+            purged += len(ids)
+            refresh_tokens_purged_total.inc(len(ids))
+        if len(ids) < batch_size:
+            return purged
+
+
+class RefreshTokenPurger:
+    """Roda purge_refresh_tokens periodicamente em segundo plano."""
+
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+        self._purger = None
+
+    async def purge(self) -> int:
+        async with self.session_factory() as db:
+            return await purge_refresh_tokens(db)
 
+    def start(self, interval: float = REFRESH_TOKEN_PURGE_SECONDS):
+        async def purge_forever():
+            while True:
+                try:
+                    await self.purge()
+                except Exception as error:
+                    logger.warning("Limpeza de refresh tokens falhou: %r", error)
+                await asyncio.sleep(interval)
 
-def authenticate_user(username: str, password: str, db):
-    user = db.query(Users).filter(Users.username == username).first()
+        self._purger = asyncio.ensure_future(purge_forever())
+
+    async def stop(self):
+        if self._purger is not None:
+            self._purger.cancel()
+            await asyncio.gather(self._purger, return_exceptions=True)
+            self._purger = None
+
+
+refresh_token_purger = RefreshTokenPurger(SessionLocal)
+
+async def use_refresh_token(db, token: str | None) -> tuple:
+    """Consome o refresh token e devolve (RefreshToken, username); 401 se for inválido.
+
+    Reapresentar um token já trocado indica que ele vazou: a família inteira é revogada.
+    """
+    invalid_token_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Refresh token inválido ou expirado."
+    )
+
+    token_hash = refresh_token_hash(token)
+    if token_hash is None:
+        raise invalid_token_exception
+
+    row = (await db.execute(
+        select(RefreshToken, Users.username)
+        .join(Users, Users.id == RefreshToken.user_id)
+        .where(RefreshToken.token_hash == token_hash)
+    )).first()
+    if row is None:
+        raise invalid_token_exception
+
+    stored, username = row
+    now = datetime.utcnow()
+    if stored.revoked_at is not None:
+        logger.warning("Refresh token reutilizado; revogando a sessão do usuário %s", stored.user_id)
+        await revoke_family(db, stored.family_id)
+        raise invalid_token_exception
+    if stored.expires_at <= now:
+        raise invalid_token_exception
+
+    # Só uma troca vence quando o mesmo token chega em duas requisições ao mesmo tempo
+    rotated = await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.id == stored.id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=now)
+    )
+    if rotated.rowcount != 1:
+        await db.rollback()
+        raise invalid_token_exception
+    return stored, username
+
+
+async def authenticate_user(username: str, password: str, db):
+    user = await db.scalar(select(Users).where(Users.username == username))
     if not user:
+        # Mesmo custo de uma senha errada, para o tempo de resposta não revelar quais usuários existem
+        await verify_dummy_password(password)
         return False
-    if not bcrypt_context.verify(password, user.hashed_password):
+    if not await verify_password(password, user.hashed_password):
         return False
+    # Hash com custo fora da calibração atual do bcrypt: refeito agora que a senha está em
+    # mãos. Com o pool cheio, o login segue e o hash fica para o próximo.
+    if needs_rehash(user.hashed_password):
+        try:
+            user.hashed_password = await hashing_pool.hash(password)
+        except HashingPoolFull:
+            return user
+        await db.commit()
     return user
 
+def verify_api_key(provided: str | None, expected: str | None) -> bool:
+    """Compara chaves de API em tempo constante; sem chave configurada, nega o acesso."""
+    if not expected or not provided:
+        return False
+    return hmac.compare_digest(provided.encode(), expected.encode())
+
+def hashing_unavailable_exception():
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Servidor ocupado. Tente novamente em instantes.",
+        headers={"Retry-After": "1"}
+    )
+
+async def hash_password(password: str) -> str:
+    try:
+        return await hashing_pool.hash(password)
+    except HashingPoolFull:
+        raise hashing_unavailable_exception()
+
+async def verify_password(password: str, hashed_password: str) -> bool:
+    try:
+        return await hashing_pool.verify(password, hashed_password)
+    except HashingPoolFull:
+        raise hashing_unavailable_exception()
+
+async def verify_dummy_password(password: str) -> bool:
+    try:
+        return await hashing_pool.verify_dummy(password)
+    except HashingPoolFull:
+        raise hashing_unavailable_exception()
+
 def create_access_token(username: str, user_id: int, expires_delta: timedelta | None = None):
     encode = {"sub": username, "id": user_id}
     expires = datetime.utcnow() + expires_delta
@@ -101,12 +344,26 @@ async def get_current_user(request: Request = None):
     if token is None:
             raise credentials_exception
 
+    token = token.replace("Bearer ", "")
+    token_hash = hashlib.sha256(token.encode()).digest()
+    cached_user = token_cache.get(token_hash)
+    if cached_user is not None:
+        return dict(cached_user)
+
     try:
-        payload = jwt.decode(token.replace("Bearer ", ""), SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         user_id: int = payload.get("id")
         if username is None or user_id is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    return {"username": username, "id": user_id}
\ No newline at end of file
+
+    user = {"username": username, "id": user_id}
+    if payload.get("exp") is not None:
+        token_cache.set(token_hash, user, expires_at=payload["exp"])
+    return dict(user)
+
+async def get_read_db(db: db_dependency, current_user: Annotated[dict, Depends(get_current_user)]):
+    """Sessão das rotas só de leitura: SELECTs numa réplica, salvo se o usuário escreveu há pouco."""
+    return use_replica(db, current_user["id"])
@@ -1,56 +1,170 @@
+import re
+import unicodedata
 from typing import Annotated
-from fastapi import APIRouter, Depends
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, HTTPException
 from starlette import status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 
-from database import SessionLocal
-from routers.auth import get_current_user
-from routers.documents import get_cnh, get_cpf, get_documents, get_rg, get_vaccination_card
-from routers.transport import get_transport_balance
+from cache import wallet_cache
+from models import Documents, Transport, Users
+from routers.auth import get_current_user, get_read_db
+from routers.documents import WALLET_RELATIONSHIPS, select_documents, wallet_response
+from routers.transport import balance_response
 
 router = APIRouter(
     prefix="/chatbot",
     tags=["chatbot"],
 )
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-db_dependency = Annotated[Session, Depends(get_db)]
+read_db_dependency = Annotated[AsyncSession, Depends(get_read_db)]
 user_dependency = Annotated[dict, Depends(get_current_user)]
 
+# Palavras-chave de cada intenção, em ordem de prioridade. Um "*" no fim aceita
+# qualquer continuação da palavra (ex.: "vacina*" cobre "vacinas" e "vacinação").
+INTENT_KEYWORDS = {
+    "greeting": ("ola",),
+    "farewell": ("tchau",),
+    "documents": ("document*", "doc", "docs"),
+    "cpf": ("cpf", "c.p.f"),
+    "rg": ("rg", "r.g", "identidade"),
+    "vaccination_card": ("vacina*", "vaccination"),
+    "cnh": ("cnh", "carteira de motorista"),
+    "balance": ("saldo", "balance"),
+}
+
+TEXT_ANSWERS = {
+    "greeting": "Olá! Como posso ajudar você hoje?",
+    "farewell": "Tchau! Tenha um ótimo dia!",
+}
+
+# Seção do cache da carteira que responde cada intenção de consulta
+INTENT_SECTIONS = {
+    "documents": "documents",
+    "cpf": "documents",
+    "rg": "documents",
+    "vaccination_card": "documents",
+    "cnh": "documents",
+    "balance": "balance",
+}
+
+UNKNOWN_ANSWER = "Desculpe, não entendi sua pergunta. Pode reformular?"
+
+COMBINING_MARKS = re.compile("[\u0300-\u036f]")
+
+def normalize(text: str) -> str:
+    """Minúsculas (casefold) e sem acentos: "Olá, VACINAÇÃO" -> "ola, vacinacao"."""
+    text = text.casefold()
+    if text.isascii():
+        return text
+    return COMBINING_MARKS.sub("", unicodedata.normalize("NFKD", text))
+
+
+class IntentMatcher:
+    """Reconhece as intenções de uma pergunta com uma única expressão regular compilada.
+
+    Cada intenção vira um grupo nomeado com suas palavras-chave, sempre casadas como
+    palavras inteiras; a pergunta é normalizada uma vez e percorrida uma única vez.
+    """
+
+    def __init__(self, intents: dict):
+        self.intents = list(intents)
+        groups = []
+        for index, keywords in enumerate(intents.values()):
+            alternatives = sorted((self._keyword_pattern(keyword) for keyword in keywords), key=len, reverse=True)
+            groups.append(f"(?P<i{index}>{'|'.join(alternatives)})")
+        self.pattern = re.compile(rf"(?<!\w)(?:{'|'.join(groups)})(?!\w)")
+
+    @staticmethod
+    def _keyword_pattern(keyword: str) -> str:
+        stem = keyword.removesuffix("*")
+        pattern = r"\s+".join(re.escape(word) for word in normalize(stem).split())
+        return pattern + r"\w*" if keyword.endswith("*") else pattern
+
+    def match(self, question: str) -> list:
+        """Intenções encontradas, da mais citada para a menos; empates seguem a ordem de prioridade."""
+        hits = {}
+        for found in self.pattern.finditer(normalize(question)):
+            index = int(found.lastgroup[1:])
+            hits[index] = hits.get(index, 0) + 1
+        return [self.intents[index] for index in sorted(hits, key=lambda index: (-hits[index], index))]
+
+
+intent_matcher = IntentMatcher(INTENT_KEYWORDS)
+
+async def query_sections(db: AsyncSession, user_id: int, sections: set) -> dict:
+    """Documentos e/ou saldo do usuário em uma única consulta."""
+    columns = []
+    query = select(Users.id)
+    if "documents" in sections:
+        query = (
+            query.add_columns(Documents)
+            .outerjoin(Documents, Documents.user_id == Users.id)
+            .options(*(joinedload(relationship) for relationship in WALLET_RELATIONSHIPS.values()))
+        )
+        columns.append("documents")
+    if "balance" in sections:
+        query = query.add_columns(Transport.balance).outerjoin(Transport, Transport.user_id == Users.id)
+        columns.append("balance")
+
+    row = (await db.execute(query.where(Users.id == user_id).limit(1))).first()
+    values = dict(zip(columns, row[1:])) if row else {}
+    return {
+        "documents": wallet_response(values.get("documents")),
+        "balance": values.get("balance"),
+    }
+
+async def load_sections(db: AsyncSession, user_id: int, sections: set) -> dict:
+    """Lê as seções pedidas do cache da carteira; as que faltarem vêm juntas em uma única consulta."""
+    results = {}
+    loaded = {}
+
+    for section in sorted(sections):
+        async def load(section=section):
+            if section not in loaded:
+                loaded.update(await query_sections(db, user_id, sections - results.keys()))
+            return loaded[section]
+
+        results[section] = await wallet_cache.get_or_load(user_id, section, load)
+    return results
+
+def answer(intent: str, sections: dict):
+    if intent in TEXT_ANSWERS:
+        return {"response": TEXT_ANSWERS[intent]}
+    if intent == "balance":
+        return balance_response(sections["balance"])
+    return select_documents(sections["documents"], intent)
+
 @router.post(
         "/",
         summary="Chatbot",
-        description="Interage com o chatbot para obter informações sobre documentos e saldo de transporte.", 
+        description="Interage com o chatbot para obter informações sobre documentos e saldo de transporte. Perguntas com vários assuntos (ex.: \"qual meu saldo e minha CNH?\") recebem uma resposta combinada em `answers`.", 
         status_code=status.HTTP_200_OK)
 async def chatbot(
     question: str,
-    db: db_dependency,
+    db: read_db_dependency,
     current_user: user_dependency
 ):
-    if "ola" in question.lower():
-        response = "Olá! Como posso ajudar você hoje?"
-    elif "tchau" in question.lower():
-        response = "Tchau! Tenha um ótimo dia!"
-    elif any(keyword in question.lower() for keyword in ["document", "doc", "documento"]):
-        return await get_documents(db=db, current_user=current_user)
-    elif any(keyword in question.lower() for keyword in ["cpf", "c.p.f"]):
-        return await get_cpf(db=db, current_user=current_user)
-    elif any(keyword in question.lower() for keyword in ["rg", "r.g", "identidade"]):
-        return await get_rg(db=db, current_user=current_user)
-    elif any(keyword in question.lower() for keyword in ["vacina", "vacinação", "vaccination"]):
-        return await get_vaccination_card(db=db, current_user=current_user)
-    elif any(keyword in question.lower() for keyword in ["cnh", "carteira de motorista"]):
-        return await get_cnh(db=db, current_user=current_user)
-    elif any(keyword in question.lower() for keyword in ["saldo", "balance"]):
-        return await get_transport_balance(db=db, current_user=current_user)
-    else:
-        response = "Desculpe, não entendi sua pergunta. Pode reformular?"
-
-    return JSONResponse(content={"response": response})
\ No newline at end of file
+    intents = intent_matcher.match(question)
+    if not intents:
+        return {"response": UNKNOWN_ANSWER}
+
+    sections = {INTENT_SECTIONS[intent] for intent in intents if intent in INTENT_SECTIONS}
+    if sections and not current_user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Usuário não autenticado."
+        )
+    loaded = await load_sections(db, current_user.get("id"), sections) if sections else {}
+
+    if len(intents) == 1:
+        return answer(intents[0], loaded)
+
+    answers = {}
+    for intent in intents:
+        try:
+            answers[intent] = answer(intent, loaded)
+        except HTTPException as error:
+            answers[intent] = {"detail": error.detail}
+    return {"answers": answers}
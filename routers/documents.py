@@ -1,35 +1,120 @@
-from typing import Annotated
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Annotated, NamedTuple
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
 from starlette import status
-from database import SessionLocal
-from sqlalchemy.orm import Session
+from cache import wallet_cache
+from database import get_db, stick_to_primary
+from etag import etag_headers, etag_matches, make_etag, not_modified
+from sqlalchemy import exc, select
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 from models import Cnh, Cpf, Documents, Rg, VaccinationCard
-from routers.auth import get_current_user
-from schemas import CreateCpfRequest, CreateRgRequest, CreateCnhRequest, CreateVaccinationCardRequest
+from routers.auth import get_current_user, get_read_db
+from schemas import (CreateCpfRequest, CreateRgRequest, CreateCnhRequest, CreateVaccinationCardRequest,
+                     DocumentsResponse, WalletResponse)
 
 router = APIRouter(
     prefix="/documents",
     tags=["documents"],
 )
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-db_dependency = Annotated[Session, Depends(get_db)]
+db_dependency = Annotated[AsyncSession, Depends(get_db)]
+read_db_dependency = Annotated[AsyncSession, Depends(get_read_db)]
 user_dependency = Annotated[dict, Depends(get_current_user)]
 
+class DocumentType(NamedTuple):
+    model: type
+    schema: type
+    foreign_key: str
+
+DOCUMENT_TYPES = {
+    "cpf": DocumentType(Cpf, CreateCpfRequest, "cpf_id"),
+    "rg": DocumentType(Rg, CreateRgRequest, "rg_id"),
+    "cnh": DocumentType(Cnh, CreateCnhRequest, "cnh_id"),
+    "vaccination_card": DocumentType(VaccinationCard, CreateVaccinationCardRequest, "vaccination_card_id"),
+}
+
+def document_values(document_type: DocumentType, request) -> dict:
+    """Colunas do modelo preenchidas a partir do schema validado (o `id` é gerado pelo banco)."""
+    columns = document_type.model.__table__.columns.keys()
+    return {key: value for key, value in request.model_dump(exclude={"id"}).items() if key in columns}
+
+WALLET_RELATIONSHIPS = {
+    "cpf": Documents.cpf,
+    "rg": Documents.rg,
+    "cnh": Documents.cnh,
+    "vaccination_card": Documents.vaccination_card,
+}
+
+async def load_wallet(db: AsyncSession, user_id: int, include=tuple(WALLET_RELATIONSHIPS), loader=joinedload):
+    """Carrega o Documents do usuário e os documentos em `include` em uma única consulta.
+
+    Por padrão os documentos vêm por JOIN; `loader` aceita outra estratégia de eager
+    loading do SQLAlchemy (ex.: selectinload).
+    """
+    query = (
+        select(Documents)
+        .where(Documents.user_id == user_id)
+        .options(*(loader(WALLET_RELATIONSHIPS[name]) for name in include))
+    )
+    return await db.scalar(query)
+
+def wallet_response(document):
+    """WalletResponse lido de um Documents carregado por load_wallet, ou None."""
+    if not document:
+        return None
+    return WalletResponse.model_validate(document)
+
+async def load_documents_version(db: AsyncSession, user_id: int):
+    """Versão do Documents do usuário (para conferir If-None-Match), do cache ou do banco."""
+    async def load():
+        return await db.scalar(select(Documents.version).where(Documents.user_id == user_id))
+
+    return await wallet_cache.get_or_load(user_id, "documents_version", load)
+
+async def load_versioned_wallet_documents(db: AsyncSession, user_id: int) -> tuple:
+    """(WalletResponse, versão) do usuário, ambos da mesma leitura do cache ou do banco."""
+    async def load():
+        document = await load_wallet(db, user_id)
+        return {"documents": wallet_response(document), "documents_version": document.version if document else None}
+
+    values = await wallet_cache.get_or_load_many(user_id, ("documents", "documents_version"), load)
+    return values["documents"], values["documents_version"]
+
+NOT_FOUND_DETAILS = {
+    "documents": "Nenhum documento encontrado para o usuário.",
+    "cpf": "Nenhum CPF encontrado para o usuário.",
+    "rg": "Nenhum RG encontrado para o usuário.",
+    "cnh": "Nenhuma CNH encontrada para o usuário.",
+    "vaccination_card": "Nenhuma carteira de vacinação encontrada para o usuário.",
+}
+
+def select_documents(documents, kind: str):
+    """Resposta de leitura de `kind` ("documents" para a carteira inteira); 404 se o usuário não o tiver."""
+    if kind == "documents":
+        if documents:
+            return DocumentsResponse(documents=documents)
+    elif documents and getattr(documents, kind):
+        return getattr(documents, kind)
+
+    raise HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail=NOT_FOUND_DETAILS[kind]
+    )
+
 @router.get(
         "/", 
         summary="Obter documentos", 
-        description="Retorna os documentos do usuário autenticado.",
+        description="Retorna os documentos do usuário autenticado. A resposta traz um `ETag`; "
+                    "com `If-None-Match` igual a ele, a API responde 304 sem reenviar os documentos.",
+        response_model=DocumentsResponse,
         status_code=status.HTTP_200_OK)
 async def get_documents(
-    db: db_dependency,
-    current_user: user_dependency
+    db: read_db_dependency,
+    current_user: user_dependency,
+    response: Response,
+    if_none_match: Annotated[str | None, Header()] = None
 ):
     if not current_user:
         raise HTTPException(
@@ -38,94 +123,62 @@ async def get_documents(
         )
 
     user_id = current_user.get("id")
-    document = db.query(Documents).filter(Documents.user_id == user_id).first()
-
-    if not document:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Nenhum documento encontrado para o usuário."
-        )
-    
-    return {
-        "documents": {
-            "cpf": document.cpf,
-            "rg": document.rg,
-            "cnh": document.cnh,
-            "vaccination_card": document.vaccination_card
-        }
-    }
-
-async def get_cpf(db: db_dependency, current_user: user_dependency):
-    if not current_user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Usuário não autenticado."
-        )
-
-    user_id = current_user.get("id")
-    document = db.query(Documents).filter(Documents.user_id == user_id).first()
-
-    if not document or not document.cpf:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Nenhum CPF encontrado para o usuário."
-        )
-    
-    return document.cpf
-
-async def get_rg(db: db_dependency, current_user: user_dependency):
-    if not current_user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Usuário não autenticado."
-        )
-
-    user_id = current_user.get("id")
-    document = db.query(Documents).filter(Documents.user_id == user_id).first()
-
-    if not document or not document.rg:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Nenhum RG encontrado para o usuário."
-        )
-    
-    return document.rg
-
-async def get_cnh(db: db_dependency, current_user: user_dependency):
-    if not current_user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Usuário não autenticado."
-        )
-
-    user_id = current_user.get("id")
-    document = db.query(Documents).filter(Documents.user_id == user_id).first()
+    if if_none_match:
+        version = await load_documents_version(db, user_id)
+        if version is not None and etag_matches(if_none_match, make_etag(user_id, version)):
+            return not_modified(make_etag(user_id, version))
+
+    documents, version = await load_versioned_wallet_documents(db, user_id)
+    result = select_documents(documents, "documents")
+    response.headers.update(etag_headers(make_etag(user_id, version)))
+    return result
+
+def link_document_statement(dialect_name: str, user_id: int, foreign_key: str, document_id: int):
+    """INSERT que cria o Documents do usuário ou aponta `foreign_key` para o novo documento,
+    incrementando a versão.
+
+    Depende do índice único em documents.user_id.
+    """
+    values = {"user_id": user_id, foreign_key: document_id, "version": 1}
+    if dialect_name == "mysql":
+        statement = mysql_insert(Documents).values(**values)
+        return statement.on_duplicate_key_update(
+            {foreign_key: statement.inserted[foreign_key], "version": Documents.version + 1})
+
+    statement = sqlite_insert(Documents).values(**values)
+    return statement.on_conflict_do_update(
+        index_elements=[Documents.user_id],
+        set_={foreign_key: statement.excluded[foreign_key], "version": Documents.version + 1}
+    )
 
-    if not document or not document.cnh:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Nenhuma CNH encontrada para o usuário."
-        )
-    
-    return document.cnh
+async def upsert_document(db: AsyncSession, current_user: dict, kind: str, request) -> None:
+    """Grava o documento `kind` e o associa ao Documents do usuário em uma única transação.
 
-async def get_vaccination_card(db: db_dependency, current_user: user_dependency):
+    O documento entra em um único flush e a associação é um único upsert no Documents.
+    """
     if not current_user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Usuário não autenticado."
         )
 
+    document_type = DOCUMENT_TYPES[kind]
     user_id = current_user.get("id")
-    document = db.query(Documents).filter(Documents.user_id == user_id).first()
-
-    if not document or not document.vaccination_card:
+    document = document_type.model(**document_values(document_type, request))
+    db.add(document)
+    try:
+        await db.flush()
+        await db.execute(link_document_statement(
+            db.get_bind().dialect.name, user_id, document_type.foreign_key, document.id))
+        await db.commit()
+    except exc.IntegrityError:
+        await db.rollback()
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Nenhuma carteira de vacinação encontrada para o usuário."
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Número de documento já cadastrado."
         )
-    
-    return document.vaccination_card
+    wallet_cache.invalidate(user_id)
+    stick_to_primary(user_id)
 
 @router.post(
         "/cpf", 
@@ -135,36 +188,7 @@ async def get_vaccination_card(db: db_dependency, current_user: user_dependency)
 async def create_cpf(create_cpf_request: CreateCpfRequest,
                     db: db_dependency,
                     current_user: user_dependency):
-    
-    if not current_user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Usuário não autenticado."
-        )
-    
-    create_cpf_model = Cpf(
-        number=create_cpf_request.number,
-        name=create_cpf_request.name,
-        issued_by=create_cpf_request.issued_by,
-        issued_date=create_cpf_request.issued_date
-    )
-
-    db.add(create_cpf_model)
-    db.commit()
-    db.refresh(create_cpf_model)  
-
-    
-    user_id = current_user.get("id") 
-    document = db.query(Documents).filter(Documents.user_id == user_id).first()
-
-    if not document:
-        document = Documents(user_id=user_id, cpf_id=create_cpf_model.id)
-        db.add(document)
-    else:
-        document.cpf_id = create_cpf_model.id
-
-    db.commit()
-
+    await upsert_document(db, current_user, "cpf", create_cpf_request)
     return {"message": "CPF criado e associado aos documentos com sucesso."}
 
 @router.post(
@@ -175,36 +199,7 @@ async def create_cpf(create_cpf_request: CreateCpfRequest,
 async def create_rg(create_rg_request: CreateRgRequest,
                     db: db_dependency,
                     current_user: user_dependency):
-    
-    if not current_user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Usuário não autenticado."
-        )
-    
-    create_rg_model = Rg(
-        number=create_rg_request.number,
-        name=create_rg_request.name,
-        issued_by=create_rg_request.issued_by,
-        issued_date=create_rg_request.issued_date
-    )
-
-    db.add(create_rg_model)
-    db.commit()
-    db.refresh(create_rg_model)  
-
-    
-    user_id = current_user.get("id") 
-    document = db.query(Documents).filter(Documents.user_id == user_id).first()
-
-    if not document:
-        document = Documents(user_id=user_id, rg_id=create_rg_model.id)
-        db.add(document)
-    else:
-        document.rg_id = create_rg_model.id
-
-    db.commit()
-
+    await upsert_document(db, current_user, "rg", create_rg_request)
     return {"message": "RG criado e associado aos documentos com sucesso."}
 
 @router.post(
@@ -215,39 +210,7 @@ async def create_rg(create_rg_request: CreateRgRequest,
 async def create_cnh(create_cnh_request: CreateCnhRequest,
                     db: db_dependency,
                     current_user: user_dependency):
-    
-    if not current_user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Usuário não autenticado."
-        )
-    
-    create_cnh_model = Cnh(
-        number=create_cnh_request.number,
-        name=create_cnh_request.name,
-        uf=create_cnh_request.uf,
-        issued_by=create_cnh_request.issued_by,
-        issued_date=create_cnh_request.issued_date,
-        expiration_date=create_cnh_request.expiration_date,
-        category=create_cnh_request.category
-    )
-
-    db.add(create_cnh_model)
-    db.commit()
-    db.refresh(create_cnh_model)  
-
-    
-    user_id = current_user.get("id") 
-    document = db.query(Documents).filter(Documents.user_id == user_id).first()
-
-    if not document:
-        document = Documents(user_id=user_id, cnh_id=create_cnh_model.id)
-        db.add(document)
-    else:
-        document.cnh_id = create_cnh_model.id
-
-    db.commit()
-
+    await upsert_document(db, current_user, "cnh", create_cnh_request)
     return {"message": "CNH criada e associada aos documentos com sucesso."}
 
 @router.post(
@@ -258,34 +221,5 @@ async def create_cnh(create_cnh_request: CreateCnhRequest,
 async def create_vaccination_card(create_vaccination_card_request: CreateVaccinationCardRequest,
                                    db: db_dependency,
                                    current_user: user_dependency):
-    
-    if not current_user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Usuário não autenticado."
-        )
-    
-    create_vaccination_card_model = VaccinationCard(
-        number=create_vaccination_card_request.number,
-        name=create_vaccination_card_request.name,
-        birth_date=create_vaccination_card_request.birth_date,
-        issued_date=create_vaccination_card_request.issued_date,
-        expiration_date=create_vaccination_card_request.expiration_date,
-        gender=create_vaccination_card_request)
-    
-    db.add(create_vaccination_card_model)
-    db.commit()
-    db.refresh(create_vaccination_card_model)
-
-    user_id = current_user.get("id") 
-    document = db.query(Documents).filter(Documents.user_id == user_id).first()
-
-    if not document:
-        document = Documents(user_id=user_id, vaccination_card_id=create_vaccination_card_model.id)
-        db.add(document)
-    else:
-        document.vaccination_card_id = create_vaccination_card_model.id
-
-    db.commit()
-
-    return {"message": "Carteira de vacinação criada e associada aos documentos com sucesso."}
\ No newline at end of file
+    await upsert_document(db, current_user, "vaccination_card", create_vaccination_card_request)
+    return {"message": "Carteira de vacinação criada e associada aos documentos com sucesso."}
@@ -1,40 +1,141 @@
+import asyncio
+import logging
+import os
+import time
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
 import httpx
-from database import SessionLocal
 from sqlalchemy import text
+from starlette import status
 from database import engine
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(
     prefix="/health",
     tags=["health"],
 )
 
+EXTERNAL_SERVICE_URL = os.getenv("EXTERNAL_SERVICE_URL", "https://jsonplaceholder.typicode.com/posts/1")
+HEALTH_CHECK_TIMEOUT = float(os.getenv("HEALTH_CHECK_TIMEOUT", "2"))
+HEALTH_CACHE_TTL = float(os.getenv("HEALTH_CACHE_TTL", "5"))
+
+# Cliente reaproveitado entre as verificações, com conexões keep-alive. Criado no primeiro
+# uso e fechado no fim do lifespan; uma nova subida no mesmo processo (testes, --reload)
+# cria outro no event loop dela
+http_client = None
+
+def get_http_client() -> httpx.AsyncClient:
+    global http_client
+    if http_client is None or http_client.is_closed:
+        http_client = httpx.AsyncClient(timeout=HEALTH_CHECK_TIMEOUT)
+    return http_client
+
+async def close_http_client():
+    global http_client
+    if http_client is not None:
+        await http_client.aclose()
+        http_client = None
+
 async def check_database():
-    try:
-        with engine.connect() as connection:
-            connection.execute(text("SELECT 1"))
-        return True
-    except Exception as e:
-        return False
+    async with engine.connect() as connection:
+        await connection.execute(text("SELECT 1"))
+    return True
 
 async def check_external_service():
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get('https://jsonplaceholder.typicode.com/posts')
-            return response.status_code == 200
-    except:
-        return False
+    response = await get_http_client().get(EXTERNAL_SERVICE_URL)
+    return response.status_code == 200
+
+
+class HealthChecker:
+    """Executa as verificações em paralelo, cada uma com timeout, e guarda o resultado por `ttl` segundos.
+
+    Chamadas simultâneas com o cache vencido compartilham a mesma rodada de verificações;
+    `start` mantém o cache atualizado em segundo plano.
+    """
+
+    def __init__(self, checks: dict, ttl: float, timeout: float, clock=time.monotonic):
+        self.checks = checks
+        self.ttl = ttl
+        self.timeout = timeout
+        self.clock = clock
+        self.checked_at = None
+        self._results = None
+        self._refreshing = None
+        self._refresher = None
+
+    async def _run_check(self, name, check) -> bool:
+        try:
+            return bool(await asyncio.wait_for(check(), self.timeout))
+        except Exception as error:
+            logger.warning("Verificação de saúde %s falhou: %r", name, error)
+            return False
+
+    async def _refresh(self) -> dict:
+        outcomes = await asyncio.gather(*(self._run_check(name, check) for name, check in self.checks.items()))
+        self._results = dict(zip(self.checks, outcomes))
+        self.checked_at = self.clock()
+        return self._results
+
+    async def refresh(self) -> dict:
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.ensure_future(self._refresh())
+        return await asyncio.shield(self._refreshing)
+
+    async def results(self) -> dict:
+        if self._results is not None and self.clock() - self.checked_at < self.ttl:
+            return self._results
+        return await self.refresh()
+
+    def start(self, interval: float | None = None):
+        async def refresh_forever():
+            while True:
+                await self.refresh()
+                await asyncio.sleep(interval or self.ttl / 2)
+
+        self._refresher = asyncio.ensure_future(refresh_forever())
+
+    async def stop(self):
+        # Uma rodada pendente ficaria presa ao event loop que está terminando
+        for task in (self._refresher, self._refreshing):
+            if task is not None and not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        self._refresher = None
+        self._refreshing = None
+
+
+health_checker = HealthChecker(
+    {"database": check_database, "external_api": check_external_service},
+    ttl=HEALTH_CACHE_TTL,
+    timeout=HEALTH_CHECK_TIMEOUT,
+)
+
+def format_results(results: dict) -> dict:
+    return {name: "up" if up else "down" for name, up in results.items()}
 
 @router.get(
-        "/", 
+        "/",
         summary="Health Check",
         description="Verifica se a API está funcionando corretamente.",
         status_code=200)
 async def health_check():
-    db_status = await check_database()
-    api_status = await check_external_service()
+    return format_results(await health_checker.results())
+
+@router.get(
+        "/live",
+        summary="Liveness",
+        description="Indica que o processo da API está respondendo, sem consultar dependências.",
+        status_code=200)
+async def liveness():
+    return {"status": "up"}
 
-    return {
-        "database": "up" if db_status else "down",
-        "external_api": "up" if api_status else "down"
-    }
\ No newline at end of file
+@router.get(
+        "/ready",
+        summary="Readiness",
+        description="Verifica o banco de dados e o serviço externo; responde 503 enquanto o banco estiver indisponível.",
+        status_code=200)
+async def readiness():
+    results = await health_checker.results()
+    status_code = status.HTTP_200_OK if results["database"] else status.HTTP_503_SERVICE_UNAVAILABLE
+    return JSONResponse(format_results(results), status_code=status_code)
@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Response
+from starlette import status
+
+from metrics import CONTENT_TYPE, REGISTRY
+
+router = APIRouter(
+    prefix="/metrics",
+    tags=["metrics"],
+)
+
+@router.get(
+        "",
+        summary="Métricas",
+        description="Expõe as métricas internas da API no formato de texto do Prometheus.",
+        status_code=status.HTTP_200_OK)
+async def get_metrics():
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
@@ -0,0 +1,220 @@
+import asyncio
+import json
+
+import pytest
+from sqlalchemy import func, select
+
+import routers.admin
+from models import Cnh, Cpf, Documents, Rg, Users
+
+ADMIN_HEADERS = {"X-Admin-Key": "chave-admin"}
+
+
+@pytest.fixture(autouse=True)
+def admin_key(monkeypatch):
+    monkeypatch.setattr(routers.admin, "ADMIN_API_KEY", "chave-admin")
+
+
+def seed_users(db_session_factory, *user_ids):
+    async def seed():
+        async with db_session_factory() as db:
+            db.add_all(Users(id=user_id, username=f"usuario{user_id}", hashed_password="x") for user_id in user_ids)
+            await db.commit()
+
+    asyncio.run(seed())
+
+
+def cpf_row(user_id, number, **overrides):
+    return {"type": "cpf", "user_id": user_id, "id": 0, "number": number, "name": "Fulano",
+            "issued_by": "Receita Federal", "issued_date": "2020-01-01", **overrides}
+
+
+def ndjson(*rows):
+    return "\n".join(row if isinstance(row, str) else json.dumps(row) for row in rows)
+
+
+def test_import_requires_admin_key(client):
+    response = client.post("/admin/documents/import", content="",
+                           headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 401
+
+
+def test_import_rejects_unknown_content_type(client):
+    response = client.post("/admin/documents/import", content="{}",
+                           headers={**ADMIN_HEADERS, "Content-Type": "application/json"})
+    assert response.status_code == 415
+
+
+def test_import_ndjson_reports_row_errors_without_aborting(client, db_session_factory):
+    seed_users(db_session_factory, 1, 2)
+    body = ndjson(
+        cpf_row(1, "11111111111"),
+        {"type": "rg", "user_id": 1, "id": 0, "number": "2222222222", "name": "Fulano",
+         "issued_by": "Detran RJ", "issued_date": "2015-06-10"},
+        {"type": "cnh", "user_id": 2, "id": 0, "number": "33333333333", "name": "Beltrano", "uf": "RJ",
+         "issued_by": "Detran RJ", "issued_date": "2019-03-01", "expiration_date": "2029-03-01",
+         "category": "B"},
+        "{nao e json",
+        cpf_row(1, "11111111111"),
+        cpf_row(99, "44444444444"),
+        cpf_row(2, "55555555555", issued_date="ontem"),
+        {"type": "passaporte", "user_id": 1},
+    )
+
+    response = client.post("/admin/documents/import", content=body,
+                           headers={**ADMIN_HEADERS, "Content-Type": "application/x-ndjson"})
+    assert response.status_code == 200
+    result = response.json()
+    assert result["imported"] == 3
+    assert [error["line"] for error in result["errors"]] == [4, 5, 6, 7, 8]
+    assert result["errors"][1]["error"] == "Número de documento já cadastrado."
+    assert result["errors"][2]["error"] == "Usuário não encontrado."
+    assert "issued_date" in result["errors"][3]["error"]
+
+    async def read_wallets():
+        async with db_session_factory() as db:
+            return (await db.execute(
+                select(Documents.user_id, Cpf.number, Rg.number, Cnh.number)
+                .outerjoin(Cpf, Documents.cpf_id == Cpf.id)
+                .outerjoin(Rg, Documents.rg_id == Rg.id)
+                .outerjoin(Cnh, Documents.cnh_id == Cnh.id)
+                .order_by(Documents.user_id)
+            )).all()
+
+    assert asyncio.run(read_wallets()) == [
+        (1, "11111111111", "2222222222", None),
+        (2, None, None, "33333333333"),
+    ]
+
+
+def test_import_csv_links_existing_wallets_in_chunks(client, db_session_factory, monkeypatch):
+    monkeypatch.setattr(routers.admin, "IMPORT_CHUNK_SIZE", 2)
+    seed_users(db_session_factory, 1, 2, 3)
+    header = "type,user_id,id,number,name,issued_by,issued_date"
+    first = "\n".join([header, 'cpf,1,0,00000000001,"Fulano, o Primeiro",RF,2020-01-01'])
+    second = "\n".join([
+        header,
+        "cpf,2,0,00000000002,Beltrano,RF,2020-01-01",
+        'cpf,3,0,00000000003,"Nome com\nquebra",RF,2020-01-01',
+        "cpf,3,0,00000000004",
+    ])
+
+    for body in (first, second):
+        response = client.post("/admin/documents/import", content=body,
+                               headers={**ADMIN_HEADERS, "Content-Type": "text/csv"})
+        assert response.status_code == 200
+
+    assert response.json()["imported"] == 2
+    assert [error["line"] for error in response.json()["errors"]] == [5]
+
+    async def count_rows():
+        async with db_session_factory() as db:
+            return (await db.scalar(select(func.count()).select_from(Documents)),
+                    await db.scalar(select(Cpf.name).where(Cpf.number == "00000000003")))
+
+    assert asyncio.run(count_rows()) == (3, "Nome com\nquebra")
+
+
+def test_import_falls_back_to_row_by_row_when_the_database_rejects_a_chunk(client, db_session_factory,
+                                                                           monkeypatch):
+    seed_users(db_session_factory, 1)
+    body = ndjson(cpf_row(1, "11111111111"), cpf_row(1, "22222222222"))
+
+    original_import_chunk = routers.admin.import_chunk
+    calls = []
+
+    async def failing_first_chunk(db, rows, errors):
+        calls.append(len(rows))
+        if len(calls) == 1:
+            raise routers.admin.exc.DBAPIError("INSERT", {}, Exception("falha simulada"))
+        return await original_import_chunk(db, rows, errors)
+
+    monkeypatch.setattr(routers.admin, "import_chunk", failing_first_chunk)
+    response = client.post("/admin/documents/import", content=body,
+                           headers={**ADMIN_HEADERS, "Content-Type": "application/x-ndjson"})
+
+    assert response.json() == {"imported": 2, "errors": []}
+    assert calls == [2, 1, 1]
+
+
+def import_wallets(client, db_session_factory):
+    seed_users(db_session_factory, 1, 2, 3, 4, 5)
+    body = ndjson(
+        cpf_row(1, "00000000001", issued_date="2019-05-01"),
+        {"type": "rg", "user_id": 1, "id": 0, "number": "1000000001", "name": "Fulano",
+         "issued_by": "Detran RJ", "issued_date": "2021-02-03"},
+        cpf_row(2, "00000000002", issued_date="2021-07-01"),
+        cpf_row(3, "00000000003", issued_date="2022-01-01"),
+        cpf_row(4, "00000000004", issued_date="2023-01-01"),
+        {"type": "cnh", "user_id": 5, "id": 0, "number": "50000000005", "name": "Beltrano", "uf": "SP",
+         "issued_by": "Detran SP", "issued_date": "2021-03-01", "expiration_date": "2031-03-01",
+         "category": "AB"},
+    )
+    response = client.post("/admin/documents/import", content=body,
+                           headers={**ADMIN_HEADERS, "Content-Type": "application/x-ndjson"})
+    assert response.json()["errors"] == []
+
+
+def test_export_requires_admin_key(client):
+    assert client.get("/admin/documents/export").status_code == 401
+    assert client.get("/admin/documents/export", params={"type": "passaporte"},
+                      headers=ADMIN_HEADERS).status_code == 422
+
+
+def test_export_streams_every_table_as_ndjson_in_keyset_batches(client, db_session_factory, monkeypatch,
+                                                                 query_counter):
+    import_wallets(client, db_session_factory)
+    monkeypatch.setattr(routers.admin, "EXPORT_BATCH_SIZE", 2)
+    query_counter.clear()
+
+    response = client.get("/admin/documents/export", headers=ADMIN_HEADERS)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert [(record["type"], record["user_id"], record.get("number")) for record in records] == [
+        *(("user", user_id, None) for user_id in range(1, 6)),
+        *(("documents", user_id, None) for user_id in range(1, 6)),
+        ("cpf", 1, "00000000001"), ("cpf", 2, "00000000002"), ("cpf", 3, "00000000003"),
+        ("cpf", 4, "00000000004"), ("rg", 1, "1000000001"), ("cnh", 5, "50000000005"),
+    ]
+    assert records[0] == {"type": "user", "user_id": 1, "username": "usuario1", "id": 1}
+    cpf = records[10]
+    assert cpf == {"type": "cpf", "user_id": 1, "username": "usuario1", "id": cpf["id"], "number": "00000000001",
+                   "name": "Fulano", "issued_by": "Receita Federal", "issued_date": "2019-05-01"}
+    # Lotes de dois, cada tabela pela própria chave primária: 5 usuários e 5 carteiras em
+    # três consultas cada, 4 CPFs em três, e uma consulta para RG, CNH e vacinação
+    assert len(query_counter) == 12
+    tables = ["users"] * 3 + ["documents"] * 3 + ["cpf"] * 3 + ["rg", "cnh", "vaccination_card"]
+    assert [f"{table}.id >" in statement for table, statement in zip(tables, query_counter)] == [True] * 12
+
+
+def test_export_includes_users_without_wallet_and_replaced_documents(client, db_session_factory):
+    import_wallets(client, db_session_factory)
+    seed_users(db_session_factory, 6)
+    # Um novo CPF para o usuário 1: o antigo continua na tabela, sem carteira apontando para ele
+    response = client.post("/admin/documents/import", content=ndjson(cpf_row(1, "00000000011")),
+                           headers={**ADMIN_HEADERS, "Content-Type": "application/x-ndjson"})
+    assert response.json()["imported"] == 1
+
+    response = client.get("/admin/documents/export", headers=ADMIN_HEADERS, params={"type": ["user", "cpf"]})
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert {"type": "user", "user_id": 6, "username": "usuario6", "id": 6} in records
+    cpfs = {record["number"]: (record["user_id"], record["username"]) for record in records if record["type"] == "cpf"}
+    assert cpfs["00000000001"] == (None, None)
+    assert cpfs["00000000011"] == (1, "usuario1")
+
+
+def test_export_csv_filters_by_type_and_issued_date(client, db_session_factory):
+    import_wallets(client, db_session_factory)
+
+    response = client.get("/admin/documents/export", headers=ADMIN_HEADERS, params={
+        "format": "csv", "type": ["cpf", "cnh"], "issued_from": "2021-01-01", "issued_to": "2022-12-31"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    lines = response.text.splitlines()
+    assert lines[0] == ",".join(routers.admin.EXPORT_COLUMNS)
+    assert lines[1:] == [
+        f"cpf,2,usuario2,{lines[1].split(',')[3]},00000000002,Fulano,Receita Federal,2021-07-01,,,,,",
+        f"cpf,3,usuario3,{lines[2].split(',')[3]},00000000003,Fulano,Receita Federal,2022-01-01,,,,,",
+        f"cnh,5,usuario5,{lines[3].split(',')[3]},50000000005,Beltrano,Detran SP,2021-03-01,SP,2031-03-01,AB,,",
+    ]
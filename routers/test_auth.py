@@ -4,9 +4,24 @@ import os
 # Adiciona o diretório raiz do projeto ao sys.path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import asyncio
+import subprocess
+import threading
+from datetime import datetime, timedelta
+
+import pytest
 from main import app
 from fastapi.testclient import TestClient
 
+import hashing
+import routers.auth
+from cache import LRUCache
+from hashing import (HashingPool, HashingPoolFull, bcrypt_rounds, build_context, calibrate_bcrypt_rounds, dummy_hash,
+                     hash_rounds, hashing_rejected_total, hashing_seconds)
+from models import RefreshToken, Users
+from sqlalchemy import select, update
+from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
+
 client = TestClient(app)
 
 def test_create_user_password_length():
@@ -32,4 +47,367 @@ def test_create_user_password_length():
         "password": "validpassword123"
     }
     response = client.post("/auth/", json=valid_password_data)
-    assert response.status_code == 201
\ No newline at end of file
+    assert response.status_code == 201
+
+def test_login_with_hashing_pool(client):
+    credentials = {"username": "testuser4", "password": "validpassword123"}
+    assert client.post("/auth/", json=credentials).status_code == 201
+
+    response = client.post("/auth/token", data=credentials)
+    assert response.status_code == 200
+
+    response = client.post("/auth/token", data={**credentials, "password": "senhaerrada"})
+    assert response.status_code == 401
+
+
+@pytest.mark.anyio
+async def test_hashing_pool_rejects_when_queue_is_full():
+    pool = HashingPool(workers=1, max_queue=1)
+    release = threading.Event()
+    rejected_before = hashing_rejected_total.get()
+
+    running = asyncio.ensure_future(pool.run(release.wait))
+    queued = asyncio.ensure_future(pool.run(release.wait))
+    await asyncio.sleep(0.05)
+    assert pool.in_flight == 1
+    assert pool.queue_depth == 1
+
+    with pytest.raises(HashingPoolFull):
+        await pool.run(release.wait)
+    assert hashing_rejected_total.get() == rejected_before + 1
+
+    release.set()
+    await asyncio.gather(running, queued)
+    assert pool.queue_depth == 0
+    pool.shutdown()
+
+
+def test_create_user_returns_503_when_hashing_pool_is_full(client, monkeypatch):
+    full_pool = HashingPool(workers=1, max_queue=0)
+    full_pool._pending = 1
+    monkeypatch.setattr(routers.auth, "hashing_pool", full_pool)
+
+    response = client.post("/auth/", json={"username": "testuser5", "password": "validpassword123"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_hashing_pool_metrics(client):
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert "password_hash_pool_workers" in response.text
+    assert "password_hash_pool_queue_depth 0.0" in response.text
+    assert f"password_hash_rounds {float(bcrypt_rounds)}" in response.text
+
+
+def test_get_current_user_uses_token_cache(auth_client):
+    routers.auth.token_cache.clear()
+    hits_before = routers.auth.token_cache.hits
+    misses_before = routers.auth.token_cache.misses
+
+    assert auth_client.get("/transport/balance").status_code == 404
+    assert auth_client.get("/transport/balance").status_code == 404
+
+    assert routers.auth.token_cache.misses == misses_before + 1
+    assert routers.auth.token_cache.hits == hits_before + 1
+    assert len(routers.auth.token_cache) == 1
+
+
+def test_token_cache_rejects_invalid_token(client):
+    client.cookies.set("access_token", "Bearer token-invalido")
+    assert client.get("/transport/balance").status_code == 401
+    assert client.get("/transport/balance").status_code == 401
+
+
+def test_token_cache_evicts_at_expiration():
+    now = [1000.0]
+    cache = LRUCache("token_test", max_entries=2, clock=lambda: now[0])
+
+    cache.set("a", {"id": 1}, expires_at=1010)
+    assert cache.get("a") == {"id": 1}
+
+    now[0] = 1010
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_token_cache_is_bounded_lru():
+    cache = LRUCache("token_test", max_entries=2, clock=lambda: 0)
+    cache.set("a", 1, expires_at=10)
+    cache.set("b", 2, expires_at=10)
+    cache.get("a")
+    cache.set("c", 3, expires_at=10)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def refresh(client, token=None):
+    if token is None:
+        return client.post("/auth/refresh")
+    return client.post("/auth/refresh", json={"refresh_token": token})
+
+
+def test_login_issues_a_refresh_token_scoped_to_auth_routes(client):
+    credentials = {"username": "usuario_refresh", "password": "senhateste123"}
+    client.post("/auth/", json=credentials)
+    response = client.post("/auth/token", data=credentials)
+
+    assert response.json()["refresh_token"]
+    cookie = next(cookie for cookie in client.cookies.jar if cookie.name == "refresh_token")
+    assert cookie.path == "/auth"
+    assert cookie.value == response.json()["refresh_token"]
+
+
+def test_refresh_renews_the_session_without_bcrypt(auth_client, monkeypatch):
+    async def no_bcrypt(*args):
+        raise AssertionError("a renovação não deve verificar senha")
+
+    monkeypatch.setattr(routers.auth.hashing_pool, "verify", no_bcrypt)
+    old_token = auth_client.cookies["refresh_token"]
+
+    response = refresh(auth_client)
+    assert response.status_code == 200
+    assert response.json()["refresh_token"] != old_token
+    assert auth_client.cookies["access_token"] == f'"Bearer {response.json()["access_token"]}"'
+    assert auth_client.get("/transport/balance").status_code == 404
+
+    # Tokens são de uso único: o antigo não renova mais, o novo continua renovando
+    assert refresh(auth_client, old_token).status_code == 401
+
+
+def test_reusing_a_rotated_refresh_token_revokes_the_session(auth_client):
+    stolen = auth_client.cookies["refresh_token"]
+    current = refresh(auth_client).json()["refresh_token"]
+
+    assert refresh(auth_client, stolen).status_code == 401
+    assert refresh(auth_client, current).status_code == 401
+
+
+def test_refresh_body_token_and_logout(auth_client):
+    token = refresh(auth_client).json()["refresh_token"]
+    rotated = refresh(auth_client, token)
+    assert rotated.status_code == 200
+
+    assert auth_client.post("/auth/logout", json={"refresh_token": rotated.json()["refresh_token"]}).status_code == 204
+    assert refresh(auth_client, rotated.json()["refresh_token"]).status_code == 401
+    assert "access_token" not in auth_client.cookies
+
+
+def test_forged_refresh_tokens_are_rejected_without_touching_the_database(client, query_counter):
+    secret = "a" * 43
+    for token in ("", "lixo", f"{secret}.{'0' * 64}", f"{secret}.{routers.auth.sign_refresh_secret('b' * 43)}"):
+        assert refresh(client, token).status_code == 401
+    assert query_counter == []
+
+
+def test_expired_refresh_token_is_rejected(auth_client, db_session_factory):
+    async def expire_all():
+        async with db_session_factory() as db:
+            await db.execute(update(RefreshToken).values(expires_at=datetime.utcnow() - timedelta(seconds=1)))
+            await db.commit()
+
+    asyncio.run(expire_all())
+    assert refresh(auth_client).status_code == 401
+
+
+def test_refresh_token_is_stored_hashed(auth_client, db_session_factory):
+    async def stored_hashes():
+        async with db_session_factory() as db:
+            return list(await db.scalars(select(RefreshToken.token_hash)))
+
+    token = auth_client.cookies["refresh_token"]
+    assert [routers.auth.refresh_token_hash(token)] == asyncio.run(stored_hashes())
+    assert token not in asyncio.run(stored_hashes())
+
+
+def test_purge_deletes_expired_and_revoked_refresh_tokens(auth_client, db_session_factory):
+    credentials = {"username": "usuario_teste", "password": "senhateste123"}
+    logged_out = auth_client.post("/auth/token", data=credentials).json()["refresh_token"]
+    assert auth_client.post("/auth/logout", json={"refresh_token": logged_out}).status_code == 204
+    expired = auth_client.post("/auth/token", data=credentials).json()["refresh_token"]
+    stolen = auth_client.post("/auth/token", data=credentials).json()["refresh_token"]
+    current = refresh(auth_client, stolen).json()["refresh_token"]
+
+    async def purge():
+        async with db_session_factory() as db:
+            await db.execute(update(RefreshToken)
+                             .where(RefreshToken.token_hash == routers.auth.refresh_token_hash(expired))
+                             .values(expires_at=datetime.utcnow() - timedelta(seconds=1)))
+            await db.commit()
+            purged = await routers.auth.purge_refresh_tokens(db, batch_size=1)
+            return purged, set(await db.scalars(select(RefreshToken.token_hash)))
+
+    purged, remaining = asyncio.run(purge())
+    # A sessão do auth_client e a renovada continuam; o token trocado fica para detectar reuso
+    assert purged == 2
+    assert routers.auth.refresh_token_hash(current) in remaining
+    assert routers.auth.refresh_token_hash(stolen) in remaining
+    assert len(remaining) == 3
+    assert refresh(auth_client, stolen).status_code == 401
+    assert refresh(auth_client, current).status_code == 401
+
+
+def test_login_is_throttled_per_username_before_bcrypt(client, monkeypatch):
+    monkeypatch.setattr(routers.auth.login_throttle.by_username, "take",
+                        lambda username: 0.0 if username != "usuario_alvo" else 42.5)
+
+    async def no_bcrypt(*args):
+        raise AssertionError("tentativas bloqueadas não devem chegar ao bcrypt")
+
+    monkeypatch.setattr(routers.auth.hashing_pool, "verify", no_bcrypt)
+    monkeypatch.setattr(routers.auth.hashing_pool, "verify_dummy", no_bcrypt)
+
+    response = client.post("/auth/token", data={"username": "usuario_alvo", "password": "qualquer"})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "43"
+
+
+async def instant_dummy_verify(password):
+    return False
+
+
+def test_login_is_throttled_per_client_ip(client, monkeypatch):
+    # Sem o bcrypt das tentativas, o balde não tem tempo de reabastecer durante o teste
+    monkeypatch.setattr(routers.auth.hashing_pool, "verify_dummy", instant_dummy_verify)
+    credentials = {"username": "usuario_ip", "password": "senhateste123"}
+    client.post("/auth/", json=credentials)
+    burst = routers.auth.login_throttle.by_ip.window / routers.auth.login_throttle.by_ip.interval
+
+    statuses = [client.post("/auth/token", data={"username": f"inexistente{index}", "password": "x"}).status_code
+                for index in range(round(burst))]
+    assert set(statuses) == {401}
+    # O IP esgotou as fichas: nem a senha certa passa até ele reabastecer
+    assert client.post("/auth/token", data=credentials).status_code == 429
+
+
+def test_forwarded_client_ips_behind_a_trusted_proxy_get_separate_buckets(client, monkeypatch):
+    monkeypatch.setattr(routers.auth.hashing_pool, "verify_dummy", instant_dummy_verify)
+    burst = round(routers.auth.login_throttle.by_ip.window / routers.auth.login_throttle.by_ip.interval)
+    # Como main.py com TRUSTED_PROXIES=10.0.0.0/8: todos os clientes chegam pelo balanceador 10.0.0.1
+    balancer = TestClient(ProxyHeadersMiddleware(app, trusted_hosts=["10.0.0.0/8"]), client=("10.0.0.1", 123))
+    outsider = TestClient(app, client=("203.0.113.9", 123))
+
+    attempts = iter(range(10**6))
+
+    def login(test_client, forwarded_for):
+        # Um nome por tentativa, para só o balde do IP entrar em jogo
+        return test_client.post("/auth/token", data={"username": f"inexistente{next(attempts)}", "password": "x"},
+                                headers={"X-Forwarded-For": forwarded_for}).status_code
+
+    assert {login(balancer, "198.51.100.1") for _ in range(burst)} == {401}
+    assert login(balancer, "198.51.100.1") == 429
+    # Outro cliente atrás do mesmo balanceador tem o próprio balde
+    assert login(balancer, "198.51.100.2") == 401
+    # Fora de um proxy confiável, o X-Forwarded-For é ignorado: forjá-lo não troca de balde
+    assert {login(outsider, f"192.0.2.{index}") for index in range(burst)} == {401}
+    assert login(outsider, "192.0.2.200") == 429
+
+
+def test_trusted_proxies_setting_installs_the_proxy_headers_middleware():
+    script = ("from main import app; from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware; "
+              "[middleware] = [m for m in app.user_middleware if m.cls is ProxyHeadersMiddleware]; "
+              "assert middleware.kwargs == {'trusted_hosts': ['10.0.0.0/8', '192.168.0.10']}")
+    environment = {**os.environ, "TRUSTED_PROXIES": "10.0.0.0/8, 192.168.0.10"}
+    subprocess.run([sys.executable, "-c", script], cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                   env=environment, check=True)
+
+
+def test_successful_logins_from_one_ip_are_not_throttled(client, monkeypatch):
+    # Usuários atrás do mesmo NAT ou proxy: quem acerta a senha não gasta as fichas do IP
+    credentials = {"username": "usuario_nat", "password": "senhateste123"}
+    client.post("/auth/", json=credentials)
+
+    async def instant_verify(password, hashed_password):
+        return password == credentials["password"]
+
+    monkeypatch.setattr(routers.auth.hashing_pool, "verify", instant_verify)
+    burst = routers.auth.login_throttle.by_ip.window / routers.auth.login_throttle.by_ip.interval
+
+    statuses = [client.post("/auth/token", data=credentials).status_code for _ in range(round(burst) * 3)]
+    assert set(statuses) == {200}
+
+
+def test_unknown_users_pay_a_dummy_bcrypt_verify(client, monkeypatch):
+    verified = []
+
+    async def dummy(password):
+        verified.append(password)
+        return False
+
+    monkeypatch.setattr(routers.auth.hashing_pool, "verify_dummy", dummy)
+    response = client.post("/auth/token", data={"username": "nao_existe", "password": "palpite"})
+    assert response.status_code == 401
+    assert verified == ["palpite"]
+
+
+@pytest.mark.anyio
+async def test_dummy_verify_runs_bcrypt_and_always_fails():
+    pool = HashingPool(workers=1, max_queue=0)
+    try:
+        assert await pool.verify_dummy("qualquer") is False
+        assert dummy_hash().startswith("$2b$")
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.parametrize("seconds_at_8_rounds, expected", [(0.02, 11), (0.2, 10), (0.0001, 16)])
+def test_bcrypt_cost_is_calibrated_to_the_time_budget(seconds_at_8_rounds, expected):
+    # Cada round dobra o tempo: 20 ms em 8 rounds viram 160 ms em 11 e 320 ms em 12
+    assert calibrate_bcrypt_rounds(0.25, measure=lambda rounds: seconds_at_8_rounds) == expected
+
+
+# Custo 4: hash fraco demais. Dois rounds acima do calibrado: hash de antes de uma troca de
+# hardware que baixou o custo, que estouraria o orçamento e destoaria do dummy_hash
+@pytest.mark.parametrize("stale_rounds", [4, bcrypt_rounds + 2])
+def test_login_rehashes_passwords_with_a_stale_cost(client, db_session_factory, stale_rounds):
+    credentials = {"username": "usuario_antigo", "password": "senhateste123"}
+    client.post("/auth/", json=credentials)
+
+    async def stored_hash(new_hash=None):
+        async with db_session_factory() as db:
+            if new_hash is not None:
+                await db.execute(update(Users).values(hashed_password=new_hash))
+                await db.commit()
+            return await db.scalar(select(Users.hashed_password))
+
+    asyncio.run(stored_hash(build_context(stale_rounds).hash(credentials["password"])))
+    verifications = hashing_seconds.get_count(operation="verify")
+
+    assert client.post("/auth/token", data=credentials).status_code == 200
+    rehashed = asyncio.run(stored_hash())
+    assert rehashed.startswith(f"$2b${bcrypt_rounds:02d}$")
+    assert hashing_seconds.get_count(operation="verify") == verifications + 1
+
+    # Com o custo em dia, o hash não é refeito
+    assert client.post("/auth/token", data=credentials).status_code == 200
+    assert asyncio.run(stored_hash()) == rehashed
+
+
+def test_processes_one_round_apart_do_not_rewrite_the_hash_on_every_login(client, db_session_factory, monkeypatch):
+    credentials = {"username": "usuario_frota", "password": "senhateste123"}
+    client.post("/auth/", json=credentials)
+    # Dois processos calibrados em máquinas diferentes, com custos 5 e 6
+    processes = [(rounds, build_context(rounds)) for rounds in (5, 6)]
+
+    async def stored_hash(new_hash=None):
+        async with db_session_factory() as db:
+            if new_hash is not None:
+                await db.execute(update(Users).values(hashed_password=new_hash))
+                await db.commit()
+            return await db.scalar(select(Users.hashed_password))
+
+    asyncio.run(stored_hash(processes[0][1].hash(credentials["password"])))
+    hashes = []
+    for login in range(6):
+        rounds, context = processes[login % 2]
+        monkeypatch.setattr(hashing, "bcrypt_rounds", rounds)
+        monkeypatch.setattr(hashing, "bcrypt_context", context)
+        assert client.post("/auth/token", data=credentials).status_code == 200
+        hashes.append(asyncio.run(stored_hash()))
+
+    # O processo de custo 6 sobe o hash no primeiro login dele; depois, o de custo 5 não o rebaixa
+    assert hash_rounds(hashes[0]) == 5
+    assert len(set(hashes[1:])) == 1
+    assert hash_rounds(hashes[1]) == 6
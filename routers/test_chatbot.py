@@ -0,0 +1,98 @@
+import pytest
+
+from routers.chatbot import IntentMatcher, intent_matcher, normalize
+from routers.test_documents import seed_full_wallet
+
+
+def test_normalize_strips_accents_and_case():
+    assert normalize("Olá, VACINAÇÃO, Identidade") == "ola, vacinacao, identidade"
+
+
+@pytest.mark.parametrize("question, intents", [
+    ("Olá!", ["greeting"]),
+    ("ola tudo bem", ["greeting"]),
+    ("TCHAU", ["farewell"]),
+    ("quero ver meus Documentos", ["documents"]),
+    ("me mostra o C.P.F.", ["cpf"]),
+    ("qual o número da minha identidade?", ["rg"]),
+    ("minhas vacinações", ["vaccination_card"]),
+    ("minha carteira  de motorista", ["cnh"]),
+    ("qual meu saldo?", ["balance"]),
+])
+def test_intents_are_matched_after_normalization(question, intents):
+    assert intent_matcher.match(question) == intents
+
+
+@pytest.mark.parametrize("question", ["emergência", "escola", "cargo", "docente", "saldos"])
+def test_keywords_only_match_whole_words(question):
+    assert intent_matcher.match(question) == []
+
+
+def test_intents_are_ranked_by_hits_then_priority():
+    assert intent_matcher.match("rg, cpf ou cpf?") == ["cpf", "rg"]
+    assert intent_matcher.match("saldo e cnh") == ["cnh", "balance"]
+
+
+def test_keyword_stems_accept_any_suffix():
+    matcher = IntentMatcher({"vacina": ("vacina*",)})
+    assert matcher.match("vacinas e vacinação") == ["vacina"]
+    assert matcher.match("avacina") == []
+
+
+def test_chatbot_answers_accented_greeting(auth_client):
+    response = auth_client.post("/chatbot/", params={"question": "Olá!"})
+    assert response.json() == {"response": "Olá! Como posso ajudar você hoje?"}
+
+
+def test_chatbot_does_not_match_keywords_inside_words(auth_client):
+    response = auth_client.post("/chatbot/", params={"question": "preciso de ajuda na escola"})
+    assert response.json() == {"response": "Desculpe, não entendi sua pergunta. Pode reformular?"}
+
+
+def test_multi_intent_question_is_answered_with_one_query(auth_client, db_session_factory, query_counter):
+    seed_full_wallet(db_session_factory)
+    assert auth_client.post("/transport/add_balance", params={"amount": 10}).status_code == 201
+    query_counter.clear()
+
+    response = auth_client.post("/chatbot/", params={"question": "qual meu saldo e minha CNH?"})
+    assert response.status_code == 200
+    answers = response.json()["answers"]
+    assert list(answers) == ["cnh", "balance"]
+    assert answers["cnh"]["number"] == "11122233344"
+    assert answers["balance"] == {"message": "Saldo atual: R$ 10.00"}
+    assert len(query_counter) == 1
+
+    query_counter.clear()
+    assert auth_client.post("/chatbot/", params={"question": "saldo e cnh"}).json()["answers"] == answers
+    assert query_counter == []
+
+
+def test_multi_intent_question_only_queries_uncached_sections(auth_client, db_session_factory, query_counter):
+    seed_full_wallet(db_session_factory)
+    assert auth_client.post("/transport/add_balance", params={"amount": 5}).status_code == 201
+    assert auth_client.get("/transport/balance").status_code == 200
+    query_counter.clear()
+
+    answers = auth_client.post("/chatbot/", params={"question": "meu cpf e meu saldo"}).json()["answers"]
+    assert answers["cpf"]["number"] == "11122233344"
+    assert answers["balance"] == {"message": "Saldo atual: R$ 5.00"}
+    assert len(query_counter) == 1
+    assert "transport" not in query_counter[0]
+
+
+def test_multi_intent_question_reports_missing_parts(auth_client):
+    assert auth_client.post("/transport/add_balance", params={"amount": 3}).status_code == 201
+
+    response = auth_client.post("/chatbot/", params={"question": "olá! qual meu saldo e minha cnh?"})
+    assert response.status_code == 200
+    assert response.json()["answers"] == {
+        "greeting": {"response": "Olá! Como posso ajudar você hoje?"},
+        "cnh": {"detail": "Nenhuma CNH encontrada para o usuário."},
+        "balance": {"message": "Saldo atual: R$ 3.00"},
+    }
+
+
+def test_single_intent_keeps_not_found_status(auth_client):
+    response = auth_client.post("/chatbot/", params={"question": "minha cnh"})
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Nenhuma CNH encontrada para o usuário."
@@ -0,0 +1,299 @@
+import asyncio
+import time
+from datetime import date
+
+import pytest
+from sqlalchemy import event, select
+
+from cache import WalletCache, wallet_cache
+from etag import etag_matches
+from models import Cnh, Cpf, Documents, Rg, Users, VaccinationCard
+
+CPF_PAYLOAD = {
+    "id": 1,
+    "number": "12345678901",
+    "name": "Usuario Teste",
+    "issued_by": "Receita Federal",
+    "issued_date": "2020-01-01",
+}
+
+RG_PAYLOAD = {
+    "id": 1,
+    "number": "1234567890",
+    "name": "Usuario Teste",
+    "issued_by": "Detran RJ",
+    "issued_date": "2015-06-10",
+}
+
+CNH_PAYLOAD = {
+    "id": 1,
+    "number": "98765432100",
+    "name": "Usuario Teste",
+    "uf": "RJ",
+    "issued_by": "Detran RJ",
+    "issued_date": "2019-03-01",
+    "expiration_date": "2029-03-01",
+    "category": "B",
+}
+
+VACCINATION_CARD_PAYLOAD = {
+    "id": 1,
+    "number": "55566677788",
+    "name": "Usuario Teste",
+    "issued_by": "Ministério da Saúde",
+    "birth_date": "1990-05-05",
+    "issued_date": "2021-07-01",
+    "expiration_date": "2031-07-01",
+    "gender": "F",
+}
+
+DOCUMENT_PAYLOADS = {
+    "cpf": CPF_PAYLOAD,
+    "rg": RG_PAYLOAD,
+    "cnh": CNH_PAYLOAD,
+    "vaccination_card": VACCINATION_CARD_PAYLOAD,
+}
+
+# Ida e volta simulada por instrução nos testes de latência
+ROUND_TRIP = 0.02
+
+
+def test_get_documents_without_wallet(auth_client):
+    response = auth_client.get("/documents/")
+    assert response.status_code == 404
+
+
+def test_create_and_get_documents(auth_client):
+    assert auth_client.post("/documents/cpf", json=CPF_PAYLOAD).status_code == 201
+    assert auth_client.post("/documents/rg", json=RG_PAYLOAD).status_code == 201
+
+    response = auth_client.get("/documents/")
+    assert response.status_code == 200
+    documents = response.json()["documents"]
+    assert documents["cpf"]["number"] == CPF_PAYLOAD["number"]
+    assert documents["rg"]["number"] == RG_PAYLOAD["number"]
+    assert documents["cnh"] is None
+    assert documents["vaccination_card"] is None
+
+
+def test_documents_require_authentication(client):
+    assert client.get("/documents/").status_code == 401
+
+
+def seed_full_wallet(db_session_factory, username="usuario_teste"):
+    async def seed():
+        async with db_session_factory() as db:
+            user = await db.scalar(select(Users).where(Users.username == username))
+            document = Documents(
+                user_id=user.id,
+                cpf=Cpf(number="11122233344", name="Usuario Teste", issued_by="Receita Federal",
+                        issued_date=date(2020, 1, 1)),
+                rg=Rg(number="1112223334", name="Usuario Teste", issued_by="Detran RJ",
+                      issued_date=date(2015, 6, 10)),
+                cnh=Cnh(number="11122233344", name="Usuario Teste", uf="RJ", issued_by="Detran RJ",
+                        issued_date=date(2019, 3, 1), expiration_date=date(2029, 3, 1), category="B"),
+                vaccination_card=VaccinationCard(number="11122233344", name="Usuario Teste",
+                                                 birth_date=date(1990, 5, 5), issued_date=date(2021, 7, 1),
+                                                 expiration_date=date(2031, 7, 1), gender="M"),
+            )
+            db.add(document)
+            await db.commit()
+
+    asyncio.run(seed())
+
+
+@pytest.mark.parametrize("question, key", [
+    ("documentos", None),
+    ("meu cpf", "cpf"),
+    ("meu rg", "rg"),
+    ("minha cnh", "cnh"),
+    ("minha vacina", "vaccination_card"),
+])
+def test_wallet_reads_run_a_single_query(auth_client, db_session_factory, query_counter, question, key):
+    seed_full_wallet(db_session_factory)
+    query_counter.clear()
+
+    response = auth_client.post("/chatbot/", params={"question": question})
+    assert response.status_code == 200
+    if key is not None:
+        assert response.json()["number"].startswith("111")
+    assert len(query_counter) == 1
+
+
+def test_get_documents_runs_a_single_query(auth_client, db_session_factory, query_counter):
+    seed_full_wallet(db_session_factory)
+    query_counter.clear()
+
+    response = auth_client.get("/documents/")
+    assert response.status_code == 200
+    assert all(response.json()["documents"].values())
+    assert len(query_counter) == 1
+
+
+def test_get_documents_serializes_typed_response(auth_client, db_session_factory):
+    seed_full_wallet(db_session_factory)
+
+    documents = auth_client.get("/documents/").json()["documents"]
+    assert set(documents["cpf"]) == {"id", "number", "name", "issued_by", "issued_date"}
+    assert documents["vaccination_card"] == {
+        "id": documents["vaccination_card"]["id"],
+        "number": "11122233344",
+        "name": "Usuario Teste",
+        "issued_date": "2021-07-01",
+        "birth_date": "1990-05-05",
+        "expiration_date": "2031-07-01",
+        "gender": "M",
+    }
+
+    operation = auth_client.get("/openapi.json").json()["paths"]["/documents/"]["get"]
+    schema = operation["responses"]["200"]["content"]["application/json"]["schema"]
+    assert schema == {"$ref": "#/components/schemas/DocumentsResponse"}
+
+
+def test_wallet_cache_serves_repeat_reads_and_invalidates_on_write(auth_client, query_counter):
+    assert auth_client.post("/documents/cpf", json=CPF_PAYLOAD).status_code == 201
+    assert auth_client.get("/documents/").status_code == 200
+
+    query_counter.clear()
+    assert auth_client.get("/documents/").status_code == 200
+    assert query_counter == []
+
+    assert auth_client.post("/documents/rg", json=RG_PAYLOAD).status_code == 201
+    documents = auth_client.get("/documents/").json()["documents"]
+    assert documents["rg"]["number"] == RG_PAYLOAD["number"]
+
+
+@pytest.mark.anyio
+async def test_wallet_cache_skips_fill_when_invalidated_during_load():
+    cache = WalletCache("wallet_test", max_entries=10, max_bytes=None, ttl=60)
+    loading = asyncio.Event()
+    release = asyncio.Event()
+
+    async def stale_loader():
+        loading.set()
+        await release.wait()
+        return {"cpf": "antigo"}
+
+    read = asyncio.ensure_future(cache.get_or_load(1, "documents", stale_loader))
+    await loading.wait()
+    cache.invalidate(1)
+    release.set()
+
+    assert await read == {"cpf": "antigo"}
+    assert cache.get((1, "documents")) is None
+
+
+def test_wallet_cache_respects_ttl_and_memory_budget():
+    now = [0.0]
+    cache = WalletCache("wallet_test", max_entries=100, max_bytes=200, ttl=60, clock=lambda: now[0])
+
+    cache.set((1, "documents"), "a" * 100, expires_at=60)
+    cache.set((2, "documents"), "b" * 100, expires_at=60)
+    assert cache.size_bytes <= 200
+    assert cache.get((1, "documents")) is None
+    assert cache.get((2, "documents")) == "b" * 100
+
+    now[0] = 60
+    assert cache.get((2, "documents")) is None
+    assert cache.size_bytes == 0
+
+
+@pytest.mark.parametrize("kind", DOCUMENT_PAYLOADS)
+def test_create_document_links_new_wallet_in_two_statements(auth_client, query_counter, kind):
+    query_counter.clear()
+    assert auth_client.post(f"/documents/{kind}", json=DOCUMENT_PAYLOADS[kind]).status_code == 201
+    # INSERT do documento e upsert do Documents
+    assert len(query_counter) == 2
+
+    document = auth_client.get("/documents/").json()["documents"][kind]
+    expected = {key: value for key, value in DOCUMENT_PAYLOADS[kind].items() if key in document and key != "id"}
+    assert {key: document[key] for key in expected} == expected
+
+
+@pytest.mark.parametrize("kind", DOCUMENT_PAYLOADS)
+def test_create_document_latency_with_existing_wallet(auth_client, db_engine, query_counter, kind):
+    assert auth_client.post("/documents/cpf", json={**CPF_PAYLOAD, "number": "00000000000"}).status_code == 201
+
+    def round_trip(conn, cursor, statement, parameters, context, executemany):
+        time.sleep(ROUND_TRIP)
+
+    event.listen(db_engine.sync_engine, "before_cursor_execute", round_trip)
+    try:
+        query_counter.clear()
+        started = time.perf_counter()
+        response = auth_client.post(f"/documents/{kind}", json=DOCUMENT_PAYLOADS[kind])
+        elapsed = time.perf_counter() - started
+    finally:
+        event.remove(db_engine.sync_engine, "before_cursor_execute", round_trip)
+
+    assert response.status_code == 201
+    # INSERT do documento e upsert do Documents existente
+    assert len(query_counter) == 2
+    assert elapsed < 3 * ROUND_TRIP
+
+
+def test_create_vaccination_card_stores_gender(auth_client):
+    assert auth_client.post("/documents/vaccination_card", json=VACCINATION_CARD_PAYLOAD).status_code == 201
+    assert auth_client.get("/documents/").json()["documents"]["vaccination_card"]["gender"] == "F"
+
+
+def test_create_document_with_taken_number_is_a_conflict(auth_client):
+    assert auth_client.post("/documents/cpf", json=CPF_PAYLOAD).status_code == 201
+    assert auth_client.post("/documents/rg", json=RG_PAYLOAD).status_code == 201
+
+    response = auth_client.post("/documents/cpf", json=CPF_PAYLOAD)
+    assert response.status_code == 409
+    documents = auth_client.get("/documents/").json()["documents"]
+    assert documents["cpf"]["number"] == CPF_PAYLOAD["number"]
+    assert documents["rg"]["number"] == RG_PAYLOAD["number"]
+
+
+def test_etag_matching_follows_if_none_match_syntax():
+    assert etag_matches('"1-3"', '"1-3"')
+    assert etag_matches('W/"1-3", "1-4"', '"1-4"')
+    assert etag_matches("*", '"1-3"')
+    assert not etag_matches('"2-3"', '"1-3"')
+    assert not etag_matches(None, '"1-3"')
+
+
+def test_repeat_wallet_polls_are_answered_with_304(auth_client, db_session_factory, query_counter):
+    seed_full_wallet(db_session_factory)
+    first = auth_client.get("/documents/")
+    assert first.status_code == 200
+    assert first.headers["Cache-Control"] == "private, no-cache"
+    etag = first.headers["ETag"]
+
+    # Sondagem típica do app: o cache da carteira já expirou desde a última abertura
+    wallet_cache.clear()
+    query_counter.clear()
+    full = auth_client.get("/documents/")
+    full_queries = list(query_counter)
+
+    wallet_cache.clear()
+    query_counter.clear()
+    repeat = auth_client.get("/documents/", headers={"If-None-Match": etag})
+
+    assert repeat.status_code == 304
+    assert repeat.headers["ETag"] == etag
+    # Os ~580 bytes da carteira deixam de trafegar a cada sondagem
+    assert full.content == first.content and len(full.content) > 500
+    assert repeat.content == b""
+    # Uma consulta leve à versão no lugar do JOIN com os quatro documentos
+    assert len(full_queries) == len(query_counter) == 1
+    assert "JOIN" in full_queries[0] and "JOIN" not in query_counter[0]
+
+    # Com o cache quente, a revalidação nem chega ao banco
+    query_counter.clear()
+    assert auth_client.get("/documents/", headers={"If-None-Match": etag}).status_code == 304
+    assert query_counter == []
+
+
+def test_creating_a_document_changes_the_wallet_etag(auth_client):
+    assert auth_client.post("/documents/cpf", json=CPF_PAYLOAD).status_code == 201
+    etag = auth_client.get("/documents/").headers["ETag"]
+
+    assert auth_client.post("/documents/rg", json=RG_PAYLOAD).status_code == 201
+    response = auth_client.get("/documents/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()["documents"]["rg"]["number"] == RG_PAYLOAD["number"]
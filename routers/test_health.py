@@ -0,0 +1,150 @@
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+import main
+from main import app
+from routers import auth, health
+
+
+class StubService:
+    """Serviço HTTP local que substitui a API externa nos testes."""
+
+    def __init__(self):
+        self.status_code = 200
+        self.delay = 0.0
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.requests += 1
+                time.sleep(stub.delay)
+                self.send_response(stub.status_code)
+                self.send_header("Content-Length", "2")
+                self.end_headers()
+                self.wfile.write(b"{}")
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/posts/1"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub_service():
+    service = StubService()
+    yield service
+    service.close()
+
+
+@pytest.fixture
+async def health_client(monkeypatch, db_engine, stub_service):
+    http_client = httpx.AsyncClient(timeout=1)
+    checker = health.HealthChecker(
+        {"database": health.check_database, "external_api": health.check_external_service},
+        ttl=60, timeout=0.2,
+    )
+    monkeypatch.setattr(health, "engine", db_engine)
+    monkeypatch.setattr(health, "http_client", http_client)
+    monkeypatch.setattr(health, "EXTERNAL_SERVICE_URL", stub_service.url)
+    monkeypatch.setattr(health, "health_checker", checker)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+    await checker.stop()
+    await http_client.aclose()
+
+
+@pytest.mark.anyio
+async def test_liveness_does_not_run_checks(health_client, stub_service):
+    response = await health_client.get("/health/live")
+    assert response.status_code == 200
+    assert stub_service.requests == 0
+
+
+@pytest.mark.anyio
+async def test_readiness_reports_dependencies(health_client):
+    response = await health_client.get("/health/ready")
+    assert response.status_code == 200
+    assert response.json() == {"database": "up", "external_api": "up"}
+
+
+@pytest.mark.anyio
+async def test_readiness_is_unavailable_without_database(health_client, monkeypatch):
+    async def database_down():
+        raise ConnectionRefusedError()
+
+    monkeypatch.setitem(health.health_checker.checks, "database", database_down)
+    response = await health_client.get("/health/ready")
+    assert response.status_code == 503
+    assert response.json()["database"] == "down"
+
+
+@pytest.mark.anyio
+async def test_slow_service_is_bounded_by_timeout(health_client, stub_service):
+    stub_service.delay = 1.0
+
+    started = time.perf_counter()
+    response = await health_client.get("/health/")
+    elapsed = time.perf_counter() - started
+
+    assert response.json() == {"database": "up", "external_api": "down"}
+    assert elapsed < 0.6
+
+
+@pytest.mark.anyio
+async def test_results_are_cached_within_ttl(health_client, stub_service):
+    for _ in range(5):
+        assert (await health_client.get("/health/")).status_code == 200
+    assert stub_service.requests == 1
+
+    stub_service.status_code = 500
+    health.health_checker.checked_at -= 60
+    assert (await health_client.get("/health/")).json()["external_api"] == "down"
+    assert stub_service.requests == 2
+
+
+@pytest.mark.anyio
+async def test_concurrent_requests_share_one_refresh(health_client, stub_service):
+    stub_service.delay = 0.05
+    responses = await asyncio.gather(*(health_client.get("/health/ready") for _ in range(10)))
+    assert all(response.status_code == 200 for response in responses)
+    assert stub_service.requests == 1
+
+
+@pytest.mark.anyio
+async def test_background_refresher_keeps_results_current(health_client, stub_service):
+    health.health_checker.start(interval=0.05)
+    await asyncio.sleep(0.3)
+    assert stub_service.requests >= 3
+
+    requests = stub_service.requests
+    assert (await health_client.get("/health/")).json()["external_api"] == "up"
+    assert stub_service.requests - requests <= 1
+
+
+def test_health_checks_survive_a_second_lifespan(monkeypatch, file_db_engine, stub_service):
+    # Duas subidas no mesmo processo, como em testes ou no --reload do uvicorn
+    monkeypatch.setattr(main, "engine", file_db_engine)
+    monkeypatch.setattr(health, "engine", file_db_engine)
+    monkeypatch.setattr(health, "EXTERNAL_SERVICE_URL", stub_service.url)
+    monkeypatch.setattr(health, "health_checker", health.HealthChecker(
+        {"database": health.check_database, "external_api": health.check_external_service}, ttl=0, timeout=1))
+    monkeypatch.setattr(auth.refresh_token_purger, "session_factory", async_sessionmaker(bind=file_db_engine))
+
+    for _ in range(2):
+        with TestClient(app) as client:
+            assert client.get("/health/").json() == {"database": "up", "external_api": "up"}
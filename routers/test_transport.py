@@ -0,0 +1,201 @@
+import asyncio
+from datetime import timedelta
+from decimal import Decimal
+
+import httpx
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import routers.transport
+from main import app
+from models import Transport, TransportTransaction, Users
+from routers.auth import create_access_token
+
+
+def test_get_balance_without_transport(auth_client):
+    response = auth_client.get("/transport/balance")
+    assert response.status_code == 404
+
+
+def test_add_and_get_balance(auth_client):
+    assert auth_client.post("/transport/add_balance", params={"amount": 10.5}).status_code == 201
+    assert auth_client.post("/transport/add_balance", params={"amount": 4.5}).status_code == 201
+
+    response = auth_client.get("/transport/balance")
+    assert response.status_code == 200
+    assert response.json() == {"message": "Saldo atual: R$ 15.00"}
+
+
+def test_balance_read_after_write_is_fresh(auth_client, query_counter):
+    auth_client.post("/transport/add_balance", params={"amount": 5})
+    assert auth_client.get("/transport/balance").json() == {"message": "Saldo atual: R$ 5.00"}
+
+    query_counter.clear()
+    assert auth_client.get("/transport/balance").json() == {"message": "Saldo atual: R$ 5.00"}
+    assert query_counter == []
+
+    auth_client.post("/transport/add_balance", params={"amount": 2})
+    assert auth_client.get("/transport/balance").json() == {"message": "Saldo atual: R$ 7.00"}
+
+
+@pytest.mark.anyio
+async def test_concurrent_top_ups_are_exact(file_db_engine):
+    async with AsyncSession(file_db_engine, expire_on_commit=False) as db:
+        user = Users(username="recarga", hashed_password="x")
+        db.add(user)
+        await db.commit()
+        token = create_access_token(user.username, user.id, timedelta(minutes=20))
+
+    transport = httpx.ASGITransport(app=app)
+    cookies = {"access_token": f"Bearer {token}"}
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", cookies=cookies) as client:
+        responses = await asyncio.gather(*(
+            client.post("/transport/add_balance", params={"amount": 0.5}) for _ in range(300)
+        ))
+        assert all(response.status_code == 201 for response in responses)
+
+        response = await client.get("/transport/balance")
+        assert response.json() == {"message": "Saldo atual: R$ 150.00"}
+
+    async with AsyncSession(file_db_engine) as db:
+        rows = (await db.scalars(select(Transport).where(Transport.user_id == user.id))).all()
+        assert len(rows) == 1
+
+
+def test_top_ups_are_recorded_in_the_ledger(auth_client):
+    for amount in (1, 2, 3, 4, 5):
+        auth_client.post("/transport/add_balance", params={"amount": amount})
+
+    first_page = auth_client.get("/transport/transactions", params={"limit": 2}).json()
+    assert [transaction["amount"] for transaction in first_page["transactions"]] == [5, 4]
+    assert all(transaction["kind"] == "recarga" for transaction in first_page["transactions"])
+
+    second_page = auth_client.get(
+        "/transport/transactions", params={"limit": 2, "cursor": first_page["next_cursor"]}).json()
+    assert [transaction["amount"] for transaction in second_page["transactions"]] == [3, 2]
+
+    last_page = auth_client.get(
+        "/transport/transactions", params={"limit": 2, "cursor": second_page["next_cursor"]}).json()
+    assert [transaction["amount"] for transaction in last_page["transactions"]] == [1]
+    assert last_page["next_cursor"] is None
+
+
+def test_ledger_history_rejects_invalid_cursor(auth_client):
+    response = auth_client.get("/transport/transactions", params={"cursor": "invalido"})
+    assert response.status_code == 400
+
+
+def test_balance_is_a_single_read_of_the_summary(auth_client, query_counter):
+    for _ in range(3):
+        auth_client.post("/transport/add_balance", params={"amount": 1})
+
+    query_counter.clear()
+    assert auth_client.get("/transport/balance").json() == {"message": "Saldo atual: R$ 3.00"}
+    assert len(query_counter) == 1
+    assert "transport_transactions" not in query_counter[0]
+
+
+VALIDATOR_HEADERS = {"X-Validator-Key": "chave-validador"}
+
+
+def seed_balances(db_session_factory, balances):
+    async def seed():
+        async with db_session_factory() as db:
+            for user_id, balance in balances.items():
+                db.add(Users(id=user_id, username=f"passageiro{user_id}", hashed_password="x"))
+                if balance is not None:
+                    db.add(Transport(user_id=user_id, balance=Decimal(balance)))
+            await db.commit()
+
+    asyncio.run(seed())
+
+
+def test_debit_batch_requires_validator_key(client, monkeypatch):
+    monkeypatch.setattr(routers.transport, "VALIDATOR_API_KEY", "chave-validador")
+    batch = {"taps": [{"user_id": 1, "amount": "4.70", "idempotency_key": "a"}]}
+
+    assert client.post("/transport/debits/batch", json=batch).status_code == 401
+    response = client.post("/transport/debits/batch", json=batch, headers={"X-Validator-Key": "errada"})
+    assert response.status_code == 401
+
+
+def test_debit_batch_applies_taps_and_reports_each_result(client, db_session_factory, monkeypatch):
+    monkeypatch.setattr(routers.transport, "VALIDATOR_API_KEY", "chave-validador")
+    seed_balances(db_session_factory, {10: "10.00", 11: None})
+    batch = {"taps": [
+        {"user_id": 10, "amount": "4.70", "idempotency_key": "tap-1"},
+        {"user_id": 10, "amount": "4.70", "idempotency_key": "tap-2"},
+        {"user_id": 10, "amount": "4.70", "idempotency_key": "tap-3"},
+        {"user_id": 10, "amount": "4.70", "idempotency_key": "tap-1"},
+        {"user_id": 11, "amount": "4.70", "idempotency_key": "tap-4"},
+    ]}
+
+    response = client.post("/transport/debits/batch", json=batch, headers=VALIDATOR_HEADERS)
+    assert response.status_code == 200
+    assert [result["status"] for result in response.json()["results"]] == [
+        "aplicado", "aplicado", "saldo_insuficiente", "duplicado", "saldo_insuficiente"]
+    assert response.json()["results"][1]["balance"] == 0.6
+
+    # Reenviar o mesmo lote não debita de novo
+    response = client.post("/transport/debits/batch", json=batch, headers=VALIDATOR_HEADERS)
+    statuses = [result["status"] for result in response.json()["results"]]
+    assert statuses[:2] == ["duplicado", "duplicado"]
+
+    async def read_state():
+        async with db_session_factory() as db:
+            balance = await db.scalar(select(Transport.balance).where(Transport.user_id == 10))
+            ledger = (await db.scalars(
+                select(TransportTransaction.amount).where(TransportTransaction.kind == "tarifa"))).all()
+            return balance, ledger
+
+    balance, ledger = asyncio.run(read_state())
+    assert balance == Decimal("0.60")
+    assert ledger == [Decimal("-4.70"), Decimal("-4.70")]
+
+
+def test_debit_batch_query_count_does_not_grow_with_batch_size(client, db_session_factory, query_counter,
+                                                               monkeypatch):
+    monkeypatch.setattr(routers.transport, "VALIDATOR_API_KEY", "chave-validador")
+    seed_balances(db_session_factory, {user_id: "100.00" for user_id in range(1, 51)})
+    batch = {"taps": [
+        {"user_id": index % 50 + 1, "amount": "1.00", "idempotency_key": f"tap-{index}"}
+        for index in range(500)
+    ]}
+
+    query_counter.clear()
+    response = client.post("/transport/debits/batch", json=batch, headers=VALIDATOR_HEADERS)
+    assert all(result["status"] == "aplicado" for result in response.json()["results"])
+    assert len(query_counter) <= 4
+
+
+def test_repeat_balance_polls_are_answered_with_304(auth_client, query_counter):
+    auth_client.post("/transport/add_balance", params={"amount": 5})
+    first = auth_client.get("/transport/balance")
+    etag = first.headers["ETag"]
+
+    query_counter.clear()
+    repeat = auth_client.get("/transport/balance", headers={"If-None-Match": etag})
+    assert repeat.status_code == 304
+    assert repeat.content == b"" and len(first.content) > 0
+    assert query_counter == []
+
+    auth_client.post("/transport/add_balance", params={"amount": 2})
+    response = auth_client.get("/transport/balance", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json() == {"message": "Saldo atual: R$ 7.00"}
+    assert response.headers["ETag"] != etag
+
+
+def test_fare_debits_change_the_balance_etag(client, auth_client, monkeypatch):
+    monkeypatch.setattr(routers.transport, "VALIDATOR_API_KEY", "chave-validador")
+    auth_client.post("/transport/add_balance", params={"amount": 10})
+    etag = auth_client.get("/transport/balance").headers["ETag"]
+    user_id = int(etag.strip('"').split("-")[0])
+
+    batch = {"taps": [{"user_id": user_id, "amount": "4.70", "idempotency_key": "tap-etag"}]}
+    assert client.post("/transport/debits/batch", json=batch, headers=VALIDATOR_HEADERS).status_code == 200
+
+    response = auth_client.get("/transport/balance", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json() == {"message": "Saldo atual: R$ 5.30"}
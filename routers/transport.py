@@ -1,12 +1,21 @@
+import base64
+import os
+from datetime import datetime
 from decimal import Decimal
 from typing import Annotated
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from sqlalchemy import and_, case, exc, insert, or_, select, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 
-from database import SessionLocal
-from models import Transport
-from routers.auth import get_current_user
+from cache import wallet_cache
+from database import get_db, stick_to_primary
+from etag import etag_headers, etag_matches, make_etag, not_modified
+from models import Transport, TransportTransaction
+from routers.auth import get_current_user, get_read_db, verify_api_key
+from schemas import BatchDebitRequest
 
 
 router = APIRouter(
@@ -14,24 +23,98 @@ router = APIRouter(
     tags=["transport"],
 )
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Chave compartilhada com os validadores (catracas) que enviam os débitos de tarifa
+VALIDATOR_API_KEY = os.getenv("VALIDATOR_API_KEY")
+
+async def get_validator(x_validator_key: Annotated[str | None, Header()] = None):
+    if not verify_api_key(x_validator_key, VALIDATOR_API_KEY):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Validador não autenticado."
+        )
 
-db_dependency = Annotated[Session, Depends(get_db)]
+db_dependency = Annotated[AsyncSession, Depends(get_db)]
+read_db_dependency = Annotated[AsyncSession, Depends(get_read_db)]
 user_dependency = Annotated[dict, Depends(get_current_user)]
 
+def credit_balance_statement(dialect_name: str, user_id: int, amount: Decimal, transaction_date):
+    """INSERT que cria o saldo do usuário ou soma `amount` ao existente, no próprio banco.
+
+    Depende do índice único em transport.user_id: duas recargas simultâneas nunca
+    perdem atualização nem criam duas linhas para o mesmo usuário.
+    """
+    values = {"user_id": user_id, "balance": amount, "last_transaction_date": transaction_date, "version": 1}
+    if dialect_name == "mysql":
+        statement = mysql_insert(Transport).values(**values)
+        return statement.on_duplicate_key_update(
+            balance=Transport.balance + statement.inserted.balance,
+            last_transaction_date=statement.inserted.last_transaction_date,
+            version=Transport.version + 1
+        )
+
+    statement = sqlite_insert(Transport).values(**values)
+    return statement.on_conflict_do_update(
+        index_elements=[Transport.user_id],
+        set_={
+            "balance": Transport.balance + statement.excluded.balance,
+            "last_transaction_date": statement.excluded.last_transaction_date,
+            "version": Transport.version + 1
+        }
+    )
+
+def encode_cursor(transaction: TransportTransaction) -> str:
+    raw = f"{transaction.created_at.isoformat()},{transaction.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str):
+    try:
+        created_at, transaction_id = base64.urlsafe_b64decode(cursor.encode()).decode().split(",")
+        return datetime.fromisoformat(created_at), int(transaction_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor inválido."
+        )
+
+def balance_response(balance):
+    """Resposta de GET /transport/balance para o saldo lido; 404 se o usuário não tiver saldo."""
+    if balance is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Nenhum saldo encontrado para o usuário."
+        )
+
+    return {"message": "Saldo atual: R$ " + str(balance)}
+
+async def load_balance_version(db: AsyncSession, user_id: int):
+    """Versão do saldo do usuário (para conferir If-None-Match), do cache ou do banco."""
+    async def load():
+        return await db.scalar(select(Transport.version).where(Transport.user_id == user_id))
+
+    return await wallet_cache.get_or_load(user_id, "balance_version", load)
+
+async def load_versioned_balance(db: AsyncSession, user_id: int) -> tuple:
+    """(saldo, versão) do usuário, ambos da mesma leitura do cache ou do banco."""
+    async def load():
+        row = (await db.execute(
+            select(Transport.balance, Transport.version).where(Transport.user_id == user_id)
+        )).first()
+        return {"balance": row.balance if row else None, "balance_version": row.version if row else None}
+
+    values = await wallet_cache.get_or_load_many(user_id, ("balance", "balance_version"), load)
+    return values["balance"], values["balance_version"]
+
 @router.get(
         "/balance", 
         summary="Obter saldo de transporte",
-        description="Retorna o saldo de transporte do usuário autenticado.",
+        description="Retorna o saldo de transporte do usuário autenticado. A resposta traz um `ETag`; "
+                    "com `If-None-Match` igual a ele, a API responde 304 sem reenviar o saldo.",
         status_code=status.HTTP_200_OK)
 async def get_transport_balance(
-    db: db_dependency,
-    current_user: user_dependency
+    db: read_db_dependency,
+    current_user: user_dependency,
+    response: Response,
+    if_none_match: Annotated[str | None, Header()] = None
 ):
     if not current_user:
         raise HTTPException(
@@ -40,15 +123,15 @@ async def get_transport_balance(
         )
 
     user_id = current_user.get("id")
-    transport = db.query(Transport).filter(Transport.user_id == user_id).first()
+    if if_none_match:
+        version = await load_balance_version(db, user_id)
+        if version is not None and etag_matches(if_none_match, make_etag(user_id, version)):
+            return not_modified(make_etag(user_id, version))
 
-    if not transport:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Nenhum saldo encontrado para o usuário."
-        )
-    
-    return {"message": "Saldo atual: R$ " + str(transport.balance)}
+    balance, version = await load_versioned_balance(db, user_id)
+    result = balance_response(balance)
+    response.headers.update(etag_headers(make_etag(user_id, version)))
+    return result
 
 @router.post(
         "/add_balance", 
@@ -67,17 +150,130 @@ async def add_transport_balance(
         )
 
     user_id = current_user.get("id")
-    transport = db.query(Transport).filter(Transport.user_id == user_id).first()
+    amount = Decimal(str(amount))
+    now = datetime.utcnow()
+    dialect_name = db.get_bind().dialect.name
 
-    if not transport:
-        transport = Transport(
-            user_id=user_id,
-            balance=Decimal(0.),
-            last_transaction_date=None
-        )
-        db.add(transport)
+    # Saldo materializado e lançamento no extrato na mesma transação
+    await db.execute(credit_balance_statement(dialect_name, user_id, amount, now.date()))
+    db.add(TransportTransaction(user_id=user_id, amount=amount, kind="recarga", created_at=now))
+    await db.commit()
+    wallet_cache.invalidate(user_id)
+    stick_to_primary(user_id)
     
-    transport.balance += Decimal(amount)
-    db.commit()
-    
-    return {"message": "Saldo atualizado com sucesso!"}
\ No newline at end of file
+    return {"message": "Saldo atualizado com sucesso!"}
+
+@router.get(
+        "/transactions",
+        summary="Obter extrato de transporte",
+        description="Retorna as transações de transporte do usuário autenticado, da mais recente para a mais antiga, paginadas por cursor.",
+        status_code=status.HTTP_200_OK)
+async def get_transport_transactions(
+    db: read_db_dependency,
+    current_user: user_dependency,
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+    cursor: str | None = None
+):
+    if not current_user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Usuário não autenticado."
+        )
+
+    user_id = current_user.get("id")
+    query = select(TransportTransaction).where(TransportTransaction.user_id == user_id)
+    if cursor:
+        created_at, transaction_id = decode_cursor(cursor)
+        query = query.where(or_(
+            TransportTransaction.created_at < created_at,
+            and_(TransportTransaction.created_at == created_at, TransportTransaction.id < transaction_id)
+        ))
+    query = query.order_by(TransportTransaction.created_at.desc(), TransportTransaction.id.desc()).limit(limit + 1)
+
+    transactions = (await db.scalars(query)).all()
+    page = transactions[:limit]
+
+    return {
+        "transactions": [
+            {
+                "id": transaction.id,
+                "amount": transaction.amount,
+                "kind": transaction.kind,
+                "created_at": transaction.created_at
+            }
+            for transaction in page
+        ],
+        "next_cursor": encode_cursor(page[-1]) if len(transactions) > limit else None
+    }
+
+
+@router.post(
+        "/debits/batch",
+        summary="Debitar tarifas em lote",
+        description="Aplica um lote de débitos de tarifa enviados pelos validadores em uma única transação e retorna o resultado de cada passagem.",
+        status_code=status.HTTP_200_OK,
+        dependencies=[Depends(get_validator)])
+async def debit_transport_batch(
+    db: db_dependency,
+    batch: BatchDebitRequest
+):
+    results = [None] * len(batch.taps)
+    keys = [tap.idempotency_key for tap in batch.taps]
+    applied_keys = set(await db.scalars(
+        select(TransportTransaction.idempotency_key).where(TransportTransaction.idempotency_key.in_(keys))
+    ))
+
+    # Trava os saldos envolvidos (em ordem de user_id, para lotes concorrentes não se bloquearem)
+    user_ids = sorted({tap.user_id for tap in batch.taps})
+    balances = dict((await db.execute(
+        select(Transport.user_id, Transport.balance)
+        .where(Transport.user_id.in_(user_ids))
+        .order_by(Transport.user_id)
+        .with_for_update()
+    )).all())
+
+    now = datetime.utcnow()
+    debits = {}
+    ledger = []
+    for index, tap in enumerate(batch.taps):
+        if tap.idempotency_key in applied_keys:
+            results[index] = {"idempotency_key": tap.idempotency_key, "status": "duplicado"}
+            continue
+        applied_keys.add(tap.idempotency_key)
+
+        balance = balances.get(tap.user_id) or Decimal(0)
+        if balance < tap.amount:
+            results[index] = {"idempotency_key": tap.idempotency_key, "status": "saldo_insuficiente",
+                              "balance": balance}
+            continue
+
+        balances[tap.user_id] = balance - tap.amount
+        debits[tap.user_id] = debits.get(tap.user_id, Decimal(0)) + tap.amount
+        ledger.append({"user_id": tap.user_id, "amount": -tap.amount, "kind": "tarifa",
+                       "idempotency_key": tap.idempotency_key, "created_at": now})
+        results[index] = {"idempotency_key": tap.idempotency_key, "status": "aplicado",
+                          "balance": balances[tap.user_id]}
+
+    if debits:
+        await db.execute(
+            update(Transport)
+            .where(Transport.user_id.in_(debits))
+            .values(balance=Transport.balance - case(debits, value=Transport.user_id),
+                    last_transaction_date=now.date(),
+                    version=Transport.version + 1)
+        )
+        await db.execute(insert(TransportTransaction).values(ledger))
+    try:
+        await db.commit()
+    except exc.IntegrityError:
+        # Outro lote gravou uma das mesmas chaves de idempotência ao mesmo tempo
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Lote conflitante com outro em processamento. Reenvie o lote."
+        )
+
+    for user_id in debits:
+        wallet_cache.invalidate(user_id)
+
+    return {"results": results}
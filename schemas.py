@@ -1,5 +1,6 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from datetime import date
+from decimal import Decimal
 
 class CreateUserRequest(BaseModel):
     username: str
@@ -8,6 +9,10 @@ class CreateUserRequest(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: str | None = None
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
 
 class CreateDocumentRequest(BaseModel):
     id: int
@@ -30,4 +35,48 @@ class CreateCnhRequest(CreateDocumentRequest):
 class CreateVaccinationCardRequest(CreateDocumentRequest):
     birth_date: date
     expiration_date: date
-    gender: str
\ No newline at end of file
+    gender: str
+
+class DocumentResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    number: str
+    name: str
+    issued_date: date
+
+class CpfResponse(DocumentResponse):
+    issued_by: str
+
+class RgResponse(DocumentResponse):
+    issued_by: str
+
+class CnhResponse(DocumentResponse):
+    issued_by: str
+    uf: str
+    expiration_date: date
+    category: str
+
+class VaccinationCardResponse(DocumentResponse):
+    birth_date: date
+    expiration_date: date
+    gender: str
+
+class WalletResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    cpf: CpfResponse | None = None
+    rg: RgResponse | None = None
+    cnh: CnhResponse | None = None
+    vaccination_card: VaccinationCardResponse | None = None
+
+class DocumentsResponse(BaseModel):
+    documents: WalletResponse
+
+class DebitTapRequest(BaseModel):
+    user_id: int
+    amount: Decimal = Field(..., gt=0, max_digits=10, decimal_places=2)
+    idempotency_key: str = Field(..., min_length=1, max_length=64)
+
+class BatchDebitRequest(BaseModel):
+    taps: list[DebitTapRequest] = Field(..., min_length=1, max_length=5000)
@@ -0,0 +1,178 @@
+import asyncio
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import exc, select, text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+import database
+from cache import wallet_cache
+from database import (Base, ReplicaPool, RoutingSession, build_engine, check_schema, db_pool_timeouts_total,
+                      db_pool_wait_seconds_total, get_db, recent_writers, use_replica, warm_pool)
+from main import app
+from models import Users
+from routers.test_documents import CPF_PAYLOAD
+
+
+@pytest.mark.anyio
+async def test_warm_pool_opens_connections_up_front(tmp_path):
+    engine = build_engine(f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}", pool_size=3, max_overflow=0)
+    await warm_pool(engine, 3)
+    assert engine.pool.checkedin() == 3
+    assert engine.pool.checkedout() == 0
+    await engine.dispose()
+
+
+@pytest.mark.anyio
+async def test_warm_pool_tolerates_unavailable_database():
+    async def refuse_connection():
+        raise ConnectionRefusedError("banco indisponível")
+
+    engine = build_engine("sqlite+aiosqlite://", pool_size=2, async_creator=refuse_connection)
+    await warm_pool(engine, 2)
+    assert engine.pool.checkedin() == 0
+    await engine.dispose()
+
+
+@pytest.mark.anyio
+async def test_check_schema_requires_the_unique_indexes_of_the_upserts(tmp_path):
+    engine = build_engine(f"sqlite+aiosqlite:///{tmp_path / 'schema.db'}")
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    await check_schema(engine)
+
+    # Banco ainda sem a migração 0002
+    async with engine.begin() as connection:
+        await connection.execute(text("DROP INDEX ix_transport_user_id"))
+    with pytest.raises(RuntimeError, match=r"transport\.user_id.*alembic upgrade head"):
+        await check_schema(engine)
+    await engine.dispose()
+
+
+@pytest.mark.anyio
+async def test_check_schema_tolerates_unavailable_database():
+    async def refuse_connection():
+        raise ConnectionRefusedError("banco indisponível")
+
+    engine = build_engine("sqlite+aiosqlite://", async_creator=refuse_connection)
+    await check_schema(engine)
+    await engine.dispose()
+
+
+@pytest.mark.anyio
+async def test_pool_counts_wait_time_and_timeouts(tmp_path):
+    engine = build_engine(f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}",
+                          pool_size=1, max_overflow=0, pool_timeout=0.1)
+    timeouts = db_pool_timeouts_total.get()
+    waited = db_pool_wait_seconds_total.get()
+
+    async with engine.connect() as connection:
+        await connection.execute(text("SELECT 1"))
+        with pytest.raises(exc.TimeoutError):
+            async with engine.connect():
+                pass
+
+    assert db_pool_timeouts_total.get() == timeouts + 1
+    assert db_pool_wait_seconds_total.get() - waited >= 0.1
+    await engine.dispose()
+
+
+def test_pool_statistics_are_exported(client):
+    body = client.get("/metrics").text
+    for name in ("db_pool_size", "db_pool_checked_out", "db_pool_overflow",
+                 "db_pool_wait_seconds_total", "db_pool_timeouts_total"):
+        assert f"# TYPE {name} " in body
+    assert "db_pool_size 10.0" in body
+
+
+@pytest.fixture
+def replicated_db(tmp_path, monkeypatch):
+    """Primário e réplica em dois arquivos SQLite; `replicate()` copia o primário para a réplica."""
+    paths = {name: tmp_path / f"{name}.db" for name in ("primary", "replica")}
+    primary, replica = (build_engine(f"sqlite+aiosqlite:///{path}") for path in paths.values())
+
+    async def create_tables():
+        for engine in (primary, replica):
+            async with engine.begin() as connection:
+                await connection.run_sync(Base.metadata.create_all)
+            await engine.dispose()
+
+    asyncio.run(create_tables())
+    session_factory = async_sessionmaker(bind=primary, expire_on_commit=False, sync_session_class=RoutingSession)
+
+    async def override_get_db():
+        async with session_factory() as db:
+            yield db
+
+    def replicate():
+        asyncio.run(replica.dispose())
+        with sqlite3.connect(paths["primary"]) as source, sqlite3.connect(paths["replica"]) as target:
+            source.backup(target)
+
+    app.dependency_overrides[get_db] = override_get_db
+    monkeypatch.setattr(database, "replicas", ReplicaPool([replica]))
+    recent_writers.clear()
+    yield SimpleNamespace(primary=primary, replica=replica, session_factory=session_factory, replicate=replicate)
+    recent_writers.clear()
+    asyncio.run(primary.dispose())
+    asyncio.run(replica.dispose())
+
+
+def test_routing_session_reads_from_replica_until_it_writes(replicated_db):
+    async def scenario():
+        async with replicated_db.session_factory() as db:
+            use_replica(db, pool=ReplicaPool([replicated_db.replica]))
+            assert await db.scalar(select(Users.id)) is None
+
+            db.add(Users(username="escrito_no_primario", hashed_password="x"))
+            await db.flush()
+            # Depois da escrita, a sessão lê do primário e enxerga o próprio INSERT
+            assert await db.scalar(select(Users.username)) == "escrito_no_primario"
+            await db.commit()
+
+        async with replicated_db.replica.connect() as connection:
+            assert (await connection.execute(text("SELECT COUNT(*) FROM users"))).scalar() == 0
+
+    asyncio.run(scenario())
+
+
+def test_reads_go_to_replica_except_right_after_the_users_own_write(replicated_db):
+    client = TestClient(app)
+    credentials = {"username": "usuario_replica", "password": "senhateste123"}
+    client.post("/auth/", json=credentials)
+    assert client.post("/auth/token", data=credentials).status_code == 200
+    replicated_db.replicate()
+
+    assert client.get("/documents/").status_code == 404
+    assert client.post("/documents/cpf", json=CPF_PAYLOAD).status_code == 201
+    # A réplica ainda não tem o CPF, mas o usuário acabou de escrever: lê do primário
+    assert client.get("/documents/").json()["documents"]["cpf"]["number"] == CPF_PAYLOAD["number"]
+
+    recent_writers.clear()
+    wallet_cache.clear()
+    assert client.get("/documents/").status_code == 404
+
+    replicated_db.replicate()
+    wallet_cache.clear()
+    assert client.get("/documents/").json()["documents"]["cpf"]["number"] == CPF_PAYLOAD["number"]
+
+
+@pytest.mark.anyio
+async def test_unhealthy_replicas_leave_the_rotation(tmp_path):
+    async def refuse_connection():
+        raise ConnectionRefusedError("réplica fora do ar")
+
+    healthy = build_engine(f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}")
+    broken = build_engine("sqlite+aiosqlite://", async_creator=refuse_connection)
+    pool = ReplicaPool([healthy, broken], timeout=1)
+
+    assert await pool.check() == [healthy]
+    assert {pool.choose() for _ in range(4)} == {healthy}
+
+    pool.engines = [broken]
+    assert await pool.check() == []
+    assert pool.choose() is None
+    await healthy.dispose()
+    await broken.dispose()
@@ -0,0 +1,79 @@
+import time
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+import routers.documents
+from main import app
+from metrics import Histogram
+from middleware import http_request_db_seconds, http_request_duration_seconds, http_request_errors_total, http_requests_total
+from routers.test_documents import CPF_PAYLOAD
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("test_latency_seconds", "Latência de teste.", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, route="/a")
+
+    assert histogram.get_count(route="/a") == 4
+    assert histogram.get_sum(route="/a") == 3.65
+    assert histogram.render().splitlines()[2:] == [
+        'test_latency_seconds_bucket{route="/a",le="0.1"} 2.0',
+        'test_latency_seconds_bucket{route="/a",le="1.0"} 3.0',
+        'test_latency_seconds_bucket{route="/a",le="+Inf"} 4.0',
+        'test_latency_seconds_sum{route="/a"} 3.65',
+        'test_latency_seconds_count{route="/a"} 4.0',
+    ]
+
+
+def test_requests_are_labelled_by_route_template(auth_client):
+    labels = {"method": "POST", "route": "/documents/cpf"}
+    count = http_request_duration_seconds.get_count(**labels)
+    created = http_requests_total.get(status=201, **labels)
+
+    assert auth_client.post("/documents/cpf", json=CPF_PAYLOAD).status_code == 201
+    assert auth_client.get("/nao-existe").status_code == 404
+
+    assert http_request_duration_seconds.get_count(**labels) == count + 1
+    assert http_requests_total.get(status=201, **labels) == created + 1
+    assert http_requests_total.get(method="GET", route="unmatched", status=404) >= 1
+
+
+def test_database_time_is_attributed_to_the_request(auth_client, db_engine):
+    round_trip = 0.02
+    labels = {"method": "POST", "route": "/documents/cpf"}
+    db_seconds = http_request_db_seconds.get_sum(**labels)
+
+    def slow_statement(conn, cursor, statement, parameters, context, executemany):
+        time.sleep(round_trip)
+
+    event.listen(db_engine.sync_engine, "before_cursor_execute", slow_statement)
+    try:
+        assert auth_client.post("/documents/cpf", json=CPF_PAYLOAD).status_code == 201
+    finally:
+        event.remove(db_engine.sync_engine, "before_cursor_execute", slow_statement)
+
+    # INSERT do documento e upsert do Documents
+    assert http_request_db_seconds.get_sum(**labels) - db_seconds >= 2 * round_trip
+
+
+def test_unhandled_exceptions_count_as_errors(auth_client, monkeypatch):
+    async def broken(db, user_id):
+        raise RuntimeError("falha")
+
+    monkeypatch.setattr(routers.documents, "load_versioned_wallet_documents", broken)
+    labels = {"method": "GET", "route": "/documents/"}
+    errors = http_request_errors_total.get(**labels)
+
+    client = TestClient(app, raise_server_exceptions=False, cookies=auth_client.cookies)
+    assert client.get("/documents/").status_code == 500
+    assert http_request_errors_total.get(**labels) == errors + 1
+    assert http_requests_total.get(status=500, **labels) >= 1
+
+
+def test_metrics_endpoint_exposes_request_metrics(client):
+    client.get("/health/live")
+    body = client.get("/metrics").text
+    assert 'http_requests_total{method="GET",route="/health/live",status="200"}' in body
+    assert "# TYPE http_request_duration_seconds histogram" in body
+    assert 'http_request_db_seconds_bucket{method="GET",route="/health/live",le="+Inf"}' in body
@@ -0,0 +1,97 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from profiling import (ProfilingBudget, ProfilingMiddleware, http_request_profiles_total, profile_token,
+                       verify_profile_token)
+
+SECRET = "segredo-de-teste"
+CREDENTIALS = {"username": "usuario_perfil", "password": "senhateste123"}
+
+
+def profiled_client(directory, **options):
+    client = TestClient(ProfilingMiddleware(app, directory=directory, **options))
+    client.post("/auth/", json=CREDENTIALS)
+    return client
+
+
+def signed_header(secret=SECRET, ttl=60):
+    return {"X-Profile": profile_token(secret, int(time.time()) + ttl)}
+
+
+def test_profile_token_is_signed_and_expires():
+    now = 1_700_000_000
+    token = profile_token(SECRET, now + 60)
+
+    assert verify_profile_token(SECRET, token, now=now)
+    assert not verify_profile_token(SECRET, token, now=now + 61)
+    assert not verify_profile_token("outro-segredo", token, now=now)
+    assert not verify_profile_token(SECRET, f"{now + 3600}.{token.partition('.')[2]}", now=now)
+    assert not verify_profile_token(None, token, now=now)
+    assert not verify_profile_token(SECRET, "lixo", now=now)
+
+
+def test_signed_request_writes_collapsed_stack_profile(tmp_path):
+    client = profiled_client(tmp_path, secret=SECRET)
+    written = http_request_profiles_total.get(outcome="written")
+
+    assert client.post("/auth/token", data=CREDENTIALS, headers=signed_header()).status_code == 200
+
+    [profile] = tmp_path.iterdir()
+    assert profile.name.endswith("-POST-auth_token.collapsed")
+    lines = profile.read_text().splitlines()
+    stacks = {line.rpartition(" ")[0]: int(line.rpartition(" ")[2]) for line in lines}
+    assert all(microseconds > 0 for microseconds in stacks.values())
+    # A espera pelo bcrypt no pool de hashing aparece sob a rota de login
+    bcrypt_wait = [stack for stack in stacks
+                   if "login_for_access_token (routers/auth.py" in stack and "verify_password" in stack
+                   and stack.endswith(">")]
+    assert bcrypt_wait
+    assert http_request_profiles_total.get(outcome="written") == written + 1
+
+
+@pytest.mark.parametrize("headers", [{}, {"X-Profile": "1.abc"}, signed_header(secret="outro-segredo"),
+                                     signed_header(ttl=-1)])
+def test_requests_without_a_valid_signature_are_not_profiled(tmp_path, headers):
+    client = profiled_client(tmp_path, secret=SECRET)
+    assert client.get("/health/live", headers=headers).status_code == 200
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_sample_rate_profiles_requests_without_header(tmp_path):
+    client = profiled_client(tmp_path, sample_rate=1.0)
+    client.get("/health/live")
+    names = sorted(path.name.partition("-")[2] for path in tmp_path.iterdir())
+    assert names == ["GET-health_live.collapsed", "POST-auth.collapsed"]
+
+
+def test_profiling_stops_when_the_overhead_budget_is_spent(tmp_path):
+    clock = [0.0]
+    budget = ProfilingBudget(max_overhead=0.01, capacity=0.5, clock=lambda: clock[0])
+    client = profiled_client(tmp_path, secret=SECRET, budget=budget)
+    budget.spend(1.0)
+    over_budget = http_request_profiles_total.get(outcome="over_budget")
+
+    client.get("/health/live", headers=signed_header())
+    assert list(tmp_path.iterdir()) == []
+    assert http_request_profiles_total.get(outcome="over_budget") == over_budget + 1
+
+    # 1% do tempo decorrido volta ao orçamento: em 60 s, 0,6 s cobrem a dívida de 0,5 s
+    clock[0] = 60.0
+    client.get("/health/live", headers=signed_header())
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+def test_budget_never_accumulates_beyond_its_capacity():
+    clock = [0.0]
+    budget = ProfilingBudget(max_overhead=0.01, capacity=0.5, clock=lambda: clock[0])
+    clock[0] = 10_000.0
+    assert budget.available()
+    budget.spend(0.6)
+    assert not budget.available()
+
+
+def test_profiling_middleware_is_not_installed_by_default():
+    assert all(middleware.cls is not ProfilingMiddleware for middleware in app.user_middleware)
@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+from sqlalchemy import event
+
+import routers.admin
+from routers.test_documents import seed_full_wallet
+
+
+@pytest.fixture
+def executed_selects(db_engine):
+    """SELECTs (instrução, parâmetros) executados pela aplicação enquanto o teste roda."""
+    selects = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            selects.append((statement, parameters))
+
+    event.listen(db_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    yield selects
+    event.remove(db_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+
+def query_plans(db_engine, selects):
+    async def explain():
+        async with db_engine.connect() as connection:
+            return [
+                [row[3] for row in await connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+                for statement, parameters in selects
+            ]
+
+    return asyncio.run(explain())
+
+
+@pytest.mark.parametrize("method, path, params", [
+    ("get", "/documents/", None),
+    ("get", "/transport/balance", None),
+    ("get", "/transport/transactions", None),
+    ("post", "/chatbot/", {"question": "qual meu saldo e minha cnh?"}),
+    ("post", "/auth/refresh", None),
+])
+def test_hot_lookups_use_indexes(auth_client, db_session_factory, db_engine, executed_selects, method, path, params):
+    seed_full_wallet(db_session_factory)
+    assert auth_client.post("/transport/add_balance", params={"amount": 10}).status_code == 201
+    executed_selects.clear()
+
+    response = getattr(auth_client, method)(path, params=params)
+    assert response.status_code == 200
+    assert executed_selects
+
+    for plan in query_plans(db_engine, executed_selects):
+        assert not [step for step in plan if step.startswith("SCAN")], plan
+        assert not [step for step in plan if "TEMP B-TREE" in step], plan
+
+
+def test_login_lookup_uses_username_index(client, db_engine, executed_selects):
+    credentials = {"username": "usuario_plano", "password": "senhateste123"}
+    client.post("/auth/", json=credentials)
+    executed_selects.clear()
+
+    assert client.post("/auth/token", data=credentials).status_code == 200
+    plans = query_plans(db_engine, executed_selects)
+    assert any("USING INDEX ix_users_username" in step for plan in plans for step in plan), plans
+    assert not [step for plan in plans for step in plan if step.startswith("SCAN")], plans
+
+
+def test_user_lookups_use_unique_indexes(db_engine):
+    async def explain(statement):
+        async with db_engine.connect() as connection:
+            return [row[3] for row in await connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", (1,))]
+
+    for table in ("documents", "transport"):
+        plan = asyncio.run(explain(f"SELECT id FROM {table} WHERE user_id = ?"))
+        assert plan == [f"SEARCH {table} USING COVERING INDEX ix_{table}_user_id (user_id=?)"]
+
+
+def test_export_batches_seek_on_each_table_primary_key(auth_client, db_session_factory, db_engine,
+                                                       executed_selects, monkeypatch):
+    monkeypatch.setattr(routers.admin, "ADMIN_API_KEY", "chave-admin")
+    seed_full_wallet(db_session_factory)
+    executed_selects.clear()
+
+    response = auth_client.get("/admin/documents/export", headers={"X-Admin-Key": "chave-admin"})
+    assert response.status_code == 200
+    plans = query_plans(db_engine, executed_selects)
+    # Cada lote começa pela chave primária da própria tabela, sem ordenar nem varrer a
+    # tabela inteira, e acha a carteira e o usuário de cada linha por índice
+    tables = ["users", "documents", "cpf", "rg", "cnh", "vaccination_card"]
+    assert [plan[0] for plan in plans] == [f"SEARCH {table} USING INTEGER PRIMARY KEY (rowid>?)" for table in tables]
+    assert not [step for plan in plans for step in plan if "SCAN" in step or "TEMP B-TREE" in step], plans
@@ -0,0 +1,95 @@
+import logging
+
+import pytest
+from sqlalchemy import select
+
+import middleware
+import routers.documents
+from models import Documents
+from querylog import QueryLog, fingerprint
+from routers.test_documents import seed_full_wallet
+
+
+def test_fingerprint_ignores_literals_whitespace_and_list_sizes():
+    assert fingerprint("SELECT id FROM users\n  WHERE id = 7 AND name = 'ana'") == \
+        "SELECT id FROM users WHERE id = ? AND name = ?"
+    assert fingerprint("SELECT id FROM cpf WHERE id IN (?, ?, ?)") == fingerprint("SELECT id FROM cpf WHERE id IN (?)")
+    assert fingerprint("SELECT users_1.id FROM users AS users_1 LIMIT ?") == \
+        "SELECT users_1.id FROM users AS users_1 LIMIT ?"
+
+
+def test_query_log_counts_executions_per_fingerprint():
+    log = QueryLog()
+    for user_id in (1, 2, 3):
+        log.record(f"SELECT * FROM documents WHERE user_id = {user_id}")
+    log.record("SELECT * FROM users WHERE id = 1")
+
+    assert log.count == 4
+    assert log.repeated() == {"SELECT * FROM documents WHERE user_id = ?": 3}
+    assert log.report().splitlines()[0] == "3x SELECT * FROM documents WHERE user_id = ?"
+
+
+# Orçamento de instruções SQL das rotas mais usadas, com a carteira completa
+@pytest.mark.parametrize("method, path, kwargs, budget", [
+    ("get", "/documents/", {}, 1),
+    ("get", "/transport/balance", {}, 1),
+    ("get", "/transport/transactions", {}, 1),
+    ("post", "/chatbot/", {"params": {"question": "qual meu saldo e minha cnh?"}}, 1),
+    ("post", "/transport/add_balance", {"params": {"amount": 10}}, 2),
+    # SELECT do usuário e INSERT do refresh token
+    ("post", "/auth/token", {"data": {"username": "usuario_teste", "password": "senhateste123"}}, 2),
+    # SELECT do refresh token, UPDATE que o revoga e INSERT do novo
+    ("post", "/auth/refresh", {}, 3),
+])
+def test_endpoints_stay_within_query_budget(auth_client, db_session_factory, query_budget, method, path, kwargs,
+                                            budget):
+    seed_full_wallet(db_session_factory)
+    assert auth_client.post("/transport/add_balance", params={"amount": 10}).status_code == 201
+    with query_budget(budget):
+        response = getattr(auth_client, method)(path, **kwargs)
+    assert response.status_code < 400
+
+
+async def wallet_with_n_plus_one(db, user_id):
+    # Simula um N+1: uma consulta por documento em vez de um único JOIN
+    for _ in range(3):
+        await db.scalar(select(Documents).where(Documents.user_id == user_id))
+    document = await routers.documents.load_wallet(db, user_id)
+    return routers.documents.wallet_response(document), document and document.version
+
+
+def test_query_budget_fails_with_repeated_statements_and_their_caller(auth_client, monkeypatch, query_budget):
+    monkeypatch.setattr(routers.documents, "load_versioned_wallet_documents", wallet_with_n_plus_one)
+
+    with pytest.raises(pytest.fail.Exception) as failure:
+        with query_budget(1):
+            auth_client.get("/documents/")
+
+    message = str(failure.value)
+    assert message.startswith("4 instruções SQL para um orçamento de 1:")
+    assert "3x SELECT documents.id" in message
+    assert "in wallet_with_n_plus_one" in message
+
+
+def test_middleware_logs_repeated_statements_when_enabled(auth_client, monkeypatch, caplog):
+    monkeypatch.setattr(routers.documents, "load_versioned_wallet_documents", wallet_with_n_plus_one)
+    monkeypatch.setattr(middleware, "LOG_REPEATED_QUERIES", True)
+    labels = {"method": "GET", "route": "/documents/"}
+    statements = middleware.http_request_queries.get_sum(**labels)
+
+    with caplog.at_level(logging.WARNING, logger="middleware"):
+        auth_client.get("/documents/")
+
+    assert middleware.http_request_queries.get_sum(**labels) == statements + 4
+    [record] = caplog.records
+    assert record.getMessage().startswith("Instruções SQL repetidas em GET /documents/ (4 no total):\n3x SELECT")
+    assert "in wallet_with_n_plus_one" in record.getMessage()
+
+
+def test_middleware_does_not_log_repeated_statements_by_default(auth_client, monkeypatch, caplog):
+    monkeypatch.setattr(routers.documents, "load_versioned_wallet_documents", wallet_with_n_plus_one)
+
+    with caplog.at_level(logging.WARNING, logger="middleware"):
+        auth_client.get("/documents/")
+
+    assert caplog.records == []
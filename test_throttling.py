@@ -0,0 +1,76 @@
+from throttling import LoginThrottle, TokenBuckets, login_throttle_evictions_total, login_throttled_total
+
+
+def buckets(clock, name="bench_username", burst=3, per_second=1.0, max_keys=100):
+    return TokenBuckets(name, burst, per_second, max_keys, clock=lambda: clock[0])
+
+
+def test_bucket_allows_a_burst_then_refills_at_the_configured_rate():
+    clock = [100.0]
+    limiter = buckets(clock)
+
+    assert [limiter.take("ana") for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.take("ana") == 1.0
+    # Outras chaves têm baldes próprios
+    assert limiter.take("bia") == 0.0
+
+    clock[0] = 101.5
+    assert limiter.take("ana") == 0.0
+    assert limiter.take("ana") == 0.5
+
+
+def test_full_buckets_leave_the_time_wheel():
+    clock = [100.0]
+    limiter = buckets(clock)
+    for key in ("ana", "bia"):
+        limiter.take(key)
+    limiter.take("ana")
+    assert len(limiter) == 2
+
+    # "bia" enche de novo em 101 e "ana" em 102
+    clock[0] = 101.2
+    limiter.take("caio")
+    assert len(limiter) == 2
+    clock[0] = 1_000.0
+    limiter.take("caio")
+    assert len(limiter) == 1
+
+
+def test_memory_ceiling_evicts_the_buckets_closest_to_full():
+    clock = [100.0]
+    limiter = buckets(clock, max_keys=2)
+    evictions = login_throttle_evictions_total.get(scope="bench_username")
+    for _ in range(3):
+        limiter.take("atacante")
+    limiter.take("ana")
+
+    limiter.take("bia")
+    assert len(limiter) == 2
+    assert login_throttle_evictions_total.get(scope="bench_username") == evictions + 1
+    # O balde vazio do atacante sobrevive; o de "ana", quase cheio, foi descartado
+    assert limiter.take("atacante") > 0
+    assert limiter.take("ana") == 0.0
+
+
+def test_blocked_ip_does_not_spend_the_username_tokens():
+    clock = [100.0]
+    throttle = LoginThrottle(buckets(clock, name="bench_username"), buckets(clock, name="bench_ip", burst=1))
+    throttled = login_throttled_total.get(scope="ip")
+
+    assert throttle.check("ana", "10.0.0.1") == 0.0
+    assert throttle.check("ana", "10.0.0.1") > 0
+    assert login_throttled_total.get(scope="ip") == throttled + 1
+    assert [throttle.check("ana", "10.0.0.2"), throttle.check("ana", "10.0.0.3")] == [0.0, 0.0]
+
+
+def test_successful_logins_give_their_tokens_back():
+    clock = [100.0]
+    throttle = LoginThrottle(buckets(clock, name="bench_username", burst=2), buckets(clock, name="bench_ip", burst=2))
+
+    # Mesmo IP, vários usuários que acertam a senha: nenhum deles consome o balde do IP
+    for index in range(10):
+        assert throttle.check(f"usuario{index}", "10.0.0.1") == 0.0
+        throttle.succeeded(f"usuario{index}", "10.0.0.1")
+
+    assert [throttle.check("ana", "10.0.0.1"), throttle.check("bia", "10.0.0.1")] == [0.0, 0.0]
+    assert throttle.check("caio", "10.0.0.1") > 0
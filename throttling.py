@@ -0,0 +1,164 @@
+import hashlib
+import math
+import os
+import time
+
+from metrics import Counter, Gauge
+
+# Tentativas de login que falharam permitidas em rajada e reposição por minuto, por usuário e por IP
+LOGIN_USER_BURST = int(os.getenv("LOGIN_USER_BURST", "5"))
+LOGIN_USER_PER_MINUTE = float(os.getenv("LOGIN_USER_PER_MINUTE", "5"))
+LOGIN_IP_BURST = int(os.getenv("LOGIN_IP_BURST", "10"))
+LOGIN_IP_PER_MINUTE = float(os.getenv("LOGIN_IP_PER_MINUTE", "10"))
+# Máximo de baldes guardados por escopo (cerca de 200 bytes cada)
+LOGIN_THROTTLE_MAX_KEYS = int(os.getenv("LOGIN_THROTTLE_MAX_KEYS", "100000"))
+
+
+class TokenBuckets:
+    """Baldes de fichas por chave, com `burst` fichas repostas a `per_second` por segundo.
+
+    Cada balde é um único float, o instante em que ele volta a ficar cheio (GCRA), e a
+    chave é um digest de 8 bytes, então o tamanho de um balde não depende da chave
+    recebida. Balde cheio é o mesmo que balde inexistente: as chaves ficam numa roda de
+    tempo, na posição do instante em que enchem, e são removidas quando a roda passa
+    por ela. Com `max_keys` baldes, uma chave nova descarta os mais próximos de encher.
+    """
+
+    def __init__(self, name: str, burst: int, per_second: float, max_keys: int, slot_seconds: float = 1.0,
+                 clock=time.monotonic):
+        self.name = name
+        self.interval = 1 / per_second
+        self.window = burst * self.interval
+        self.max_keys = max_keys
+        self.slot_seconds = slot_seconds
+        self._clock = clock
+        self._full_at = {}
+        # Folga de duas posições para que uma chave nunca caia na posição sendo varrida
+        self._wheel = [set() for _ in range(math.ceil(self.window / slot_seconds) + 2)]
+        self._tick = self._slot(clock())
+        login_throttle_keys.set_function(lambda: len(self._full_at), scope=name)
+
+    def __len__(self):
+        return len(self._full_at)
+
+    def _slot(self, instant: float) -> int:
+        return int(instant // self.slot_seconds)
+
+    def _file(self, key, full_at: float):
+        self._wheel[self._slot(full_at) % len(self._wheel)].add(key)
+
+    def _advance(self, now: float):
+        tick = self._slot(now)
+        # Depois de uma volta completa sem chamadas, todas as posições já venceram
+        for slot in range(max(self._tick, tick - len(self._wheel) + 1), tick + 1):
+            keys = self._wheel[slot % len(self._wheel)]
+            self._wheel[slot % len(self._wheel)] = set()
+            for key in keys:
+                full_at = self._full_at.get(key)
+                if full_at is None:
+                    continue
+                # Balde usado de novo depois de entrar na roda: volta para a nova posição
+                if full_at > now:
+                    self._file(key, full_at)
+                else:
+                    del self._full_at[key]
+        self._tick = tick
+
+    def _evict(self):
+        wheel = len(self._wheel)
+        for offset in range(wheel):
+            slot = (self._tick + offset) % wheel
+            keys = self._wheel[slot]
+            while keys:
+                key = keys.pop()
+                full_at = self._full_at.get(key)
+                if full_at is None:
+                    continue
+                if self._slot(full_at) % wheel != slot:
+                    self._file(key, full_at)
+                    continue
+                del self._full_at[key]
+                login_throttle_evictions_total.inc(scope=self.name)
+                return
+
+    def take(self, key: str) -> float:
+        """Consome uma ficha de `key`; devolve 0, ou os segundos até haver uma ficha."""
+        now = self._clock()
+        self._advance(now)
+        digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+        known = digest in self._full_at
+        full_at = max(self._full_at.get(digest, now), now) + self.interval
+        if full_at - now > self.window:
+            return full_at - now - self.window
+
+        if not known:
+            if len(self._full_at) >= self.max_keys:
+                self._evict()
+            self._file(digest, full_at)
+        self._full_at[digest] = full_at
+        return 0.0
+
+    def refund(self, key: str):
+        """Devolve a ficha consumida por um take(key) anterior."""
+        digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+        # Balde já descartado (cheio ou despejado): não há o que devolver. A chave fica na
+        # posição antiga da roda e sai quando ela for varrida
+        if digest in self._full_at:
+            self._full_at[digest] -= self.interval
+
+    def clear(self):
+        self._full_at.clear()
+        for keys in self._wheel:
+            keys.clear()
+
+
+class LoginThrottle:
+    """Limita as tentativas de login por usuário e por IP antes de qualquer bcrypt.
+
+    Toda tentativa consome uma ficha de cada balde antes do bcrypt, para que tentativas
+    simultâneas não passem todas de uma vez, e o login bem-sucedido a devolve: só as
+    tentativas que falham contam para o limite. Assim, muitos usuários legítimos atrás do
+    mesmo IP (NAT da operadora, proxy corporativo) não se bloqueiam entre si.
+    """
+
+    def __init__(self, by_username: TokenBuckets, by_ip: TokenBuckets):
+        self.by_username = by_username
+        self.by_ip = by_ip
+
+    def check(self, username: str, ip: str | None) -> float:
+        """0 se a tentativa pode seguir, ou os segundos de espera (Retry-After).
+
+        O IP é verificado primeiro para que um IP já bloqueado não gaste as fichas
+        do usuário que está atacando.
+        """
+        retry_after = self.by_ip.take(ip or "")
+        if retry_after:
+            login_throttled_total.inc(scope="ip")
+            return retry_after
+        retry_after = self.by_username.take(username)
+        if retry_after:
+            login_throttled_total.inc(scope="username")
+        return retry_after
+
+    def succeeded(self, username: str, ip: str | None):
+        """Devolve as fichas consumidas por check() de um login que acertou a senha."""
+        self.by_username.refund(username)
+        self.by_ip.refund(ip or "")
+
+    def clear(self):
+        self.by_username.clear()
+        self.by_ip.clear()
+
+
+login_throttled_total = Counter(
+    "auth_login_throttled_total", "Tentativas de login recusadas antes do bcrypt, por escopo do limite.",
+    ("scope",))
+login_throttle_keys = Gauge(
+    "auth_login_throttle_keys", "Baldes de tentativas de login em memória, por escopo.", ("scope",))
+login_throttle_evictions_total = Counter(
+    "auth_login_throttle_evictions_total", "Baldes descartados por atingir LOGIN_THROTTLE_MAX_KEYS.", ("scope",))
+
+login_throttle = LoginThrottle(
+    TokenBuckets("username", LOGIN_USER_BURST, LOGIN_USER_PER_MINUTE / 60, LOGIN_THROTTLE_MAX_KEYS),
+    TokenBuckets("ip", LOGIN_IP_BURST, LOGIN_IP_PER_MINUTE / 60, LOGIN_THROTTLE_MAX_KEYS),
+)